@@ -0,0 +1,373 @@
+import logging
+import os
+import threading
+import time
+from datetime import date as calendar_date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from storage import PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background re-reads of the last SYNC_DAYS days of marks, to
+# pick up marks written by other processes (teacher app, other replicas);
+# matches the session cache TTL so the matrix and My Records agree
+SYNC_SECONDS = float(os.environ.get("ATTENDANCE_MATRIX_SYNC_SECONDS", "60"))
+SYNC_DAYS = 7
+# Seconds between full rebuilds, which catch corrections to older dates
+REBUILD_SECONDS = float(os.environ.get("ATTENDANCE_MATRIX_REBUILD_SECONDS", "86400"))
+# Marks made in this process are re-applied over syncs for this long, so a
+# write-behind mark that has not reached the backend yet doesn't flicker out
+LOCAL_MARK_SECONDS = 600
+
+# Attendance requirement in percent
+REQUIRED_PERCENTAGE = 75
+
+# Set bits per byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def _grow(size):
+    return max(8, size * 2)
+
+
+class AttendanceMatrix:
+    """Students x class dates presence bits, one packed NumPy row per student.
+
+    Bit j of a row (little-endian within each byte) is set when the student
+    has a mark on the j-th class date; dates are kept sorted so runs of set
+    bits are attendance streaks. Rows and byte columns are over-allocated so
+    today's marks are O(1) bit sets.
+    """
+
+    def __init__(self, names=(), dates=(), present=None):
+        self.lock = threading.Lock()
+        self.names = list(names)
+        self.dates = list(dates)
+        self.rows = {name: i for i, name in enumerate(self.names)}
+        self.cols = {date: j for j, date in enumerate(self.dates)}
+        if present is None:
+            present = np.zeros((len(self.names), len(self.dates)), dtype=bool)
+        self.bits = self._allocate(present, _grow(len(self.names)), _grow(len(self.dates) // 8 + 1))
+        self.built_at = time.monotonic()
+
+    @staticmethod
+    def _allocate(present, row_capacity, byte_capacity):
+        bits = np.zeros((row_capacity, byte_capacity), dtype=np.uint8)
+        packed = np.packbits(present, axis=1, bitorder="little")
+        bits[:packed.shape[0], :packed.shape[1]] = packed
+        return bits
+
+    @classmethod
+    def from_storage(cls, storage, page_size=PAGE_SIZE):
+        """Build from one paged pass over Attendance (Name, Date)"""
+        names, dates = [], []
+        for page in storage.iter_attendance_pages(page_size):
+            names.extend(row["Name"] for row in page)
+            dates.extend(row["Date"] for row in page)
+        name_codes, unique_names = pd.factorize(pd.Series(names, dtype=object))
+        date_codes, unique_dates = pd.factorize(pd.Series(dates, dtype=object), sort=True)
+        present = np.zeros((len(unique_names), len(unique_dates)), dtype=bool)
+        present[name_codes, date_codes] = True
+        return cls(list(unique_names), list(unique_dates), present)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def _present(self, rows=None):
+        """Unpacked bool matrix for the given row indices (all students if None)"""
+        view = self.bits[:len(self.names)] if rows is None else self.bits[rows]
+        return np.unpackbits(view, axis=1, count=len(self.dates), bitorder="little").astype(bool)
+
+    def mark(self, name, date):
+        """Set the bit for a new mark; new students and dates are added as needed"""
+        with self.lock:
+            self._set(self._row(name), self._col(date))
+
+    def set_student(self, name, dates):
+        """Replace a student's row with the given marked dates"""
+        with self.lock:
+            cols = [self._col(date) for date in dates]
+            row = self._row(name)
+            self.bits[row] = 0
+            for col in cols:
+                self._set(row, col)
+
+    def replace_since(self, date_from, marks):
+        """Replace every column from date_from on with the given (name, date) marks.
+
+        Dates in that range left without any mark are no longer class dates
+        and are dropped.
+        """
+        with self.lock:
+            for _, date in marks:
+                self._col(date)
+            window = [col for col, date in enumerate(self.dates) if date >= date_from]
+            for col in window:
+                self.bits[:, col >> 3] &= np.uint8(~(1 << (col & 7)) & 0xFF)
+            for name, date in marks:
+                self._set(self._row(name), self.cols[date])
+
+            marked = {date for _, date in marks}
+            empty = [self.dates[col] for col in window if self.dates[col] not in marked]
+            if empty:
+                self._remove_dates(empty)
+
+    def _set(self, row, col):
+        self.bits[row, col >> 3] |= np.uint8(1 << (col & 7))
+
+    def _row(self, name):
+        row = self.rows.get(name)
+        if row is None:
+            if len(self.names) == self.bits.shape[0]:
+                extra = np.zeros((_grow(len(self.names)) - len(self.names), self.bits.shape[1]), dtype=np.uint8)
+                self.bits = np.vstack([self.bits, extra])
+            row = self.rows[name] = len(self.names)
+            self.names.append(name)
+        return row
+
+    def _col(self, date):
+        col = self.cols.get(date)
+        if col is None:
+            if self.dates and date < self.dates[-1]:
+                self._insert_date(date)
+            else:
+                self._append_date(date)
+            col = self.cols[date]
+        return col
+
+    def _append_date(self, date):
+        if len(self.dates) == self.bits.shape[1] * 8:
+            extra = np.zeros((self.bits.shape[0], _grow(self.bits.shape[1]) - self.bits.shape[1]), dtype=np.uint8)
+            self.bits = np.hstack([self.bits, extra])
+        self.cols[date] = len(self.dates)
+        self.dates.append(date)
+
+    def _insert_date(self, date):
+        # Back-dated class: shift every later column right by one (rare)
+        present = self._present()
+        position = int(np.searchsorted(self.dates, date))
+        present = np.insert(present, position, False, axis=1)
+        self.dates.insert(position, date)
+        self.cols = {d: j for j, d in enumerate(self.dates)}
+        self.bits = self._allocate(present, self.bits.shape[0], _grow(len(self.dates) // 8 + 1))
+
+    def _remove_dates(self, dates):
+        # A class date lost its last mark: drop its column (rare)
+        present = self._present()
+        dropped = set(dates)
+        keep = [col for col, date in enumerate(self.dates) if date not in dropped]
+        self.dates = [self.dates[col] for col in keep]
+        self.cols = {d: j for j, d in enumerate(self.dates)}
+        self.bits = self._allocate(present[:, keep], self.bits.shape[0], _grow(len(self.dates) // 8 + 1))
+
+    def _rows_for(self, names):
+        if names is None:
+            return None, list(self.names)
+        names = [names] if isinstance(names, str) else list(names)
+        return [self.rows.get(name, -1) for name in names], names
+
+    def stats(self, names=None, recent_days=28):
+        """Per-student attended, total, percentage, streaks and recent rate.
+
+        names is one name, a list, or None for the whole class; students with
+        no marks yet get zero rows. recent_rate is the attendance percentage
+        over the classes in the last recent_days days of the calendar.
+        """
+        with self.lock:
+            rows, names = self._rows_for(names)
+            total = len(self.dates)
+            if rows is None:
+                present = self._present()
+            else:
+                known = [r for r in rows if r >= 0]
+                present = np.zeros((len(rows), total), dtype=bool)
+                if known:
+                    present[[i for i, r in enumerate(rows) if r >= 0]] = self._present(known)
+            dates = np.array(self.dates, dtype="datetime64[D]")
+
+        attended = present.sum(axis=1)
+        current, longest = _streaks(present)
+        if total:
+            window = dates >= dates[-1] - np.timedelta64(recent_days - 1, "D")
+            recent = present[:, window].mean(axis=1) * 100
+        else:
+            recent = np.zeros(len(names))
+        return pd.DataFrame({
+            "Attended": attended,
+            "Total": total,
+            "Percentage": np.round(attended / total * 100, 2) if total else np.zeros(len(names)),
+            "CurrentStreak": current,
+            "LongestStreak": longest,
+            "RecentRate": np.round(recent, 1),
+        }, index=pd.Index(names, name="Name"))
+
+    def student(self, name, recent_days=28):
+        """stats() row for one student as a plain dict"""
+        row = self.stats(name, recent_days).iloc[0]
+        return {key: (float(value) if key in ("Percentage", "RecentRate") else int(value))
+                for key, value in row.items()}
+
+    def rolling_rate(self, name, days=28):
+        """Attendance percentage over the trailing `days` days at each class date"""
+        with self.lock:
+            row = self.rows.get(name)
+            present = self._present([row])[0] if row is not None else np.zeros(len(self.dates), dtype=bool)
+            dates = np.array(self.dates, dtype="datetime64[D]")
+        cumulative = np.concatenate([[0], np.cumsum(present)])
+        starts = np.searchsorted(dates, dates - np.timedelta64(days - 1, "D"))
+        ends = np.arange(1, len(dates) + 1)
+        rate = (cumulative[ends] - cumulative[starts]) / (ends - starts) * 100
+        return pd.DataFrame({"Date": pd.to_datetime(self.dates), "Rate": np.round(rate, 1)})
+
+    def below(self, threshold=REQUIRED_PERCENTAGE):
+        """Students under the requirement, lowest percentage first"""
+        stats = self.stats()
+        return stats[stats["Percentage"] < threshold].sort_values("Percentage")
+
+    def attended_counts(self):
+        """Marks per student straight from the packed rows (no unpacking)"""
+        with self.lock:
+            counts = _POPCOUNT[self.bits[:len(self.names)]].sum(axis=1, dtype=np.int64)
+            return pd.Series(counts, index=pd.Index(self.names, name="Name"))
+
+
+def student_streaks(class_dates, student_dates):
+    """(current, longest) run of consecutive class dates one student attended"""
+    attended = set(student_dates)
+    present = np.array([[date in attended for date in sorted(class_dates)]], dtype=bool)
+    current, longest = _streaks(present)
+    return int(current[0]), int(longest[0])
+
+
+def _streaks(present):
+    """(current, longest) runs of consecutive attended classes per row"""
+    students, total = present.shape
+    if total == 0:
+        return np.zeros(students, dtype=np.int64), np.zeros(students, dtype=np.int64)
+
+    # Current streak: attended classes after the last absence
+    reversed_rows = present[:, ::-1]
+    current = np.where(reversed_rows.all(axis=1), total, np.argmin(reversed_rows, axis=1))
+
+    # Longest streak: run boundaries from the diff of each zero-padded row
+    padded = np.zeros((students, total + 2), dtype=np.int8)
+    padded[:, 1:-1] = present
+    edges = np.diff(padded, axis=1)
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+    longest = np.zeros(students, dtype=np.int64)
+    np.maximum.at(longest, start_rows, end_cols - start_cols)
+    return current.astype(np.int64), longest
+
+
+class SharedAttendanceMatrix:
+    """Process-wide matrix built once in the background and kept current incrementally.
+
+    Every SYNC_SECONDS the marks of the last SYNC_DAYS days are re-read and
+    replace those columns, so marks and corrections from other processes
+    show up without rescanning the table; a full rebuild every
+    REBUILD_SECONDS catches corrections to older dates. Until the first
+    build finishes, current() is None and callers use their per-student
+    queries. Marks made in this process are re-applied after every update
+    until the backend has had time to report them.
+    """
+
+    def __init__(self, storage, sync_seconds=SYNC_SECONDS, sync_days=SYNC_DAYS, rebuild_seconds=REBUILD_SECONDS):
+        self.storage = storage
+        self.sync_seconds = sync_seconds
+        self.sync_days = sync_days
+        self.rebuild_seconds = rebuild_seconds
+        self.matrix = None
+        self.lock = threading.Lock()
+        self.updating = False
+        self.built_at = self.synced_at = 0.0
+        # (name, date) -> when it was marked here
+        self.local_marks = {}
+
+    def current(self):
+        """The latest matrix, or None while the first build is running"""
+        matrix = self.matrix
+        now = time.monotonic()
+        if matrix is None or now - self.built_at > self.rebuild_seconds:
+            self.rebuild()
+        elif now - self.synced_at > self.sync_seconds:
+            self._start(self._sync)
+        return matrix
+
+    def rebuild(self):
+        self._start(self._build)
+
+    def _start(self, update):
+        with self.lock:
+            if self.updating:
+                return
+            self.updating = True
+        threading.Thread(target=self._update, args=(update,), daemon=True, name="attendance-matrix").start()
+
+    def _update(self, update):
+        try:
+            update()
+        except Exception:
+            logger.exception("Error updating attendance matrix")
+        finally:
+            with self.lock:
+                self.updating = False
+
+    def _build(self):
+        started = time.monotonic()
+        matrix = AttendanceMatrix.from_storage(self.storage)
+        with self.lock:
+            for name, date in self._local_marks():
+                matrix.mark(name, date)
+            self.matrix = matrix
+            self.built_at = self.synced_at = started
+
+    def _sync(self):
+        # Stamped first so a failing backend is retried once per interval
+        self.synced_at = time.monotonic()
+        date_from = (calendar_date.today() - timedelta(days=self.sync_days - 1)).isoformat()
+        marks = [(row["Name"], row["Date"])
+                 for page in self.storage.iter_attendance_pages(date_from=date_from) for row in page]
+        with self.lock:
+            # Applied in the same step so readers never see local marks missing
+            self.matrix.replace_since(date_from, marks + self._local_marks())
+
+    def _local_marks(self):
+        # Caller holds self.lock
+        cutoff = time.monotonic() - LOCAL_MARK_SECONDS
+        self.local_marks = {mark: at for mark, at in self.local_marks.items() if at >= cutoff}
+        return list(self.local_marks)
+
+    def refresh_student(self, name):
+        """Re-read one student's marks now, for the views' Refresh button"""
+        matrix = self.matrix
+        if matrix is None:
+            return  # The build in progress reads them anyway
+        dates = [row["Date"] for row in self.storage.get_attendance(name)]
+        with self.lock:
+            matrix.set_student(name, dates + [d for n, d in self._local_marks() if n == name])
+
+    def mark(self, name, date):
+        with self.lock:
+            self.local_marks[(name, date)] = time.monotonic()
+            matrix = self.matrix
+        if matrix is not None:
+            matrix.mark(name, date)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_attendance_matrix(storage):
+    """Process-wide SharedAttendanceMatrix; the first call starts the build"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedAttendanceMatrix(storage)
+            _shared.rebuild()
+        return _shared
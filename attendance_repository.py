@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+import instrumentation
+import resilience
+
+# Threads shared by every session for issuing a view's reads concurrently
+LOAD_WORKERS = 8
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, maxsize=128, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            # Evict least recently used entries once over capacity
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_prefix(self, prefix):
+        """Drop every tuple key that starts with prefix"""
+        with self._lock:
+            for key in [k for k in self._data if k[:len(prefix)] == prefix]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+_MISSING = object()
+
+_load_pool = None
+_load_pool_lock = threading.Lock()
+
+
+def _get_load_pool():
+    global _load_pool
+    with _load_pool_lock:
+        if _load_pool is None:
+            _load_pool = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="view-load")
+        return _load_pool
+
+
+class AttendanceRepository:
+    """Memoized access to attendance and rewards data for one session.
+
+    Concurrent requests for the same key share one backend call. Inside a
+    rerun_scope finished loads are kept too, so every read of a key during
+    that rerun sees the same result, stale stand-ins included.
+    """
+
+    def __init__(self, storage, ttl=60, maxsize=128, calendar=None):
+        self.storage = storage
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Shared ClassCalendar; without one class dates are cached per session
+        self.calendar = calendar
+        # key -> Future of (value, stale notes); finished ones stay while scoped
+        self.loads = {}
+        self.loads_lock = threading.Lock()
+        self.scope_depth = 0
+
+    def _cached(self, key, loader):
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self.loads_lock:
+            pending = self.loads.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.loads[key] = Future()
+        if owner:
+            self._load(key, loader, pending)
+        value, stale = pending.result()
+        resilience.replay_stale(stale)
+        return value
+
+    def _load(self, key, loader, pending):
+        try:
+            with resilience.collecting_stale() as stale:
+                value = loader()
+        except BaseException as e:
+            pending.set_exception(e)
+        else:
+            # A stale stand-in is served but not cached, so the next rerun
+            # tries the backend again
+            if not stale:
+                self.cache.set(key, value)
+            pending.set_result((value, tuple(stale)))
+        finally:
+            with self.loads_lock:
+                if not self.scope_depth and self.loads.get(key) is pending:
+                    del self.loads[key]
+
+    def _forget(self, prefix):
+        """Drop finished loads kept by the rerun scope for keys under prefix"""
+        with self.loads_lock:
+            for key in [k for k, f in self.loads.items() if k[:len(prefix)] == prefix and f.done()]:
+                del self.loads[key]
+
+    @contextmanager
+    def rerun_scope(self):
+        """Keep every load's result until the enclosing rerun finishes"""
+        with self.loads_lock:
+            self.scope_depth += 1
+        try:
+            yield self
+        finally:
+            with self.loads_lock:
+                self.scope_depth -= 1
+                if not self.scope_depth:
+                    for key in [k for k, f in self.loads.items() if f.done()]:
+                        del self.loads[key]
+
+    def prefetch(self, loaders):
+        """Run independent zero-argument loaders concurrently and wait for all of them.
+
+        Results land in the cache (or, inside a rerun_scope, in the kept
+        loads), so the view's own calls afterwards return without waiting;
+        errors are left for those calls to raise.
+        """
+        loaders = list(loaders)
+        if len(loaders) < 2:
+            return  # Nothing to overlap; the view's own call does the load
+        trace = instrumentation.current_trace()
+        with instrumentation.span("prefetch"):
+            wait([_get_load_pool().submit(self._run_loader, loader, trace) for loader in loaders])
+
+    @staticmethod
+    def _run_loader(loader, trace):
+        with instrumentation.attach(trace):
+            try:
+                loader()
+            except Exception:
+                pass
+
+    def get_attendance(self, student_name):
+        """All attendance rows for a student"""
+        name = student_name.upper()
+        return self._cached(("attendance", name), lambda: self.storage.get_attendance(name))
+
+    def get_attendance_page(self, student_name, columns, date_from=None, date_to=None, after=None, limit=50):
+        """One keyset page of a student's records, newest first"""
+        name = student_name.upper()
+        columns = tuple(columns)
+        key = ("records", name, columns, date_from, date_to, after, limit)
+        return self._cached(key, lambda: self.storage.get_attendance_page(
+            name, columns, date_from=date_from, date_to=date_to, after=after, limit=limit
+        ))
+
+    def get_badge(self, student_name):
+        """Rewards row for a student, or None if they have none yet"""
+        name = student_name.upper()
+        return self._cached(("badge", name), lambda: self.storage.get_reward(name))
+
+    def get_class_dates(self):
+        """Sorted distinct dates on which the class met"""
+        if self.calendar is not None:
+            return self.calendar.dates()
+        return self._cached(("class_dates",), self.storage.get_class_dates)
+
+    def record_mark(self, student_name, record, reward):
+        """Write a freshly inserted mark through to the cached entries"""
+        name = student_name.upper()
+
+        records = self.cache.get(("attendance", name), _MISSING)
+        if records is not _MISSING:
+            self.cache.set(("attendance", name), records + [record])
+        else:
+            self.cache.invalidate(("attendance", name))
+        self.cache.invalidate_prefix(("records", name))
+        self._forget(("attendance", name))
+        self._forget(("records", name))
+        self._forget(("badge", name))
+
+        if reward is not None:
+            self.cache.set(("badge", name), reward)
+        else:
+            self.cache.invalidate(("badge", name))
+
+        if self.calendar is not None:
+            self.calendar.add(record["Date"])
+        else:
+            class_dates = self.cache.get(("class_dates",), _MISSING)
+            if class_dates is not _MISSING and record["Date"] not in class_dates:
+                self.cache.set(("class_dates",), sorted(class_dates + [record["Date"]]))
+
+    def invalidate_student(self, student_name):
+        name = student_name.upper()
+        self.cache.invalidate(("attendance", name))
+        self.cache.invalidate_prefix(("records", name))
+        self.cache.invalidate(("badge", name))
+        for prefix in (("attendance", name), ("records", name), ("badge", name)):
+            self._forget(prefix)
+        if self.calendar is None:
+            # The shared calendar keeps itself current
+            self.cache.invalidate(("class_dates",))
+            self._forget(("class_dates",))
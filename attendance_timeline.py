@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Most points a chart is allowed to ship to the browser
+POINT_BUDGET = 400
+
+# Rollup frequencies, finest first
+ROLLUPS = {
+    "daily": None,
+    "weekly": "W-MON",
+    "monthly": "MS",
+}
+
+
+def build_timeline(class_dates, student_dates):
+    """Per-class-date presence as a DataFrame with Date (datetime64) and Present (0/1)"""
+    dates = pd.to_datetime(pd.Index(class_dates).unique()).sort_values()
+    attended = pd.to_datetime(pd.Index(student_dates).unique())
+    present = dates.isin(attended).astype(np.int8)
+    return pd.DataFrame({"Date": dates, "Present": present})
+
+
+def rollup(timeline, freq):
+    """Attendance rate per period: Date, Attended, Classes, Rate (0-100)"""
+    grouped = timeline.set_index("Date")["Present"].resample(freq, label="left", closed="left")
+    summary = pd.DataFrame({"Attended": grouped.sum(), "Classes": grouped.count()})
+    summary = summary[summary["Classes"] > 0]
+    summary["Rate"] = (summary["Attended"] / summary["Classes"] * 100).round(1)
+    return summary.reset_index()
+
+
+def choose_rollup(timeline, budget=POINT_BUDGET):
+    """Finest rollup whose point count fits the budget"""
+    if len(timeline) <= budget:
+        return "daily"
+    span_days = (timeline["Date"].iloc[-1] - timeline["Date"].iloc[0]).days
+    if span_days / 7 <= budget:
+        return "weekly"
+    return "monthly"
+
+
+def downsample(frame, value_column, budget=POINT_BUDGET):
+    """Average consecutive rows into at most budget buckets.
+
+    Averaging turns a 0/1 column into fractions, so only use it on rates.
+    """
+    if len(frame) <= budget:
+        return frame
+    buckets = np.arange(len(frame)) * budget // len(frame)
+    grouped = frame.groupby(buckets)
+    return pd.DataFrame({
+        "Date": grouped["Date"].first().to_numpy(),
+        value_column: grouped[value_column].mean().round(1).to_numpy(),
+    })
+
+
+def calendar_heatmap_frame(timeline, weeks=52):
+    """Weekday x week grid of presence (1), absence (0) and no class (NaN) for recent weeks"""
+    if len(timeline):
+        cutoff = timeline["Date"].iloc[-1] - pd.Timedelta(weeks=weeks)
+        timeline = timeline[timeline["Date"] > cutoff]
+    frame = timeline.assign(
+        Week=timeline["Date"].dt.to_period("W-SUN").dt.start_time,
+        Weekday=timeline["Date"].dt.dayofweek,
+    )
+    grid = frame.pivot_table(index="Weekday", columns="Week", values="Present", aggfunc="max")
+    grid = grid.reindex(range(7))
+    grid.index = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    return grid
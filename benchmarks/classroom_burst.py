@@ -0,0 +1,260 @@
+"""Classroom burst load test for the login -> scan -> mark flow.
+
+Simulates N students arriving over a few seconds and scanning the
+teacher's rotating session QR. Each student runs the real app in its own
+Streamlit AppTest: log in, open "Mark Attendance", enter the session ID
+and submit a camera frame rendered from the QR that was on screen when
+they arrived. A seeded local SQLite database stands in for Supabase.
+
+Reports p50/p95/p99 end-to-end latency, marks that missed the QR
+validity window and backend calls per mark.
+
+    python benchmarks/classroom_burst.py --students 60 --spread 8
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# The app picks its backend from the environment at import time
+os.environ["STORAGE_BACKEND"] = "sqlite"
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+import streamlit  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import storage  # noqa: E402
+from seed_sqlite import seed, student_email, student_name  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "student_app.py")
+SESSION_ID = "CS101"
+TEACHER_ID = "T01"
+
+
+class CountingStorage:
+    """Proxy that counts backend operations made in this process.
+
+    Calls from the write-behind flush thread are counted separately since
+    they happen off the student's request path.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = 0
+        self.background_calls = 0
+
+    def __getattr__(self, attr):
+        value = getattr(self.inner, attr)
+        if not callable(value):
+            return value
+
+        def counted(*args, **kwargs):
+            if threading.current_thread().name == "mark-queue":
+                self.background_calls += 1
+            else:
+                self.calls += 1
+            return value(*args, **kwargs)
+
+        return counted
+
+
+class SessionQR:
+    """Teacher screen that re-renders the session QR every `refresh` seconds"""
+
+    def __init__(self, refresh):
+        self.refresh = refresh
+        self.frames = {}
+        self.lock = threading.Lock()
+        self.encoder = cv2.QRCodeEncoder.create()
+
+    def frame_at(self, now):
+        timestamp = int(now // self.refresh * self.refresh)
+        with self.lock:
+            if timestamp not in self.frames:
+                text = f"SESSION:{SESSION_ID}:{TEACHER_ID}:{timestamp}"
+                qr = cv2.resize(self.encoder.encode(text), None, fx=8, fy=8,
+                                interpolation=cv2.INTER_NEAREST)
+                frame = np.full((720, 1280), 170, dtype=np.uint8)
+                top, left = (720 - qr.shape[0]) // 2, (1280 - qr.shape[1]) // 2
+                frame[top:top + qr.shape[0], left:left + qr.shape[1]] = qr
+                ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+                self.frames[timestamp] = jpeg.tobytes()
+            return self.frames[timestamp]
+
+
+# The headless runner has no camera, so camera_input hands back whatever
+# frame the simulated student "captured" into session state
+def fake_camera_input(label, *args, **kwargs):
+    data = streamlit.session_state.get("_burst_frame")
+    return io.BytesIO(data) if data else None
+
+
+# Per-process state: AppTest drives a process-global Streamlit runtime, so
+# each worker process runs its simulated browsers one at a time
+_counter = None
+_qr = None
+
+
+def init_worker(db_path, refresh):
+    global _counter, _qr
+    _counter = CountingStorage(storage.SQLiteStorage(db_path))
+    storage._storage = _counter
+    streamlit.camera_input = fake_camera_input
+    _qr = SessionQR(refresh)
+
+
+def simulate_student(index, arrive_at, timeout):
+    delay = arrive_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+    begin = time.time()
+    calls_before = _counter.calls
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+    at.text_input[0].set_value(student_name(index))
+    at.text_input[1].set_value(student_email(index))
+    at.button[0].click().run()
+    logged_in = time.time()
+    login_calls = _counter.calls
+    if at.exception or not at.session_state["logged_in"]:
+        return {"outcome": "login_failed", "login_ms": (logged_in - begin) * 1000,
+                "scan_ms": 0.0, "e2e_ms": (logged_in - begin) * 1000,
+                "arrival_ms": (logged_in - arrive_at) * 1000, "mark_calls": 0,
+                "calls": login_calls - calls_before, "lag_s": logged_in - arrive_at,
+                "detail": [e.message for e in at.exception]}
+
+    # The default view is Mark Attendance. The student photographed the QR
+    # that was on screen when they arrived, so any time spent waiting for the
+    # server eats into its validity window
+    at.session_state["_burst_frame"] = _qr.frame_at(arrive_at)
+    at.text_input[0].set_value(SESSION_ID).run()
+    done = time.time()
+
+    if at.exception:
+        outcome = "error"
+    elif any("Marked Successfully" in e.value for e in at.success):
+        outcome = "marked"
+    elif any("Expired" in e.value for e in at.error):
+        outcome = "missed_window"
+    elif any("No QR" in w.value for w in at.warning):
+        outcome = "no_qr"
+    elif any("Already marked" in w.value for w in at.warning):
+        outcome = "duplicate"
+    else:
+        outcome = "unknown"
+
+    return {
+        "outcome": outcome,
+        "login_ms": (logged_in - begin) * 1000,
+        "scan_ms": (done - logged_in) * 1000,
+        "e2e_ms": (done - begin) * 1000,
+        # Arrival to result, including time spent waiting for a free worker
+        "arrival_ms": (done - arrive_at) * 1000,
+        "mark_calls": _counter.calls - login_calls,
+        "calls": _counter.calls - calls_before,
+        # Time a student waited for a free browser slot before starting
+        "lag_s": begin - arrive_at,
+    }
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--spread", type=float, default=8.0, help="seconds over which students arrive")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, i.e. concurrently active browsers")
+    parser.add_argument("--refresh", type=float, default=5.0, help="teacher QR refresh interval")
+    parser.add_argument("--history-days", type=int, default=120)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--write-behind", choices=["on", "off"], default="on",
+                        help="journal marks locally and flush in the background")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="burst-")
+    db_path = os.path.join(workdir, "burst.db")
+    # Read by the app when workers import it
+    os.environ["WRITE_BEHIND_MARKS"] = "1" if args.write_behind == "on" else "0"
+    os.environ["MARK_QUEUE_PATH"] = os.path.join(workdir, "mark_queue.db")
+    # Closed before the pool starts: a worker that inherits a live SQLite
+    # connection and closes it drops the parent's locks and WAL
+    with storage.SQLiteStorage(db_path) as seeding:
+        seed(seeding, args.students, args.history_days)
+
+    rng = random.Random(args.seed)
+    arrivals = sorted(rng.uniform(0, args.spread) for _ in range(args.students))
+
+    print(f"{args.students} students over {args.spread}s, {args.workers} concurrent sessions, "
+          f"QR refresh {args.refresh}s, write-behind {args.write_behind}")
+    # AppTest swaps __main__ for the app script inside workers, so tasks must
+    # be pickled by reference to this module's importable name
+    import classroom_burst as worker
+
+    # Spawned, not forked, so workers start with no open database handles
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=worker.init_worker,
+                             initargs=(db_path, args.refresh)) as pool:
+        # Let every worker import the app before the clock starts
+        list(pool.map(time.sleep, [0.5] * args.workers))
+        started = time.time()
+        futures = [pool.submit(worker.simulate_student, i, started + arrivals[i], args.timeout)
+                   for i in range(args.students)]
+        results = [f.result() for f in futures]
+    wall = time.time() - started
+    for detail in {str(r.get("detail")) for r in results if r.get("detail")}:
+        print(f"login failure: {detail}")
+
+    if args.write_behind == "on":
+        # Acknowledged marks must all reach the backend eventually
+        expected = sum(1 for r in results if r["outcome"] == "marked")
+        today = time.strftime("%Y-%m-%d")
+        deadline = time.time() + 30
+        landed = 0
+        with storage.SQLiteStorage(db_path) as check:
+            while time.time() < deadline:
+                landed = check.conn.execute('select count(*) from "Attendance" where "Date" = ?',
+                                            (today,)).fetchone()[0]
+                if landed >= expected:
+                    break
+                time.sleep(0.2)
+        print(f"write-behind: {landed}/{expected} acknowledged marks flushed "
+              f"{time.time() - started - wall:.1f}s after the burst")
+
+    outcomes = {}
+    for r in results:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+    marked = [r for r in results if r["outcome"] == "marked"]
+
+    print(f"\nwall time {wall:.1f}s, outcomes: {outcomes}")
+    print(f"\n{'latency (ms)':<14}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for key in ("login_ms", "scan_ms", "e2e_ms", "arrival_ms"):
+        values = [r[key] for r in results]
+        print(f"{key[:-3]:<14}{percentile(values, 50):>9.0f}{percentile(values, 95):>9.0f}"
+              f"{percentile(values, 99):>9.0f}")
+    print(f"\nmissed validity window: {outcomes.get('missed_window', 0)}")
+    if marked:
+        print(f"foreground backend calls per mark (scan rerun): "
+              f"{sum(r['mark_calls'] for r in marked) / len(marked):.1f}")
+    print(f"backend calls total: {sum(r['calls'] for r in results)}")
+    print(f"max wait for a free session slot: {max(r['lag_s'] for r in results):.1f}s")
+
+
+if __name__ == "__main__":
+    main()
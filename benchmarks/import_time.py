@@ -0,0 +1,83 @@
+"""Measure the portal's cold-start import cost.
+
+Runs the app once in Streamlit bare mode (which renders the login form) in a
+fresh interpreter under `python -X importtime`. It then reports the total import time,
+the slowest top-level packages and whether any heavy dependency was loaded
+before it was needed.
+
+    python benchmarks/import_time.py [--budget-ms 1500] [--runs 3]
+
+Exits non-zero when the median exceeds the budget or a heavy module is
+imported at startup, so it can run as a regression check.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Modules the login form must not need (streamlit itself imports bare plotly)
+HEAVY = ["cv2", "streamlit_webrtc", "aiortc", "plotly.express", "pandas", "requests", "supabase", "timezonefinder", "geopy", "pytz"]
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_once():
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(ROOT, "student_app.py")],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    cumulative = defaultdict(int)
+    loaded = set()
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, module = match.groups()
+        loaded.add(module)
+        # Top-level entries have the smallest indent (a single space)
+        if len(indent) == 1:
+            cumulative[module.split(".")[0]] += int(cumulative_us)
+    return cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    totals = []
+    per_package = defaultdict(list)
+    loaded = set()
+    for _ in range(args.runs):
+        cumulative, loaded = run_once()
+        totals.append(sum(cumulative.values()) / 1000)
+        for package, us in cumulative.items():
+            per_package[package].append(us / 1000)
+
+    median_total = statistics.median(totals)
+    print(f"total import time (median of {args.runs}): {median_total:.0f} ms\n")
+    print(f"{'package':<28}{'ms':>8}")
+    ranked = sorted(per_package.items(), key=lambda item: -statistics.median(item[1]))
+    for package, values in ranked[:args.top]:
+        print(f"{package:<28}{statistics.median(values):>8.0f}")
+
+    eager = [m for m in HEAVY if m in loaded]
+    print(f"\nheavy modules imported at startup: {', '.join(eager) or 'none'}")
+
+    failed = bool(eager)
+    if args.budget_ms is not None and median_total > args.budget_ms:
+        print(f"over budget: {median_total:.0f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
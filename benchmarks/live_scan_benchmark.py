@@ -0,0 +1,105 @@
+"""Benchmark continuous scanning over a recorded (or synthetic) video.
+
+Replays the clip at its native frame rate through LiveScanner for several
+frame strides and reports how many frames were decoded, the CPU spent and
+the simulated time from the first frame until attendance would be marked. Decoding is modelled as a single worker:
+a frame that arrives while the previous one is still decoding waits.
+
+    python benchmarks/live_scan_benchmark.py                  # synthetic clip
+    python benchmarks/live_scan_benchmark.py --video scan.mp4 --expected "SESSION:..."
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from live_scan import LIVE_STAGES, LiveScanner, VideoFileSource  # noqa: E402
+from make_qr_corpus import background, place, render_qr  # noqa: E402
+from qr_decoder import STAGES  # noqa: E402
+
+
+def record_clip(path, text, fps=15, seconds=5.0, seed=3):
+    """Phone-like clip: empty scene, the code swinging in blurred, then held steady"""
+    rng = np.random.default_rng(seed)
+    scene = background(rng)
+    height, width = scene.shape[:2]
+    qr = render_qr(text)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    total = int(fps * seconds)
+    for index in range(total):
+        t = index / fps
+        frame = scene.copy()
+        if t >= 1.0:
+            # Swing in from the left for a second, then settle with hand shake
+            progress = min((t - 1.0) / 1.0, 1.0)
+            size = 150 + 230 * progress
+            center = (width * (0.15 + 0.35 * progress) + rng.normal(0, 4),
+                      height * 0.5 + rng.normal(0, 4))
+            frame = place(frame, qr, size, center, angle=20 * (1 - progress) + rng.normal(0, 1.5), rng=rng)
+            if progress < 1.0:
+                k = 15
+                kernel = np.zeros((k, k), dtype=np.float32)
+                kernel[k // 2, :] = 1.0 / k
+                frame = cv2.filter2D(frame, -1, kernel)
+        frame = np.clip(frame + rng.normal(0, 6, frame.shape), 0, 255).astype(np.uint8)
+        writer.write(frame)
+    writer.release()
+    return total
+
+
+def replay(source, fps, expected, stride, stages):
+    scanner = LiveScanner(accept=lambda text: text == expected, stride=stride, stages=stages)
+    clock = 0.0
+    time_to_mark = None
+    for index, frame in enumerate(source):
+        arrival = index / fps
+        decoded_before = scanner.frames_decoded
+        start = time.perf_counter()
+        result = scanner.feed(frame)
+        cost = time.perf_counter() - start
+        if scanner.frames_decoded > decoded_before:
+            # Only frames that were actually decoded occupy the worker
+            clock = max(clock, arrival) + cost
+        if result is not None:
+            time_to_mark = max(clock, arrival)
+            break
+    stats = scanner.stats()
+    stats["time_to_mark"] = time_to_mark
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", help="recorded clip; a synthetic one is generated if omitted")
+    parser.add_argument("--expected", default="SESSION:CS101:T01:1760000000")
+    parser.add_argument("--strides", default="1,2,3,5")
+    args = parser.parse_args()
+
+    path = args.video
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "scan.avi")
+        frames = record_clip(path, args.expected)
+        print(f"Synthetic clip: {frames} frames -> {path}")
+    source = VideoFileSource(path)
+    fps = source.fps()
+
+    cases = [(f"stride {k}", int(k), LIVE_STAGES) for k in args.strides.split(",")]
+    cases.append(("stride 1, all stages", 1, STAGES))
+
+    print(f"{'mode':<22}{'seen':>6}{'decoded':>9}{'cpu ms':>9}{'ms/frame':>10}{'time to mark':>14}")
+    for label, stride, stages in cases:
+        stats = replay(source, fps, args.expected, stride, stages)
+        per_frame = stats["decode_ms"] / stats["frames_decoded"] if stats["frames_decoded"] else 0.0
+        mark = f"{stats['time_to_mark']:.2f}s" if stats["found"] else "not found"
+        print(f"{label:<22}{stats['frames_seen']:>6}{stats['frames_decoded']:>9}"
+              f"{stats['decode_ms']:>9.0f}{per_frame:>10.1f}{mark:>14}")
+
+
+if __name__ == "__main__":
+    main()
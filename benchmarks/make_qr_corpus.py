@@ -0,0 +1,135 @@
+"""Generate the synthetic QR photo corpus used by the decode benchmarks.
+
+Each image renders a session QR ("SESSION:<class>:<teacher>:<timestamp>")
+onto a textured background with one of the distortions phones typically
+produce: distance, rotation, perspective, blur, glare, low light or
+sensor noise. A few images contain no QR at all so failure cost is
+measured too. Expected payloads are written to labels.csv.
+
+    python benchmarks/make_qr_corpus.py [--out benchmarks/qr_corpus]
+"""
+import argparse
+import csv
+import os
+
+import cv2
+import numpy as np
+
+FRAME_SIZE = (1280, 720)
+
+
+def render_qr(text, module_px=8):
+    encoder = cv2.QRCodeEncoder.create()
+    qr = encoder.encode(text)
+    qr = cv2.resize(qr, None, fx=module_px, fy=module_px, interpolation=cv2.INTER_NEAREST)
+    return cv2.copyMakeBorder(qr, 32, 32, 32, 32, cv2.BORDER_CONSTANT, value=255)
+
+
+def background(rng):
+    width, height = FRAME_SIZE
+    base = rng.integers(90, 200, size=3)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = base
+    noise = rng.normal(0, 12, size=(height // 8, width // 8, 3))
+    noise = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def place(frame, qr, size, center, angle=0.0, perspective=0.0, rng=None):
+    """Warp qr (grayscale) into frame at center with the given side length"""
+    h, w = qr.shape
+    src = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    half = size / 2
+    dst = np.float32([[-half, -half], [half, -half], [half, half], [-half, half]])
+    theta = np.deg2rad(angle)
+    rot = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+    dst = dst @ rot.T
+    if perspective and rng is not None:
+        dst += rng.uniform(-perspective, perspective, size=dst.shape) * size
+    dst += np.float32(center)
+    matrix = cv2.getPerspectiveTransform(src, dst.astype(np.float32))
+    warped = cv2.warpPerspective(qr, matrix, FRAME_SIZE, borderValue=0)
+    mask = cv2.warpPerspective(np.full_like(qr, 255), matrix, FRAME_SIZE, borderValue=0)
+    qr_bgr = cv2.cvtColor(warped, cv2.COLOR_GRAY2BGR)
+    frame[mask > 0] = qr_bgr[mask > 0]
+    return frame
+
+
+VARIANTS = {
+    "clean": dict(size=420),
+    "distant": dict(size=150),
+    "far": dict(size=105),
+    "rotated": dict(size=380, angle=27),
+    "tilted": dict(size=380, angle=-8, perspective=0.12),
+    "blurred": dict(size=400, blur=7),
+    "motion": dict(size=400, motion=15),
+    "low_contrast": dict(size=400, contrast=0.35),
+    "dark": dict(size=400, gain=0.3),
+    "glare": dict(size=400, glare=True),
+    "noisy": dict(size=360, noise=16),
+    "offcenter": dict(size=260, offset=(0.33, 0.28)),
+}
+
+
+def make_image(rng, text, spec):
+    frame = background(rng)
+    width, height = FRAME_SIZE
+    if text is not None:
+        dx, dy = spec.get("offset", (0, 0))
+        center = (width / 2 + dx * width, height / 2 + dy * height)
+        frame = place(frame, render_qr(text), spec["size"], center,
+                      spec.get("angle", 0.0), spec.get("perspective", 0.0), rng)
+    if spec.get("blur"):
+        k = spec["blur"]
+        frame = cv2.GaussianBlur(frame, (k, k), 0)
+    if spec.get("motion"):
+        k = spec["motion"]
+        kernel = np.zeros((k, k), dtype=np.float32)
+        kernel[k // 2, :] = 1.0 / k
+        frame = cv2.filter2D(frame, -1, kernel)
+    if spec.get("contrast"):
+        c = spec["contrast"]
+        frame = cv2.convertScaleAbs(frame, alpha=c, beta=128 * (1 - c))
+    if spec.get("gain"):
+        frame = cv2.convertScaleAbs(frame, alpha=spec["gain"], beta=0)
+    if spec.get("glare"):
+        yy, xx = np.mgrid[0:height, 0:width]
+        spot = np.exp(-(((xx - width * 0.55) ** 2) + ((yy - height * 0.45) ** 2)) / (2 * 160.0 ** 2))
+        frame = np.clip(frame + spot[..., None] * 140, 0, 255).astype(np.uint8)
+    if spec.get("noise"):
+        frame = np.clip(frame + rng.normal(0, spec["noise"], frame.shape), 0, 255).astype(np.uint8)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "qr_corpus"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--negatives", type=int, default=2)
+    parser.add_argument("--quality", type=int, default=75)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    rows = []
+    for index, (variant, spec) in enumerate(VARIANTS.items()):
+        text = f"SESSION:CS101:T01:{1760000000 + index}"
+        filename = f"{variant}.jpg"
+        cv2.imwrite(os.path.join(args.out, filename), make_image(rng, text, spec),
+                    [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+        rows.append((filename, text))
+    for index in range(args.negatives):
+        filename = f"no_qr_{index}.jpg"
+        cv2.imwrite(os.path.join(args.out, filename), make_image(rng, None, {}),
+                    [cv2.IMWRITE_JPEG_QUALITY, args.quality])
+        rows.append((filename, ""))
+
+    with open(os.path.join(args.out, "labels.csv"), "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["file", "expected"])
+        writer.writerows(rows)
+    print(f"Wrote {len(rows)} images to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
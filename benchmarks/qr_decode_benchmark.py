@@ -0,0 +1,106 @@
+"""Benchmark QR decode stages over the sample photo corpus.
+
+Reports, per stage and for the full pipelines, how many corpus images
+decode correctly and the mean milliseconds spent per frame.
+
+    python benchmarks/qr_decode_benchmark.py [--corpus DIR] [--backend auto|opencv|wechat]
+"""
+import argparse
+import csv
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from qr_decoder import ParallelDecoder, QRDecoder, STAGES, VARIANTS, get_backend, legacy_decode  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "qr_corpus")
+
+
+def load_corpus(corpus_dir):
+    with open(os.path.join(corpus_dir, "labels.csv"), newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    corpus = []
+    for row in rows:
+        with open(os.path.join(corpus_dir, row["file"]), "rb") as image:
+            corpus.append((row["file"], image.read(), row["expected"]))
+    return corpus
+
+
+def run(label, decode, corpus, repeat):
+    timings = []
+    correct = 0
+    positives = sum(1 for _, _, expected in corpus if expected)
+    misses = []
+    for name, data, expected in corpus:
+        for attempt in range(repeat):
+            start = time.perf_counter()
+            result = decode(data)
+            timings.append((time.perf_counter() - start) * 1000)
+        if expected and result.text == expected:
+            correct += 1
+        elif expected:
+            misses.append(name)
+    return {
+        "label": label,
+        "decoded": f"{correct}/{positives}",
+        "rate": correct / positives if positives else 0.0,
+        "mean_ms": statistics.mean(timings),
+        "p95_ms": sorted(timings)[int(len(timings) * 0.95) - 1],
+        "misses": misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--backend", default="auto", choices=["auto", "opencv", "wechat"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    backend = get_backend(args.backend)
+    print(f"{len(corpus)} images, backend={backend.name}, repeat={args.repeat}\n")
+
+    def staged(stages):
+        def decode(data):
+            # Fresh decoder per frame so ROI tracking does not leak between images
+            return QRDecoder(backend).decode_bytes(data, stages=stages)
+        return decode
+
+    results = [run("legacy (3 full passes)", legacy_decode, corpus, args.repeat)]
+    for stage in ("reduced", "full"):
+        results.append(run(f"stage: {stage}", staged((stage,)), corpus, args.repeat))
+    results.append(run("stage: reduced+roi_full", staged(("reduced", "roi_full")), corpus, args.repeat))
+    results.append(run("staged pipeline", staged(STAGES), corpus, args.repeat))
+
+    # Same image over and over approximates a steady camera: ROI tracking hits
+    tracker = QRDecoder(backend)
+    results.append(run("staged + ROI tracking", lambda data: tracker.decode_bytes(data), corpus, args.repeat))
+
+    def untracked(decoder):
+        def decode(data):
+            decoder.staged.last_box = None
+            return decoder.decode_bytes(data)
+        return decode
+
+    # parallel=True races the variants even on one core, to show what that costs
+    for cores, parallel in (("auto", None), ("forced", True)):
+        decoder = ParallelDecoder(args.backend, variants=["gray", "bgr", "enhanced"], parallel=parallel)
+        results.append(run(f"parallel, {cores} (3 var)", untracked(decoder), corpus, args.repeat))
+    variants = ParallelDecoder(args.backend, variants=list(VARIANTS))
+    results.append(run(f"variants only ({len(VARIANTS)})", variants.decode_variants, corpus, args.repeat))
+
+    print(f"{'mode':<26}{'decoded':>9}{'rate':>8}{'mean ms':>10}{'p95 ms':>10}")
+    for row in results:
+        print(f"{row['label']:<26}{row['decoded']:>9}{row['rate']:>8.0%}"
+              f"{row['mean_ms']:>10.1f}{row['p95_ms']:>10.1f}")
+    for row in results:
+        if row["misses"]:
+            print(f"\n{row['label']} missed: {', '.join(row['misses'])}")
+
+
+if __name__ == "__main__":
+    main()
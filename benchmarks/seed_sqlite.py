@@ -0,0 +1,79 @@
+"""Seed a local SQLite database with a synthetic class history.
+
+    python benchmarks/seed_sqlite.py --path bench.db --students 200 --days 365
+
+Student i is named STUDENT0001... with parent email student0001@example.com.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from storage import SQLiteStorage, badge_for_count  # noqa: E402
+
+
+def student_name(index):
+    return f"STUDENT{index:04d}"
+
+
+def student_email(index):
+    return f"student{index:04d}@example.com"
+
+
+def class_dates(days, end=None):
+    """Weekday dates over the last `days` calendar days"""
+    end = end or date.today() - timedelta(days=1)
+    dates = []
+    for offset in range(days, 0, -1):
+        day = end - timedelta(days=offset - 1)
+        if day.weekday() < 5:
+            dates.append(day.isoformat())
+    return dates
+
+
+def seed(storage, students, days, attendance_rate=0.8, seed=1):
+    rng = random.Random(seed)
+    dates = class_dates(days)
+    with storage.lock:
+        conn = storage.conn
+        conn.execute("begin")
+        conn.executemany(
+            "insert into students_data values (?, ?)",
+            [(student_name(i), student_email(i)) for i in range(students)],
+        )
+        rewards = []
+        for i in range(students):
+            # Each student gets their own habit around the class average
+            rate = min(max(rng.gauss(attendance_rate, 0.12), 0.05), 1.0)
+            attended = [d for d in dates if rng.random() < rate]
+            conn.executemany(
+                'insert or ignore into "Attendance" values (?, ?, ?, ?)',
+                [(student_name(i), d, f"09:{rng.randint(0, 59):02d}:00", "Student QR") for d in attended],
+            )
+            rewards.append((student_name(i), len(attended), badge_for_count(len(attended))))
+        conn.executemany("insert or replace into rewards values (?, ?, ?)", rewards)
+        conn.execute("commit")
+    return dates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="bench.db")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--rate", type=float, default=0.8)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        os.remove(args.path)
+    with SQLiteStorage(args.path) as storage:
+        dates = seed(storage, args.students, args.days, args.rate)
+        rows = storage.conn.execute('select count(*) from "Attendance"').fetchone()[0]
+    print(f"Seeded {args.students} students, {len(dates)} class dates, {rows} attendance rows into {args.path}")
+
+
+if __name__ == "__main__":
+    main()
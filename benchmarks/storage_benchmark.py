@@ -0,0 +1,60 @@
+"""Time the portal's hot-path storage operations against a seeded SQLite database.
+
+Compares the per-view queries with the original full-table strategy
+(select every Attendance row, then take the unique dates in pandas).
+
+    python benchmarks/seed_sqlite.py --path bench.db
+    python benchmarks/storage_benchmark.py --path bench.db
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd  # noqa: E402
+
+from storage import SQLiteStorage  # noqa: E402
+from seed_sqlite import student_email, student_name  # noqa: E402
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="bench.db")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with SQLiteStorage(args.path) as storage:
+        name = student_name(0)
+
+        def full_scan_dates():
+            rows = storage._query('select * from "Attendance"')
+            return len(pd.DataFrame(rows)["Date"].unique())
+
+        cases = [
+            ("login lookup", lambda: storage.find_student(name, student_email(0))),
+            ("student records", lambda: storage.get_attendance(name)),
+            ("records page (projected)", lambda: storage.get_attendance_page(name, ("Date", "Time", "Method"), limit=26)),
+            ("reward row", lambda: storage.get_reward(name)),
+            ("class dates (distinct)", storage.get_class_dates),
+            ("class dates (full scan)", full_scan_dates),
+        ]
+        print(f"{'operation':<26}{'median ms':>11}{'max ms':>10}")
+        for label, func in cases:
+            median, worst = timed(func, args.repeat)
+            print(f"{label:<26}{median:>11.2f}{worst:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Time a view's reads one after another versus prefetched concurrently.
+
+Wraps a seeded SQLite database in a fixed per-call delay standing in for
+the backend round trip, and loads what a cold chatbot answer needs (class
+dates, the student's records, the reward row, then the percentage and the
+records again) through a fresh AttendanceRepository each time.
+
+    python benchmarks/seed_sqlite.py --path bench.db
+    python benchmarks/view_load_benchmark.py --path bench.db --rtt 150
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import instrumentation  # noqa: E402
+from attendance_repository import AttendanceRepository  # noqa: E402
+from storage import SQLiteStorage  # noqa: E402
+from seed_sqlite import student_name  # noqa: E402
+
+
+class LatentStorage:
+    """Storage proxy that sleeps for the round trip before every call"""
+
+    def __init__(self, inner, rtt):
+        self.inner = inner
+        self.rtt = rtt
+
+    def __getattr__(self, attr):
+        value = getattr(self.inner, attr)
+        if not callable(value):
+            return value
+
+        def delayed(*args, **kwargs):
+            time.sleep(self.rtt)
+            return value(*args, **kwargs)
+
+        return delayed
+
+
+def render(repository, name):
+    """The reads the chatbot view makes, in the order it makes them"""
+    class_dates = repository.get_class_dates()
+    records = repository.get_attendance(name)
+    attended = len({r["Date"] for r in repository.get_attendance(name)})
+    badge = repository.get_badge(name)
+    return len(class_dates), len(records), attended, badge
+
+
+def run(storage, name, prefetch):
+    repository = AttendanceRepository(storage)
+    with instrumentation.rerun_trace("view") as trace:
+        start = time.perf_counter()
+        with repository.rerun_scope():
+            if prefetch:
+                repository.prefetch([
+                    repository.get_class_dates,
+                    lambda: repository.get_attendance(name),
+                    lambda: repository.get_badge(name),
+                ])
+            render(repository, name)
+        elapsed = (time.perf_counter() - start) * 1000
+    return elapsed, trace.backend_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="bench.db")
+    parser.add_argument("--rtt", type=float, default=150, help="simulated backend round trip in ms")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with SQLiteStorage(args.path) as sqlite_storage:
+        storage = LatentStorage(instrumentation.instrument_storage(sqlite_storage), args.rtt / 1000)
+        name = student_name(0)
+
+        print(f"{'loading':<14}{'median ms':>11}{'max ms':>10}{'calls':>7}")
+        for label, prefetch in (("sequential", False), ("prefetched", True)):
+            runs = [run(storage, name, prefetch) for _ in range(args.repeat)]
+            timings = [ms for ms, _ in runs]
+            print(f"{label:<14}{statistics.median(timings):>11.1f}{max(timings):>10.1f}{runs[-1][1]:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import json
+import queue
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# (connect, read) seconds; read bounds the gap between streamed chunks
+DEFAULT_TIMEOUT = (3.05, 20)
+# Seconds to wait for the first token before falling back
+FIRST_TOKEN_BUDGET = 4.0
+
+_session = None
+_session_lock = threading.Lock()
+_DONE = object()
+
+
+class ChatUnavailable(Exception):
+    """The model could not start answering in time"""
+
+
+def get_session():
+    """Process-wide HTTP session so every Streamlit session reuses connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=0)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _iter_sse_content(response):
+    """Yield content deltas from an OpenAI-compatible event stream"""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            delta = json.loads(data)["choices"][0]["delta"].get("content")
+        except (ValueError, KeyError, IndexError):
+            continue
+        if delta:
+            yield delta
+
+
+def stream_completion(api_key, model, messages, temperature=0.7,
+                      first_token_budget=FIRST_TOKEN_BUDGET, timeout=DEFAULT_TIMEOUT):
+    """Start a streamed chat completion and return an iterator of text chunks.
+
+    Blocks only until the first token arrives. Raises ChatUnavailable if the
+    request fails or no token arrives within first_token_budget seconds, so
+    callers can answer some other way without waiting out the full timeout.
+    """
+    chunks = queue.Queue()
+    abandoned = threading.Event()
+    holder = {}
+
+    def reader():
+        try:
+            response = get_session().post(
+                GROQ_URL,
+                headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+                json={"model": model, "messages": messages, "temperature": temperature, "stream": True},
+                timeout=timeout,
+                stream=True,
+            )
+            holder["response"] = response
+            with response:
+                response.raise_for_status()
+                for delta in _iter_sse_content(response):
+                    if abandoned.is_set():
+                        return
+                    chunks.put(delta)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(_DONE)
+
+    threading.Thread(target=reader, daemon=True, name="groq-stream").start()
+
+    try:
+        first = chunks.get(timeout=first_token_budget)
+    except queue.Empty:
+        abandoned.set()
+        response = holder.get("response")
+        if response is not None:
+            response.close()
+        raise ChatUnavailable(f"no token within {first_token_budget}s")
+    if first is _DONE:
+        raise ChatUnavailable("empty completion")
+    if isinstance(first, Exception):
+        raise ChatUnavailable(str(first)) from first
+
+    def rest():
+        yield first
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        while True:
+            try:
+                item = chunks.get(timeout=read_timeout)
+            except queue.Empty:
+                abandoned.set()
+                return
+            if item is _DONE or isinstance(item, Exception):
+                # A mid-stream failure keeps whatever was already shown
+                return
+            yield item
+
+    return rest()
+
@@ -0,0 +1,95 @@
+import re
+from collections import deque
+from itertools import islice
+
+# Messages kept per session; older ones survive only in the summary
+MAX_MESSAGES = 200
+# Messages rendered before the student asks for earlier ones
+RENDER_WINDOW = 20
+# Rough token budgets for the prior turns and the summary sent to the model
+CONTEXT_TOKEN_BUDGET = 1200
+SUMMARY_TOKEN_BUDGET = 250
+# Characters of a folded message kept in the summary
+SUMMARY_LINE_CHARS = 160
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+def _gist(content):
+    """First sentence of a message, clipped to SUMMARY_LINE_CHARS"""
+    text = " ".join(content.split())
+    text = _SENTENCE_END.split(text, maxsplit=1)[0]
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+    return text
+
+
+class ChatMemory:
+    """Bounded chat transcript with a rolling summary of turns past the context window.
+
+    Messages drop out of the model context oldest first as the conversation
+    outgrows the token budget; each is folded into the summary exactly once,
+    and the summary drops its own oldest lines to stay within
+    SUMMARY_TOKEN_BUDGET.
+    """
+
+    def __init__(self, max_messages=MAX_MESSAGES):
+        self.messages = deque(maxlen=max_messages)
+        self.total = 0  # Messages ever appended; gives each one an absolute index
+        self.folded = 0  # Absolute index of the first message not yet summarized
+        self.summary_lines = deque()
+        self.summary_tokens = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def append(self, role, content):
+        if len(self.messages) == self.messages.maxlen:
+            # About to drop the oldest message; keep its gist first
+            oldest = self.total - len(self.messages)
+            if oldest >= self.folded:
+                self._fold(self.messages[0])
+                self.folded = oldest + 1
+        self.messages.append({"role": role, "content": content})
+        self.total += 1
+
+    def window(self, size=RENDER_WINDOW):
+        """The latest size messages, oldest first"""
+        return list(islice(self.messages, max(0, len(self.messages) - size), None))
+
+    @property
+    def summary(self):
+        return "\n".join(self.summary_lines)
+
+    def context(self, budget=CONTEXT_TOKEN_BUDGET):
+        """(summary, recent messages) that fit the token budget for a model request"""
+        recent = []
+        used = 0
+        for message in reversed(self.messages):
+            tokens = estimate_tokens(message["content"])
+            if used + tokens > budget:
+                break
+            recent.append(message)
+            used += tokens
+        recent.reverse()
+
+        # Everything older than the slice that the summary hasn't seen yet
+        first_kept = self.total - len(recent)
+        start = self.total - len(self.messages)
+        for index in range(max(self.folded, start), first_kept):
+            self._fold(self.messages[index - start])
+        self.folded = max(self.folded, first_kept)
+        return self.summary, recent
+
+    def _fold(self, message):
+        speaker = "Student" if message["role"] == "user" else "Assistant"
+        line = f"{speaker}: {_gist(message['content'])}"
+        self.summary_lines.append(line)
+        self.summary_tokens += estimate_tokens(line)
+        while self.summary_tokens > SUMMARY_TOKEN_BUDGET and len(self.summary_lines) > 1:
+            self.summary_tokens -= estimate_tokens(self.summary_lines.popleft())
@@ -0,0 +1,175 @@
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+
+import instrumentation
+
+# Questions asking for advice or explanation always go to the model, even
+# when they mention attendance
+OPEN_ENDED = re.compile(
+    r"\b(why|improve|should|advice|tips?|suggest|recommend|explain|help me|what if|plan|motivat\w*|how (do|can) i)\b"
+)
+
+# Local answers are about the student's own overall record as of today;
+# another date, period or subject (policy, classmates) needs the model
+QUALIFIED = re.compile(
+    r"\b(yesterday|tomorrow|ago|last|next|since|between|before|after|until|during|"
+    r"weeks?|weekly|months?|monthly|term|semester|year|date|polic(y|ies)|rules?|average|others|everyone|"
+    r"(mon|tues|wednes|thurs|fri|satur|sun)days?|"
+    r"january|february|march|april|june|july|august|september|october|november|december|"
+    r"jan|feb|mar|apr|jun|jul|aug|sept?|oct|nov|dec)\b"
+    r"|\d{1,4}[-/.]\d{1,2}"
+)
+
+# Every local intent is about the asker
+PERSONAL = re.compile(r"\b(i|i'm|im|me|my)\b")
+
+# Ordered: the first intent with a matching pattern wins
+INTENT_PATTERNS = [
+    ("today", [
+        r"\btoday\b",
+        r"\bdid i (mark|attend|scan)\w*\b",
+        r"\b(am|was) i marked\b",
+    ]),
+    ("streak", [
+        r"\bstreaks?\b",
+        r"\b(classes|days|lectures) in a row\b",
+        r"\bconsecutive (classes|days|lectures)\b",
+    ]),
+    ("missed", [
+        r"\b(did|have) i (miss|skip)\w*\b",
+        r"\b(classes|days|lectures) (have |did )?i (miss|skip)\w*\b",
+        r"\bmy absences?\b",
+        r"\bhow many absences\b",
+        r"\b(was|have) i (been )?absent\b",
+    ]),
+    ("badge", [
+        r"\bmy (badges?|rewards?)\b",
+        r"\b(badges?|rewards?) (do|did|have) i\b",
+        r"\bdo i have (a |the )?(gold|silver|bronze|badge)\b",
+    ]),
+    ("percentage", [
+        r"\bmy (overall |total )?(attendance|percentage|rate)\b",
+        r"\bhow many (classes|days|times|lectures) (have|did) i (attend\w*|come|go)\b",
+        r"\bam i (above|below|safe|eligible|on track)\b",
+    ]),
+    ("name", [
+        r"\bwho am i\b",
+        r"\bmy name\b",
+    ]),
+]
+
+_COMPILED = [(intent, [re.compile(p) for p in patterns]) for intent, patterns in INTENT_PATTERNS]
+
+
+class RouterMetrics:
+    """Process-wide counts of locally answered vs model-routed questions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.intents = Counter()
+        self.local = 0
+        self.model = 0
+
+    def record(self, intent):
+        with self._lock:
+            if intent is None:
+                self.model += 1
+            else:
+                self.local += 1
+                self.intents[intent] += 1
+
+    def hit_rate(self):
+        with self._lock:
+            total = self.local + self.model
+            return self.local / total if total else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "local": self.local,
+                "model": self.model,
+                "hit_rate": self.local / (self.local + self.model) if self.local + self.model else 0.0,
+                "intents": dict(self.intents),
+            }
+
+
+metrics = RouterMetrics()
+
+
+def prometheus_lines():
+    """Router counters for instrumentation.prometheus_text()"""
+    snap = metrics.snapshot()
+    lines = [
+        "# TYPE portal_chat_questions_total counter",
+        f'portal_chat_questions_total{{route="local"}} {snap["local"]}',
+        f'portal_chat_questions_total{{route="model"}} {snap["model"]}',
+        "# TYPE portal_chat_local_hit_rate gauge",
+        f"portal_chat_local_hit_rate {snap['hit_rate']:.4f}",
+        "# TYPE portal_chat_intents_total counter",
+    ]
+    lines += [f'portal_chat_intents_total{{intent="{intent}"}} {count}'
+              for intent, count in sorted(snap["intents"].items())]
+    return lines
+
+
+instrumentation.register_prometheus(prometheus_lines)
+
+
+def classify(user_query):
+    """Deterministic intent for a question, or None if the model should answer"""
+    query = user_query.lower().strip()
+    if not query or OPEN_ENDED.search(query) or QUALIFIED.search(query) or not PERSONAL.search(query):
+        return None
+    for intent, patterns in _COMPILED:
+        if any(p.search(query) for p in patterns):
+            return intent
+    return None
+
+
+def answer(intent, student_name, facts):
+    """Render the answer for a local intent from already loaded student facts.
+
+    facts holds attended, total, percentage, records, badge and class_dates.
+    """
+    attended, total, percentage = facts["attended"], facts["total"], facts["percentage"]
+    records = facts["records"]
+
+    if intent == "name":
+        return f"Your name is {student_name}. You are logged into the FaceMark Pro student portal."
+
+    if intent == "percentage":
+        return f"Your attendance: {attended}/{total} classes ({percentage}%). {'✅ Above 75% requirement!' if percentage >= 75 else '⚠️ Below 75% requirement.'}"
+
+    if intent == "today":
+        today = datetime.now().strftime("%Y-%m-%d")
+        today_record = [r for r in records if r["Date"] == today]
+        if today_record:
+            return f"✅ Yes, you marked attendance today at {today_record[0]['Time']} via {today_record[0]['Method']}."
+        return "❌ No, you haven't marked attendance today yet."
+
+    if intent == "badge":
+        badge = facts["badge"].get("Badge", "No Badge")
+        count = facts["badge"].get("AttendanceCount", 0)
+        if badge == "No Badge":
+            return f"You don't have a badge yet ({count} attendances). Bronze unlocks at 4 attendances."
+        return f"🏆 You hold the {badge} badge with {count} attendances."
+
+    student_dates = {r["Date"] for r in records}
+
+    if intent == "streak":
+        # NumPy is only loaded for this intent
+        from attendance_matrix import student_streaks
+        current, longest = student_streaks(facts["class_dates"], student_dates)
+        return f"🔥 Current streak: {current} class{'es' if current != 1 else ''} in a row. Longest streak: {longest}."
+
+    if intent == "missed":
+        missed = [d for d in sorted(facts["class_dates"]) if d not in student_dates]
+        if not missed:
+            return "✅ You haven't missed a single class. Great job!"
+        shown = ", ".join(missed[-10:])
+        more = f" (showing the latest 10 of {len(missed)})" if len(missed) > 10 else ""
+        return f"You missed {len(missed)} class{'es' if len(missed) != 1 else ''}: {shown}{more}."
+
+    raise ValueError(f"Unknown intent: {intent}")
@@ -0,0 +1,127 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the backend's class calendar
+REFRESH_SECONDS = float(os.environ.get("CLASS_CALENDAR_REFRESH_SECONDS", "30"))
+# Seconds a locally added date is shown before the backend has to confirm it;
+# a mark that never lands (parked by the write-behind queue) must not keep
+# counting as a class for everyone
+PENDING_SECONDS = float(os.environ.get("CLASS_CALENDAR_PENDING_SECONDS", "600"))
+
+
+class ClassCalendar:
+    """Process-wide snapshot of the distinct class dates, shared by every session.
+
+    A daemon thread polls the backend's calendar version each interval and
+    reloads the dates only when it moved (or every interval on backends
+    without a version). Readers get an immutable tuple; updates swap in a
+    new one, so reads never take a lock.
+    """
+
+    def __init__(self, storage, interval=REFRESH_SECONDS, pending_seconds=PENDING_SECONDS):
+        self.storage = storage
+        self.interval = interval
+        self.pending_seconds = pending_seconds
+        self._dates = None
+        self._version = None
+        # Dates as last reported by the backend
+        self._loaded = frozenset()
+        # Dates added locally that the backend has not reported yet -> when added
+        self._pending = {}
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.polls = 0
+        self.reloads = 0
+
+    def dates(self):
+        """Sorted tuple of class dates; the first caller loads it"""
+        if self._dates is None:
+            with self.refresh_lock:
+                # Sessions that queued behind the first load find it done
+                if self._dates is None:
+                    self._refresh(force=True)
+        return self._dates
+
+    def refresh(self, force=False):
+        """Reload the dates if the calendar version moved; True if they were reloaded"""
+        with self.refresh_lock:
+            return self._refresh(force)
+
+    def _refresh(self, force):
+        version = self.storage.get_class_calendar_version()
+        self.polls += 1
+        if not force and version is not None and version == self._version:
+            with self.lock:
+                self._expire_pending()
+            return False
+
+        loaded = frozenset(self.storage.get_class_dates())
+        with self.lock:
+            self._loaded = loaded
+            self._expire_pending()
+            self._version = version
+        self.reloads += 1
+        return True
+
+    def _expire_pending(self):
+        # Caller holds self.lock; republishes the dates
+        cutoff = time.monotonic() - self.pending_seconds
+        self._pending = {date: added for date, added in self._pending.items()
+                         if date not in self._loaded and added >= cutoff}
+        self._dates = tuple(sorted(self._loaded.union(self._pending)))
+
+    def add(self, date):
+        """Record a date that just got a mark without waiting for the next refresh"""
+        with self.lock:
+            if self._dates is None or date in self._dates:
+                return
+            self._pending[date] = time.monotonic()
+            self._dates = tuple(sorted((*self._dates, date)))
+
+    def stats(self):
+        return {
+            "dates": len(self._dates or ()),
+            "version": self._version,
+            "polls": self.polls,
+            "reloads": self.reloads,
+        }
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            if self._dates is None:
+                continue  # Nobody has asked yet
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the last snapshot until the backend recovers
+                logger.exception("Error refreshing class calendar")
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True, name="class-calendar")
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_class_calendar(storage):
+    """Process-wide calendar with its refresher running"""
+    global _calendar
+    with _calendar_lock:
+        if _calendar is None:
+            _calendar = ClassCalendar(storage).start()
+        return _calendar
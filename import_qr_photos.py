@@ -0,0 +1,201 @@
+"""Mark attendance in bulk from a folder of proctor-collected QR snapshots.
+
+    python import_qr_photos.py PHOTOS_DIR --session CS101 [--dry-run]
+
+Each photo is credited to the student named by its folder
+(PHOTOS_DIR/<Student Name>/*.jpg) unless --manifest maps file names to
+students. The scan time comes from the photo's EXIF capture time (file
+modification time when there is none) and the session QR is validated
+against that moment. Photos decode in parallel across all cores; results
+print as they finish and accepted marks are written in one batch.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from session_qr import QR_VALIDITY_SECONDS, validate_session_qr
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+# EXIF tags: DateTimeOriginal and OffsetTimeOriginal in the Exif IFD,
+# DateTime in the main IFD
+EXIF_IFD = 0x8769
+DATETIME_ORIGINAL = 36867
+OFFSET_TIME_ORIGINAL = 36881
+DATETIME = 306
+
+# Preprocessing variants tried after the staged pipeline misses
+FALLBACK_VARIANTS = ["clahe", "adaptive", "inverted", "rotated"]
+
+METHOD = "Proctor QR Import"
+
+_decoder = None
+_fallback = None
+
+
+def scan_time(path):
+    """(unix timestamp, source) for when the photo was taken"""
+    try:
+        from PIL import Image
+        with Image.open(path) as image:
+            exif = image.getexif()
+            stamp = exif.get_ifd(EXIF_IFD).get(DATETIME_ORIGINAL) or exif.get(DATETIME)
+            offset = exif.get_ifd(EXIF_IFD).get(OFFSET_TIME_ORIGINAL)
+        if stamp:
+            stamp = stamp.strip("\x00 ")
+            if offset:
+                taken = datetime.strptime(f"{stamp}{offset.replace(':', '')}", "%Y:%m:%d %H:%M:%S%z")
+            else:
+                # No offset recorded: camera clocks are in local time
+                taken = datetime.strptime(stamp, "%Y:%m:%d %H:%M:%S")
+            return taken.timestamp(), "exif"
+    except Exception:
+        pass
+    return os.path.getmtime(path), "mtime"
+
+
+def _init_worker():
+    global _decoder, _fallback
+    import cv2
+    from concurrent.futures import ThreadPoolExecutor
+    from qr_decoder import ParallelDecoder, QRDecoder
+
+    # One process per core already; OpenCV's own threads would oversubscribe
+    cv2.setNumThreads(1)
+    _decoder = QRDecoder()
+    _fallback = ParallelDecoder(variants=FALLBACK_VARIANTS, executor=ThreadPoolExecutor(max_workers=1))
+
+
+def decode_photo(path, session_id, window):
+    """Decode and validate one photo; runs in a pool worker"""
+    start = time.perf_counter()
+    result = {"path": path, "text": "", "stage": None}
+    try:
+        scanned_at, source = scan_time(path)
+        result.update(scanned_at=scanned_at, time_source=source)
+
+        def accept(text):
+            return validate_session_qr(text, session_id, now=scanned_at, window=window)
+
+        with open(path, "rb") as handle:
+            data = handle.read()
+        # Unrelated photos: don't let one photo's QR position steer the next
+        _decoder.last_box = None
+        decoded = _decoder.decode_bytes(data)
+        if not decoded.text:
+            decoded = _fallback.decode_variants(data, accept=accept)
+        result.update(text=decoded.text, stage=decoded.stage)
+        if not decoded.text:
+            result["status"] = "no_qr"
+        elif accept(decoded.text):
+            result["status"] = "accepted"
+        else:
+            result["status"] = "rejected"
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    result["decode_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def find_photos(folder, manifest=None):
+    """[(path, student name)] for every image under folder"""
+    names = {}
+    if manifest:
+        with open(manifest, newline="") as handle:
+            names = {row["file"]: row["name"] for row in csv.DictReader(handle)}
+
+    photos = []
+    for root, _, files in os.walk(folder):
+        for filename in sorted(files):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, filename)
+            relative = os.path.relpath(path, folder)
+            name = names.get(relative) or names.get(filename)
+            if name is None and root != folder:
+                name = os.path.basename(root)
+            photos.append((path, name))
+    return photos
+
+
+def to_record(name, scanned_at):
+    taken = datetime.fromtimestamp(scanned_at)
+    return {
+        "Name": name.strip().upper(),
+        "Date": taken.strftime("%Y-%m-%d"),
+        "Time": taken.strftime("%H:%M:%S"),
+        "Method": METHOD,
+    }
+
+
+def keep_earliest(marks, record):
+    """Add record to marks, keyed by (Name, Date), unless an earlier scan that day is there"""
+    key = (record["Name"], record["Date"])
+    # Several photos of one student on one day: keep the earliest
+    if key not in marks or record["Time"] < marks[key]["Time"]:
+        marks[key] = record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--session", required=True, help="session (class) ID the QR codes must carry")
+    parser.add_argument("--manifest", help="CSV with file,name columns mapping photos to students")
+    parser.add_argument("--window", type=int, default=QR_VALIDITY_SECONDS,
+                        help="seconds allowed between QR generation and capture (camera clock skew)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dry-run", action="store_true", help="decode and report without writing marks")
+    args = parser.parse_args()
+
+    photos = find_photos(args.folder, args.manifest)
+    unnamed = [path for path, name in photos if not name]
+    photos = [(path, name) for path, name in photos if name]
+    if not photos:
+        sys.exit(f"No attributable photos under {args.folder}")
+    owners = dict(photos)
+
+    counts = {"accepted": 0, "rejected": 0, "no_qr": 0, "error": 0}
+    marks = {}
+    decode_ms = 0.0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(decode_photo, path, args.session, args.window) for path, _ in photos]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            counts[result["status"]] += 1
+            decode_ms += result["decode_ms"]
+            name = owners[result["path"]]
+            detail = result.get("error") or result["text"] or "-"
+            print(f"[{done}/{len(photos)}] {result['status']:<9}{name:<24}"
+                  f"{os.path.relpath(result['path'], args.folder)}  {detail}", flush=True)
+            if result["status"] == "accepted":
+                keep_earliest(marks, to_record(name, result["scanned_at"]))
+    elapsed = time.perf_counter() - start
+
+    written = already = 0
+    if marks and not args.dry_run:
+        from storage import get_storage
+        results = get_storage().mark_attendance_batch(sorted(marks.values(), key=lambda r: (r["Date"], r["Time"])))
+        written = sum(1 for _, is_new, _ in results if is_new)
+        already = len(results) - written
+
+    print()
+    print(f"{len(photos)} photos in {elapsed:.1f}s ({len(photos) / elapsed:.1f} photos/s, "
+          f"{decode_ms / len(photos):.0f} ms decode per photo, {args.workers} workers)")
+    print(f"  accepted {counts['accepted']}, rejected {counts['rejected']} (wrong session or expired), "
+          f"no QR {counts['no_qr']}, errors {counts['error']}")
+    if unnamed:
+        print(f"  skipped {len(unnamed)} photos with no student name")
+    duplicates = counts["accepted"] - len(marks)
+    if args.dry_run:
+        print(f"  {len(marks)} marks would be written ({duplicates} duplicate photos)")
+    else:
+        print(f"  {written} new marks written, {already} already marked, {duplicates} duplicate photos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import functools
+import inspect
+import io
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Export targets; unset disables that exporter
+METRICS_JSONL_PATH = os.environ.get("METRICS_JSONL_PATH")
+METRICS_PROM_PATH = os.environ.get("METRICS_PROM_PATH")
+
+_local = threading.local()
+_aggregate_lock = threading.Lock()
+# span name -> [count, total_ms, max_ms], across every session in the process
+_aggregates = defaultdict(lambda: [0, 0.0, 0.0])
+_totals = {"reruns": 0, "backend_calls": 0}
+# Callables returning extra Prometheus lines from other modules
+_prometheus_collectors = []
+# Held while a rerun is profiled; cProfile is process-wide on Python 3.12+
+_profile_lock = threading.Lock()
+
+
+class Trace:
+    """Spans and backend round trips recorded during one script or fragment run"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.spans = []
+        self.backend_calls = 0
+        self.total_ms = 0.0
+        self.profile = None
+
+    def breakdown(self):
+        """Per-span-name (name, count, total_ms) rows, slowest first"""
+        rows = defaultdict(lambda: [0, 0.0])
+        for name, ms in self.spans:
+            rows[name][0] += 1
+            rows[name][1] += ms
+        return sorted(((n, c, round(t, 1)) for n, (c, t) in rows.items()), key=lambda r: -r[2])
+
+    def to_dict(self):
+        return {
+            "ts": self.started,
+            "trace": self.name,
+            "total_ms": round(self.total_ms, 1),
+            "backend_calls": self.backend_calls,
+            "spans": {name: {"count": count, "ms": ms} for name, count, ms in self.breakdown()},
+        }
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+def _record(name, ms):
+    with _aggregate_lock:
+        entry = _aggregates[name]
+        entry[0] += 1
+        entry[1] += ms
+        entry[2] = max(entry[2], ms)
+
+
+@contextmanager
+def span(name):
+    """Time a block under a named span"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        _record(name, ms)
+        trace = current_trace()
+        if trace is not None:
+            trace.spans.append((name, ms))
+
+
+def count_backend_call():
+    trace = current_trace()
+    with _aggregate_lock:
+        _totals["backend_calls"] += 1
+        # Worker threads may share the trace (see attach)
+        if trace is not None:
+            trace.backend_calls += 1
+
+
+@contextmanager
+def attach(trace):
+    """Record spans and backend calls made on a worker thread into the caller's trace"""
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def _start_profiler(trace):
+    """An enabled cProfile.Profile, or None if another rerun is being profiled.
+
+    Sessions rerun on concurrent threads and Python 3.12+ refuses a second
+    active profiler, so only one rerun per process is profiled at a time.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        trace.profile = "Not profiled: another rerun was being profiled"
+        return None
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Some other tool (a debugger, a sampling profiler) holds the hook
+        _profile_lock.release()
+        trace.profile = "Not profiled: another profiler is active"
+        return None
+    return profiler
+
+
+@contextmanager
+def rerun_trace(name, profile=False, on_finish=None):
+    """Collect a Trace for the enclosed run; nested calls join the outer trace"""
+    if current_trace() is not None:
+        with span(name):
+            yield current_trace()
+        return
+
+    trace = Trace(name)
+    _local.trace = trace
+    profiler = _start_profiler(trace) if profile else None
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        if profiler:
+            import pstats
+            profiler.disable()
+            _profile_lock.release()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+            trace.profile = out.getvalue()
+        trace.total_ms = (time.perf_counter() - start) * 1000
+        _local.trace = None
+        _record(f"rerun.{name}", trace.total_ms)
+        with _aggregate_lock:
+            _totals["reruns"] += 1
+        export(trace)
+        if on_finish is not None:
+            on_finish(trace)
+
+
+def traced(name, on_finish=None):
+    """Decorator form of rerun_trace, for fragments that rerun on their own"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with rerun_trace(name, on_finish=on_finish):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class InstrumentedStorage:
+    """Storage proxy that records a span per storage call.
+
+    Round trips are counted where they happen (count_backend_call in the
+    backends), so retries and paged reads each add one. Page iterators get
+    a span per page, since calling a generator does no work yet.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def __getattr__(self, attr):
+        value = getattr(self.inner, attr)
+        if not callable(value):
+            return value
+
+        if inspect.isgeneratorfunction(value):
+            @functools.wraps(value)
+            def instrumented(*args, **kwargs):
+                return _spanned_pages(f"backend.{attr}", value(*args, **kwargs))
+
+            return instrumented
+
+        @functools.wraps(value)
+        def instrumented(*args, **kwargs):
+            with span(f"backend.{attr}"):
+                return value(*args, **kwargs)
+
+        return instrumented
+
+
+def _spanned_pages(name, pages):
+    while True:
+        with span(name):
+            page = next(pages, None)
+        if page is None:
+            return
+        yield page
+
+
+_wrapped = {}
+
+
+def instrument_storage(storage):
+    """Shared InstrumentedStorage for a backend instance"""
+    wrapper = _wrapped.get(id(storage))
+    if wrapper is None or wrapper.inner is not storage:
+        wrapper = _wrapped[id(storage)] = InstrumentedStorage(storage)
+    return wrapper
+
+
+def snapshot():
+    """Process-wide aggregates: {span: {count, total_ms, max_ms}} plus totals"""
+    with _aggregate_lock:
+        spans = {name: {"count": c, "total_ms": round(t, 1), "max_ms": round(m, 1)}
+                 for name, (c, t, m) in _aggregates.items()}
+        return {"spans": spans, **_totals}
+
+
+def register_prometheus(collector):
+    """Add a callable whose returned lines are appended to prometheus_text()"""
+    _prometheus_collectors.append(collector)
+
+
+def _prom_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text():
+    snap = snapshot()
+    lines = [
+        "# TYPE portal_reruns_total counter",
+        f"portal_reruns_total {snap['reruns']}",
+        "# TYPE portal_backend_calls_total counter",
+        f"portal_backend_calls_total {snap['backend_calls']}",
+        "# TYPE portal_span_duration_ms summary",
+    ]
+    for name, stats in sorted(snap["spans"].items()):
+        label = _prom_label(name)
+        lines.append(f'portal_span_duration_ms_count{{span="{label}"}} {stats["count"]}')
+        lines.append(f'portal_span_duration_ms_sum{{span="{label}"}} {stats["total_ms"]}')
+    lines.append("# TYPE portal_span_max_ms gauge")
+    for name, stats in sorted(snap["spans"].items()):
+        lines.append(f'portal_span_max_ms{{span="{_prom_label(name)}"}} {stats["max_ms"]}')
+    for collector in _prometheus_collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+def export(trace):
+    """Append the trace to the JSON-lines file and rewrite the Prometheus file"""
+    try:
+        if METRICS_JSONL_PATH:
+            with _aggregate_lock, open(METRICS_JSONL_PATH, "a") as handle:
+                handle.write(json.dumps(trace.to_dict()) + "\n")
+        if METRICS_PROM_PATH:
+            text = prometheus_text()
+            tmp_path = f"{METRICS_PROM_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as handle:
+                handle.write(text)
+            # Atomic swap so a scraper never reads a half-written file
+            os.replace(tmp_path, METRICS_PROM_PATH)
+    except OSError as e:
+        print(f"Error exporting metrics: {e}")
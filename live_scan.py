@@ -0,0 +1,107 @@
+import threading
+import time
+
+import cv2
+
+from qr_decoder import QRDecoder
+
+# Decode one frame in this many; the rest are dropped unexamined
+FRAME_STRIDE = 3
+
+# Live frames only get the cheap stages: a miss costs one frame, and the
+# next frame arrives sooner than a full-resolution pass would finish
+LIVE_STAGES = ("roi", "reduced", "roi_full")
+
+
+class VideoFileSource:
+    """BGR frames from a recorded video (or any cv2.VideoCapture target)"""
+
+    def __init__(self, path, max_frames=None):
+        self.path = path
+        self.max_frames = max_frames
+
+    def fps(self):
+        capture = cv2.VideoCapture(self.path)
+        try:
+            return capture.get(cv2.CAP_PROP_FPS) or 30.0
+        finally:
+            capture.release()
+
+    def __iter__(self):
+        capture = cv2.VideoCapture(self.path)
+        if not capture.isOpened():
+            raise IOError(f"Cannot open video source {self.path!r}")
+        try:
+            count = 0
+            while self.max_frames is None or count < self.max_frames:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                count += 1
+                yield frame
+        finally:
+            capture.release()
+
+
+class LiveScanner:
+    """Decodes every k-th frame of a stream until one passes accept.
+
+    feed() may be called from a video callback thread while the script
+    thread polls result; after the first accepted frame every later frame
+    is ignored.
+    """
+
+    def __init__(self, accept=None, stride=FRAME_STRIDE, decoder=None, stages=LIVE_STAGES):
+        self.accept = accept or bool
+        self.stride = max(1, stride)
+        self.decoder = decoder or QRDecoder()
+        self.stages = stages
+        self.lock = threading.Lock()
+        self.frames_seen = 0
+        self.frames_decoded = 0
+        self.decode_ms = 0.0
+        self.rejected = None
+        self.result = None
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    def feed(self, frame):
+        """Offer one frame; returns the accepted DecodeResult once found"""
+        with self.lock:
+            if self.result is not None:
+                return self.result
+            self.frames_seen += 1
+            if (self.frames_seen - 1) % self.stride:
+                return None
+
+            start = time.perf_counter()
+            decoded = self.decoder.decode_image(frame, stages=self.stages)
+            self.decode_ms += (time.perf_counter() - start) * 1000
+            self.frames_decoded += 1
+
+            if decoded.text:
+                if self.accept(decoded.text):
+                    self.result = decoded
+                    return decoded
+                self.rejected = decoded.text
+            return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "frames_seen": self.frames_seen,
+                "frames_decoded": self.frames_decoded,
+                "decode_ms": round(self.decode_ms, 1),
+                "found": self.result is not None,
+            }
+
+
+def scan_source(source, accept=None, stride=FRAME_STRIDE, decoder=None):
+    """Run a LiveScanner over a frame source, stopping at the first accepted frame"""
+    scanner = LiveScanner(accept=accept, stride=stride, decoder=decoder)
+    for frame in source:
+        if scanner.feed(frame) is not None:
+            break
+    return scanner
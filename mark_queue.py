@@ -0,0 +1,251 @@
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+import instrumentation
+from resilience import is_transport_error
+
+logger = logging.getLogger(__name__)
+
+# Kept out of the working directory (usually the checkout) so the journal
+# and its WAL files never end up next to the code
+MARK_QUEUE_PATH = os.environ.get("MARK_QUEUE_PATH") or os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"), "studentside", "mark_queue.db"
+)
+
+# Marks flushed per backend call
+BATCH_SIZE = 100
+# Idle poll interval; enqueue wakes the worker immediately
+POLL_SECONDS = 2.0
+# Retry backoff bounds in seconds
+BACKOFF_MIN = 0.5
+BACKOFF_MAX = 60.0
+# A single mark is parked as failed after this many rejections by the
+# backend; attempts that never reached it (outages) don't count
+MAX_ATTEMPTS = 20
+# Sent marks are kept this long to answer "already marked" locally
+KEEP_DAYS = 2
+
+JOURNAL_SCHEMA = """
+create table if not exists pending_marks (
+    "Name" text not null,
+    "Date" text not null,
+    "Time" text,
+    "Method" text,
+    scanned_at real not null,
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    last_error text,
+    primary key ("Name", "Date")
+);
+create index if not exists pending_marks_status_idx on pending_marks (status, scanned_at);
+"""
+
+
+class MarkQueue:
+    """Durable local journal of validated marks, flushed to storage in the background"""
+
+    def __init__(self, storage, path=MARK_QUEUE_PATH, batch_size=BATCH_SIZE):
+        self.storage = storage
+        self.batch_size = batch_size
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        with self.lock:
+            self.conn.execute("pragma journal_mode=wal")
+            self.conn.execute("pragma synchronous=full")
+            self.conn.executescript(JOURNAL_SCHEMA)
+            cutoff = (date.today() - timedelta(days=KEEP_DAYS)).isoformat()
+            self.conn.execute("""delete from pending_marks where status = 'sent' and "Date" < ?""", (cutoff,))
+
+    def enqueue(self, record, scanned_at=None):
+        """Journal a validated mark; False if (Name, Date) is already queued or sent.
+
+        A mark parked as failed is queued again with fresh attempts.
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                'insert into pending_marks ("Name", "Date", "Time", "Method", scanned_at) '
+                'values (?, ?, ?, ?, ?) '
+                'on conflict ("Name", "Date") do update set '
+                '"Time" = excluded."Time", "Method" = excluded."Method", scanned_at = excluded.scanned_at, '
+                "status = 'pending', attempts = 0, last_error = null "
+                "where pending_marks.status = 'failed'",
+                (record["Name"], record["Date"], record.get("Time"), record.get("Method"),
+                 scanned_at or time.time()),
+            )
+        if cursor.rowcount:
+            self.wakeup.set()
+        return cursor.rowcount == 1
+
+    def pending_count(self):
+        with self.lock:
+            return self.conn.execute("select count(*) from pending_marks where status = 'pending'").fetchone()[0]
+
+    def failed_count(self):
+        """Marks the backend kept rejecting, parked until the student scans again"""
+        with self.lock:
+            return self.conn.execute("select count(*) from pending_marks where status = 'failed'").fetchone()[0]
+
+    def failed_dates(self, name):
+        """Dates of a student's parked marks, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                """select "Date" from pending_marks where "Name" = ? and status = 'failed' order by "Date" """,
+                (name,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _next_batch(self):
+        with self.lock:
+            rows = self.conn.execute(
+                '''select "Name", "Date", "Time", "Method", attempts from pending_marks
+                   where status = 'pending' order by scanned_at limit ?''',
+                (self.batch_size,),
+            ).fetchall()
+        return [({"Name": n, "Date": d, "Time": t, "Method": m}, attempts) for n, d, t, m, attempts in rows]
+
+    def _set_status(self, records, status, error=None):
+        with self.lock:
+            self.conn.execute("begin")
+            self.conn.executemany(
+                'update pending_marks set status = ?, attempts = attempts + 1, last_error = ? '
+                'where "Name" = ? and "Date" = ?',
+                [(status, error, r["Name"], r["Date"]) for r in records],
+            )
+            self.conn.execute("commit")
+
+    def _record_failure(self, record, attempts, error):
+        status = "failed" if attempts + 1 >= MAX_ATTEMPTS else "pending"
+        self._set_status([record], status, str(error)[:500])
+        if status == "failed":
+            logger.error("Parked mark for %s on %s after %d rejections: %s",
+                         record["Name"], record["Date"], MAX_ATTEMPTS, error)
+
+    def _record_outage(self, records, error):
+        # Not the marks' fault: they stay pending without using up attempts
+        with self.lock:
+            self.conn.executemany(
+                'update pending_marks set last_error = ? where "Name" = ? and "Date" = ?',
+                [(str(error)[:500], r["Name"], r["Date"]) for r in records],
+            )
+
+    def flush_once(self):
+        """Send one batch; returns (sent, failed) counts for that batch"""
+        batch = self._next_batch()
+        if not batch:
+            return 0, 0
+        records = [record for record, _ in batch]
+        try:
+            # Backend dedups on (Name, Date), so a retried batch is harmless
+            self.storage.mark_attendance_batch(records)
+            self._set_status(records, "sent")
+            return len(records), 0
+        except Exception as batch_error:
+            if is_transport_error(batch_error):
+                self._record_outage(records, batch_error)
+                return 0, len(records)
+            if len(batch) == 1:
+                self._record_failure(records[0], batch[0][1], batch_error)
+                return 0, 1
+
+        # The backend rejected the batch: isolate bad marks so one poison
+        # record can't hold up the rest
+        sent = failed = 0
+        for index, (record, attempts) in enumerate(batch):
+            try:
+                self.storage.mark_attendance(record)
+                self._set_status([record], "sent")
+                sent += 1
+            except Exception as e:
+                if is_transport_error(e):
+                    # Went down mid-way; the rest wait for the next flush
+                    self._record_outage(records[index:], e)
+                    return sent, failed + len(batch) - index
+                self._record_failure(record, attempts, e)
+                failed += 1
+        return sent, failed
+
+    def _run(self):
+        backoff = BACKOFF_MIN
+        while not self.stopped.is_set():
+            try:
+                sent, failed = self.flush_once()
+            except Exception:
+                # Journal trouble (disk full, locked file): keep the worker alive
+                logger.exception("Error flushing mark queue")
+                sent, failed = 0, 1
+            if failed and not sent:
+                # Backend looks down: back off with jitter so workers across
+                # processes don't retry in lockstep
+                self.stopped.wait(random.uniform(backoff / 2, backoff))
+                backoff = min(backoff * 2, BACKOFF_MAX)
+                continue
+            backoff = BACKOFF_MIN
+            if sent == self.batch_size:
+                continue  # More may be waiting
+            self.wakeup.wait(POLL_SECONDS)
+            self.wakeup.clear()
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True, name="mark-queue")
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_mark_queue(storage):
+    """Process-wide queue with its flush worker running"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = MarkQueue(storage, MARK_QUEUE_PATH)
+        return _queue.start()
+
+
+def resume_pending(storage):
+    """Start flushing marks journaled before a restart, once per process.
+
+    Without a journal on disk there is nothing to resume and nothing is
+    opened; otherwise the worker only starts if marks are still pending.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None and os.path.exists(MARK_QUEUE_PATH):
+            _queue = MarkQueue(storage, MARK_QUEUE_PATH)
+            if _queue.pending_count():
+                _queue.start()
+        return _queue
+
+
+def prometheus_lines():
+    """Journal gauges for instrumentation.prometheus_text()"""
+    if _queue is None:
+        return []
+    return [
+        "# TYPE portal_marks_pending gauge",
+        f"portal_marks_pending {_queue.pending_count()}",
+        "# TYPE portal_marks_failed gauge",
+        f"portal_marks_failed {_queue.failed_count()}",
+    ]
+
+
+instrumentation.register_prometheus(prometheus_lines)
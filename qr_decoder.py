@@ -0,0 +1,389 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+# Result of a decode attempt; stage names the pass that produced the text
+DecodeResult = namedtuple("DecodeResult", ["text", "points", "stage"])
+
+# Order of the staged pipeline, also used as benchmark row labels
+STAGES = ("roi", "reduced", "roi_full", "full")
+
+# Fraction of the QR's size added around a bounding box before cropping
+ROI_MARGIN = 0.25
+
+
+class OpenCVBackend:
+    """Stock OpenCV QRCodeDetector"""
+
+    name = "opencv"
+
+    def __init__(self):
+        self.detector = cv2.QRCodeDetector()
+
+    def detect_and_decode(self, image):
+        text, points, _ = self.detector.detectAndDecode(image)
+        return text or "", points
+
+
+class WeChatBackend:
+    """OpenCV contrib WeChat detector (CNN based, much more robust on phone photos)"""
+
+    name = "wechat"
+
+    def __init__(self, model_dir=None):
+        if model_dir:
+            self.detector = cv2.wechat_qrcode_WeChatQRCode(
+                f"{model_dir}/detect.prototxt", f"{model_dir}/detect.caffemodel",
+                f"{model_dir}/sr.prototxt", f"{model_dir}/sr.caffemodel",
+            )
+        else:
+            self.detector = cv2.wechat_qrcode_WeChatQRCode()
+
+    def detect_and_decode(self, image):
+        texts, points = self.detector.detectAndDecode(image)
+        if texts:
+            return texts[0], points[0]
+        return "", None
+
+
+def wechat_available():
+    return hasattr(cv2, "wechat_qrcode_WeChatQRCode")
+
+
+def get_backend(name="auto", model_dir=None):
+    """Build a detector backend; "auto" prefers WeChat when the contrib build has it"""
+    if name == "wechat" or (name == "auto" and wechat_available()):
+        try:
+            return WeChatBackend(model_dir)
+        except Exception:
+            if name == "wechat":
+                raise
+    return OpenCVBackend()
+
+
+def bytes_to_buffer(data):
+    """Wrap encoded image bytes for cv2.imdecode without copying"""
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def bounding_box(points, scale=1.0):
+    """Axis-aligned (x0, y0, x1, y1) box around detector corner points"""
+    if points is None:
+        return None
+    pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    if pts.size == 0:
+        return None
+    x0, y0 = pts.min(axis=0) * scale
+    x1, y1 = pts.max(axis=0) * scale
+    return float(x0), float(y0), float(x1), float(y1)
+
+
+def crop_to_box(image, box, margin=ROI_MARGIN):
+    """Crop image to box grown by margin; returns (crop, (x_offset, y_offset))"""
+    height, width = image.shape[:2]
+    x0, y0, x1, y1 = box
+    pad_x = (x1 - x0) * margin
+    pad_y = (y1 - y0) * margin
+    left = max(int(x0 - pad_x), 0)
+    top = max(int(y0 - pad_y), 0)
+    right = min(int(x1 + pad_x) + 1, width)
+    bottom = min(int(y1 + pad_y) + 1, height)
+    if right - left < 8 or bottom - top < 8:
+        return None, (0, 0)
+    return image[top:bottom, left:right], (left, top)
+
+
+class QRDecoder:
+    """Staged QR decode engine
+
+    Stages, cheapest first:
+      roi       full-resolution crop around the last successful box (tracking)
+      reduced   half-resolution grayscale decode straight from the JPEG
+      roi_full  full-resolution retry cropped to the box the reduced pass found
+      full      one full-frame pass (contrast-enhanced if a crop already failed)
+    """
+
+    def __init__(self, backend=None, reduction=2):
+        self.backend = backend or get_backend()
+        self.reduction = reduction
+        self.last_box = None
+        self.stage_times = {}
+
+    def _reduced_flag(self):
+        return {
+            2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+            4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+        }.get(self.reduction, cv2.IMREAD_GRAYSCALE)
+
+    def _timed(self, stage, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.stage_times[stage] = (time.perf_counter() - start) * 1000
+
+    def _decode_crop(self, image, box):
+        crop, (left, top) = crop_to_box(image, box)
+        if crop is None:
+            return "", None
+        text, points = self.backend.detect_and_decode(crop)
+        if text and points is not None:
+            points = np.asarray(points, dtype=np.float32).reshape(-1, 2) + (left, top)
+        return text, points
+
+    def decode_bytes(self, data, stages=STAGES):
+        """Decode encoded image bytes (e.g. a camera_input JPEG)"""
+        self.stage_times = {}
+        buffer = bytes_to_buffer(data)
+        full = None
+
+        def full_gray():
+            nonlocal full
+            if full is None:
+                full = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+            return full
+
+        # Stage 0: the QR is usually where it was in the previous frame
+        if "roi" in stages and self.last_box is not None:
+            text, points = self._timed("roi", self._decode_crop, full_gray(), self.last_box)
+            if text:
+                return self._success(text, points, "roi")
+
+        # Stage 1: cheap reduced-resolution pass decoded directly by libjpeg
+        found_box = None
+        if "reduced" in stages:
+            small = self._timed("decode_reduced", cv2.imdecode, buffer, self._reduced_flag())
+            if small is None:
+                return DecodeResult("", None, None)
+            text, points = self._timed("reduced", self.backend.detect_and_decode, small)
+            if text:
+                scaled = np.asarray(points, dtype=np.float32).reshape(-1, 2) * self.reduction
+                return self._success(text, scaled, "reduced")
+            found_box = bounding_box(points, scale=self.reduction)
+
+        image = full_gray()
+        if image is None:
+            return DecodeResult("", None, None)
+
+        # Stage 2: located but not decoded at low resolution - retry the crop
+        enhanced = None
+        if found_box is not None and "roi_full" in stages:
+            text, points = self._timed("roi_full", self._decode_crop, image, found_box)
+            if not text:
+                enhanced = cv2.convertScaleAbs(image, alpha=1.5, beta=30)
+                text, points = self._timed("roi_full_enhanced", self._decode_crop, enhanced, found_box)
+            if text:
+                return self._success(text, points, "roi_full")
+
+        # Stage 3: one last full-frame pass. Nothing located usually means a
+        # small or distant code; a located code whose crop failed gets the
+        # contrast-enhanced frame instead, since the plain crop already failed
+        if "full" in stages:
+            if enhanced is not None:
+                image = enhanced
+            text, points = self._timed("full", self.backend.detect_and_decode, image)
+            if text:
+                return self._success(text, points, "full")
+
+        self.last_box = None
+        return DecodeResult("", None, None)
+
+    def decode_image(self, image, stages=STAGES):
+        """Decode an already decoded BGR or grayscale frame"""
+        self.stage_times = {}
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        if "roi" in stages and self.last_box is not None:
+            text, points = self._timed("roi", self._decode_crop, image, self.last_box)
+            if text:
+                return self._success(text, points, "roi")
+
+        box = None
+        if "reduced" in stages:
+            small = image
+            if self.reduction > 1:
+                small = cv2.resize(image, None, fx=1 / self.reduction, fy=1 / self.reduction,
+                                   interpolation=cv2.INTER_AREA)
+            text, points = self._timed("reduced", self.backend.detect_and_decode, small)
+            if text:
+                scaled = np.asarray(points, dtype=np.float32).reshape(-1, 2) * self.reduction
+                return self._success(text, scaled, "reduced")
+            box = bounding_box(points, scale=self.reduction)
+
+        if box is not None and "roi_full" in stages:
+            text, points = self._timed("roi_full", self._decode_crop, image, box)
+            if text:
+                return self._success(text, points, "roi_full")
+            image = cv2.convertScaleAbs(image, alpha=1.5, beta=30)
+
+        if "full" in stages:
+            text, points = self._timed("full", self.backend.detect_and_decode, image)
+            if text:
+                return self._success(text, points, "full")
+
+        self.last_box = None
+        return DecodeResult("", None, None)
+
+    def _success(self, text, points, stage):
+        self.last_box = bounding_box(points)
+        return DecodeResult(text, points, stage)
+
+
+def _clahe(gray):
+    return cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8)).apply(gray)
+
+
+def _adaptive(gray):
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY, 31, 5)
+
+
+# Preprocessing variants for parallel decoding, cheapest and most likely first.
+# Each takes (bgr, gray) and returns the image handed to the detector.
+VARIANTS = {
+    "gray": lambda bgr, gray: gray,
+    "bgr": lambda bgr, gray: bgr,
+    "enhanced": lambda bgr, gray: cv2.convertScaleAbs(gray, alpha=1.5, beta=30),
+    "clahe": lambda bgr, gray: _clahe(gray),
+    "adaptive": lambda bgr, gray: _adaptive(gray),
+    "inverted": lambda bgr, gray: cv2.bitwise_not(gray),
+    "rotated": lambda bgr, gray: cv2.rotate(gray, cv2.ROTATE_90_CLOCKWISE),
+}
+
+# OpenCV releases the GIL inside detectAndDecode, so a few threads give real
+# parallelism even on the small instances Streamlit Cloud runs on
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers=None):
+    """Process-wide decode pool, sized to the cores actually available"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # With one core this degrades to in-order decoding with early exit
+            workers = max_workers or min(4, os.cpu_count() or 1)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qr-decode")
+        return _executor
+
+
+class ParallelDecoder:
+    """Staged cheap passes first, then preprocessing variants fanned out over
+    a thread pool; first accepted text wins.
+
+    Most frames decode in the ROI or reduced-resolution pass, so those run
+    first on the caller's thread. Only misses pay for full-resolution
+    variants, and only when there is more than one core to race them on;
+    with one core the staged QRDecoder finishes the job instead.
+    """
+
+    def __init__(self, backend_name="auto", variants=None, executor=None, parallel=None):
+        self.backend_name = backend_name
+        self.variants = variants or list(VARIANTS)
+        self.executor = executor
+        self.parallel = (os.cpu_count() or 1) > 1 if parallel is None else parallel
+        # Detector objects are not thread-safe, so each worker gets its own
+        self._local = threading.local()
+        self._staged = None
+
+    @property
+    def staged(self):
+        # Runs on the caller's thread with its own detector
+        if self._staged is None:
+            self._staged = QRDecoder(get_backend(self.backend_name))
+        return self._staged
+
+    def _backend(self):
+        backend = getattr(self._local, "backend", None)
+        if backend is None:
+            backend = self._local.backend = get_backend(self.backend_name)
+        return backend
+
+    def _run_variant(self, name, bgr, gray, accept, cancelled):
+        if cancelled.is_set():
+            return DecodeResult("", None, None), False
+        try:
+            text, points = self._backend().detect_and_decode(VARIANTS[name](bgr, gray))
+        except cv2.error:
+            return DecodeResult("", None, None), False
+        accepted = bool(text) and (accept is None or accept(text))
+        if accepted:
+            # Signal from the worker itself so queued variants are skipped
+            # before the caller even wakes up
+            cancelled.set()
+        return DecodeResult(text, points, name), accepted
+
+    def decode_bytes(self, data, accept=None):
+        """Decode encoded image bytes; accept as in decode_image.
+
+        On a single core the staged result is returned whether or not it
+        passes accept, so callers still validate the text themselves.
+        """
+        if not self.parallel:
+            return self.staged.decode_bytes(data)
+        result = self.staged.decode_bytes(data, stages=("roi", "reduced"))
+        if result.text and (accept is None or accept(result.text)):
+            return result
+        variant = self.decode_variants(data, accept)
+        return variant if variant.text else result
+
+    def decode_variants(self, data, accept=None):
+        """Full-resolution variants only, for callers that already ran the staged passes"""
+        frame = cv2.imdecode(bytes_to_buffer(data), cv2.IMREAD_COLOR)
+        if frame is None:
+            return DecodeResult("", None, None)
+        return self.decode_image(frame, accept)
+
+    def decode_image(self, frame, accept=None):
+        """Decode a BGR frame.
+
+        Returns the first result whose text passes accept (any non-empty text
+        when accept is None). If texts were decoded but none were accepted,
+        the first of those is returned so callers can tell "wrong QR" apart
+        from "no QR".
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        bgr = frame if frame.ndim == 3 else cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        executor = self.executor or get_executor()
+        cancelled = threading.Event()
+        pending = {executor.submit(self._run_variant, name, bgr, gray, accept, cancelled)
+                   for name in self.variants}
+        rejected = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result, accepted = future.result()
+                    if accepted:
+                        return result
+                    if result.text:
+                        rejected = rejected or result
+        finally:
+            # Queued variants are dropped; running ones see the flag and the
+            # pool moves on as soon as their current detector call returns
+            cancelled.set()
+            for future in pending:
+                future.cancel()
+        return rejected or DecodeResult("", None, None)
+
+
+def legacy_decode(data, detector=None):
+    """Original three full-frame passes, kept as the benchmark baseline"""
+    detector = detector or cv2.QRCodeDetector()
+    file_bytes = np.asarray(bytearray(data), dtype=np.uint8)
+    frame = cv2.imdecode(file_bytes, 1)
+    qr_text, bbox, _ = detector.detectAndDecode(frame)
+    if not qr_text:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        qr_text, bbox, _ = detector.detectAndDecode(gray)
+        if not qr_text:
+            enhanced = cv2.convertScaleAbs(gray, alpha=1.5, beta=30)
+            qr_text, bbox, _ = detector.detectAndDecode(enhanced)
+    return DecodeResult(qr_text or "", bbox, "legacy" if qr_text else None)
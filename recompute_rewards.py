@@ -0,0 +1,159 @@
+"""Recompute every student's rewards row from the Attendance table.
+
+    python recompute_rewards.py            # apply and print what changed
+    python recompute_rewards.py --dry-run  # report only
+
+Applying goes through the backend's recompute_rewards(), which counts and
+writes while marks are held off, so a student marking attendance during
+the run keeps their mark. --dry-run (and a Supabase project without
+sql/recompute_rewards.sql) instead streams Attendance in pages, counts
+distinct dates per student and maps them to badges in bulk here. That
+read is a snapshot: writing it back is only safe in a quiet window with
+no marks being taken.
+
+On Supabase the script connects with the service role key from
+SUPABASE_SERVICE_ROLE_KEY: the recompute_rewards RPC is not callable with
+the app's public anon key.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from storage import BADGE_THRESHOLDS, NO_BADGE, PAGE_SIZE, STORAGE_BACKEND, SupabaseStorage, get_storage
+
+
+def attendance_counts(storage, page_size=PAGE_SIZE):
+    """Distinct attended dates per student as a Series indexed by Name"""
+    names, dates = [], []
+    for page in storage.iter_attendance_pages(page_size):
+        names.extend(row["Name"] for row in page)
+        dates.extend(row["Date"] for row in page)
+    if not names:
+        return pd.Series(dtype=np.int64, name="AttendanceCount")
+    frame = pd.DataFrame({"Name": names, "Date": dates}).astype("category")
+    # Duplicate marks can exist on tables without the (Name, Date) unique index
+    frame = frame.drop_duplicates()
+    counts = frame.groupby("Name", observed=True).size()
+    return counts.rename("AttendanceCount").astype(np.int64)
+
+
+def badges_for_counts(counts):
+    """Vectorized badge_for_count over an array of counts"""
+    counts = np.asarray(counts)
+    conditions = [counts >= minimum for minimum, _ in BADGE_THRESHOLDS]
+    choices = [badge for _, badge in BADGE_THRESHOLDS]
+    return np.select(conditions, choices, default=NO_BADGE)
+
+
+def plan_changes(counts, rewards):
+    """Rows whose stored count or badge is wrong.
+
+    Columns: Name, OldCount, AttendanceCount, OldBadge, Badge, Change
+    (insert, update or reset for students without any attendance left).
+    """
+    current = pd.DataFrame(rewards, columns=["Name", "AttendanceCount", "Badge"])
+    current = current.drop_duplicates("Name", keep="last").set_index("Name")
+
+    target = counts.to_frame()
+    merged = target.join(
+        current.rename(columns={"AttendanceCount": "OldCount", "Badge": "OldBadge"}),
+        how="outer",
+    )
+    merged["AttendanceCount"] = merged["AttendanceCount"].fillna(0).astype(np.int64)
+    merged["Badge"] = badges_for_counts(merged["AttendanceCount"].to_numpy())
+
+    missing = merged["OldCount"].isna()
+    changed = missing | (merged["OldCount"] != merged["AttendanceCount"]) | (merged["OldBadge"] != merged["Badge"])
+    plan = merged[changed].copy()
+    plan.index.name = "Name"
+    return _with_change(plan.reset_index())
+
+
+def _with_change(plan):
+    plan["Change"] = np.where(
+        plan["OldCount"].isna(), "insert",
+        np.where(plan["AttendanceCount"] == 0, "reset", "update"),
+    )
+    plan["OldCount"] = plan["OldCount"].astype("Int64")
+    return plan[["Name", "OldCount", "AttendanceCount", "OldBadge", "Badge", "Change"]]
+
+
+def recompute(storage, dry_run=False, page_size=PAGE_SIZE, allow_snapshot=False):
+    """Bring rewards in line with Attendance; returns the change plan.
+
+    allow_snapshot permits writing a plan computed here when the backend
+    has no atomic recompute, accepting that marks taken meanwhile are lost.
+    """
+    if not dry_run:
+        try:
+            changes = storage.recompute_rewards()
+        except NotImplementedError:
+            if not allow_snapshot:
+                raise
+        else:
+            columns = ["Name", "OldCount", "AttendanceCount", "OldBadge", "Badge"]
+            return _with_change(pd.DataFrame(changes, columns=columns))
+
+    counts = attendance_counts(storage, page_size)
+    plan = plan_changes(counts, storage.get_rewards())
+    if not dry_run and len(plan):
+        storage.upsert_rewards(plan[["Name", "AttendanceCount", "Badge"]].to_dict("records"))
+    return plan
+
+
+def admin_storage():
+    """Backend for this script: the service role client on Supabase"""
+    if STORAGE_BACKEND == "sqlite":
+        return get_storage()
+    from supabase_client import create_service_client
+    return SupabaseStorage(client=create_service_client())
+
+
+def summarize(plan):
+    lines = [f"{len(plan)} rewards rows changed"]
+    for change, count in plan["Change"].value_counts().items():
+        lines.append(f"  {change}: {count}")
+    moved = plan[plan["OldBadge"].notna() & (plan["OldBadge"] != plan["Badge"])]
+    for (old, new), count in moved.groupby(["OldBadge", "Badge"]).size().items():
+        lines.append(f"  badge {old} -> {new}: {count}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report changes without writing them")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--csv", help="also write every changed row to this CSV file")
+    parser.add_argument("--allow-snapshot", action="store_true",
+                        help="without the recompute_rewards RPC, write a snapshot recount "
+                             "(only while no marks are being taken)")
+    args = parser.parse_args()
+
+    try:
+        storage = admin_storage()
+    except RuntimeError as e:
+        parser.exit(1, f"{e}: the rewards recompute needs the service role key.\n")
+
+    start = time.perf_counter()
+    try:
+        plan = recompute(storage, dry_run=args.dry_run, page_size=args.page_size,
+                         allow_snapshot=args.allow_snapshot)
+    except NotImplementedError:
+        parser.exit(1, "The backend has no atomic recompute: apply sql/recompute_rewards.sql, or rerun "
+                       "with --allow-snapshot while no marks are being taken.\n")
+    elapsed = time.perf_counter() - start
+
+    print(summarize(plan))
+    if len(plan):
+        print(plan.head(20).to_string(index=False))
+        if len(plan) > 20:
+            print(f"... {len(plan) - 20} more")
+    if args.csv:
+        plan.to_csv(args.csv, index=False)
+    print(f"{'Checked' if args.dry_run else 'Recomputed'} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
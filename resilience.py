@@ -0,0 +1,302 @@
+import functools
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Seconds a backend request may take (the client's HTTP timeout), and the
+# budget a read's retries must fit in
+CALL_DEADLINE = float(os.environ.get("BACKEND_DEADLINE_SECONDS", "4"))
+# Extra attempts for idempotent reads, and their backoff bounds in seconds
+READ_RETRIES = 2
+RETRY_BASE = 0.2
+RETRY_MAX = 1.0
+# Consecutive failures that open the breaker, and how long it stays open
+BREAKER_FAILURES = 5
+BREAKER_RESET_SECONDS = 30.0
+# Last-known-good read results kept for serving while degraded
+LAST_GOOD_MAXSIZE = 2048
+
+# Storage methods that only read and are safe to retry and to serve stale
+READ_METHODS = {
+    "get_attendance", "get_attendance_page", "get_class_dates",
+    "get_class_calendar_version", "attendance_exists", "get_reward", "get_rewards",
+}
+# Reads that are retried under the deadline but never answered from the
+# last good value: a login must be checked against the backend, and scan
+# pages are too big to keep and would mix old rows into a fresh pass
+FRESH_READ_METHODS = {"find_student", "get_attendance_scan_page"}
+# Guarded without retries: retrying a write could apply it twice
+WRITE_METHODS = {
+    "insert_attendance", "upsert_reward", "upsert_rewards", "mark_attendance", "mark_attendance_batch",
+    "recompute_rewards",
+}
+
+# PostgREST and PostgreSQL error codes meaning the database is unreachable,
+# overloaded or shutting down, rather than that the request was wrong
+TRANSIENT_CODE_PREFIXES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003", "08", "53", "57P", "57014")
+
+_local = threading.local()
+
+
+class BackendUnavailable(Exception):
+    """The backend failed, timed out or is short-circuited, and nothing cached can stand in"""
+
+
+class CircuitOpen(BackendUnavailable):
+    """Call refused without trying because the breaker is open"""
+
+
+def is_transport_error(error):
+    """Whether an error means the backend could not be reached or could not cope.
+
+    Only these are retried and counted by the breaker; anything else (a bad
+    column, a constraint violation, a caller bug) is the request's fault.
+    """
+    if isinstance(error, (BackendUnavailable, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, sqlite3.OperationalError):
+        # "interrupted" is a statement cut off at the read deadline
+        return any(word in str(error) for word in ("locked", "busy", "interrupted"))
+    try:
+        import httpx
+        if isinstance(error, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        # postgrest reports the HTTP status when the body is not JSON (gateways)
+        return code >= 500 or code == 429
+    return isinstance(code, str) and code.startswith(TRANSIENT_CODE_PREFIXES)
+
+
+class CircuitBreaker:
+    """closed -> open after BREAKER_FAILURES straight failures -> half-open probe after the reset"""
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.consecutive = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go out now; half-open lets one probe through at a time"""
+        with self.lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.consecutive = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release(self):
+        """End a call that says nothing about backend health (the request itself failed)"""
+        with self.lock:
+            self.probing = False
+
+    def failure(self):
+        with self.lock:
+            self.consecutive += 1
+            if self.probing or self.consecutive >= self.failures:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+@contextmanager
+def deadline(seconds):
+    """Bound everything the enclosed block asks of the backend on this thread.
+
+    Backends call check_deadline() before each further round trip of a
+    multi-request read (pages), and SQLite interrupts a running statement
+    once past_deadline() is true. Nested deadlines keep the earlier one.
+    """
+    previous = getattr(_local, "deadline", None)
+    at = time.monotonic() + seconds
+    _local.deadline = at if previous is None else min(previous, at)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def past_deadline():
+    at = getattr(_local, "deadline", None)
+    return at is not None and time.monotonic() >= at
+
+
+def check_deadline():
+    """Raise TimeoutError if this thread's deadline has passed"""
+    if past_deadline():
+        raise TimeoutError("backend deadline exceeded")
+
+
+@contextmanager
+def collecting_stale():
+    """Collect the stale reads served to this thread; yields the list they land in"""
+    previous = getattr(_local, "stale", None)
+    _local.stale = []
+    try:
+        yield _local.stale
+    finally:
+        _local.stale = previous
+
+
+def _note_stale(method, age):
+    stale = getattr(_local, "stale", None)
+    if stale is not None:
+        stale.append((method, age))
+
+
+def replay_stale(notes):
+    """Re-record stale reads collected on another thread for this one"""
+    for method, age in notes:
+        _note_stale(method, age)
+
+
+def stale_count():
+    """Stale reads served so far in the current collecting_stale block"""
+    return len(getattr(_local, "stale", None) or ())
+
+
+class ResilientStorage:
+    """Storage proxy with jittered read retries and a circuit breaker.
+
+    Calls run on the caller's thread; each request is bounded by the
+    client's HTTP timeout (CALL_DEADLINE), so a slow backend surfaces as a
+    timeout rather than a queue of abandoned calls. A read as a whole,
+    pages and retries included, runs under a deadline of the same length.
+    Only transport errors are retried and counted; others pass through
+    untouched.
+
+    Successful reads are remembered; when a read cannot be completed the
+    last good value is returned instead and recorded as stale for the
+    current thread. BackendUnavailable is raised only when there is none,
+    and always for FRESH_READ_METHODS.
+    """
+
+    def __init__(self, inner, deadline=CALL_DEADLINE, breaker=None):
+        self.inner = inner
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.last_good = OrderedDict()
+        self.last_good_lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        value = getattr(self.inner, attr)
+        if attr in READ_METHODS:
+            guarded = functools.partial(self._read, attr, value)
+        elif attr in FRESH_READ_METHODS:
+            guarded = functools.partial(self._read, attr, value, stale=False)
+        elif attr in WRITE_METHODS:
+            guarded = functools.partial(self._attempt, attr, value)
+        else:
+            return value
+        return functools.wraps(value)(guarded)
+
+    def _attempt(self, attr, func, *args, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{attr}: backend circuit open")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if not is_transport_error(e):
+                self.breaker.release()
+                raise
+            self.breaker.failure()
+            raise BackendUnavailable(f"{attr}: {e}") from e
+        self.breaker.success()
+        return result
+
+    def iter_attendance_pages(self, page_size=None, date_from=None):
+        """The backend's page loop, with each page fetched as its own guarded read"""
+        if page_size is None:
+            from storage import PAGE_SIZE as page_size  # storage imports this module
+        cursor = None
+        while True:
+            rows, cursor = self.get_attendance_scan_page(cursor, page_size, date_from)
+            if rows:
+                yield rows
+            if cursor is None:
+                break
+
+    def _read(self, attr, func, *args, stale=True, **kwargs):
+        key = (attr, args, tuple(sorted(kwargs.items()))) if stale else None
+        try:
+            hash(key)
+        except TypeError:
+            key = None
+
+        started = time.monotonic()
+        with deadline(self.deadline):
+            for attempt in range(READ_RETRIES + 1):
+                try:
+                    result = self._attempt(attr, func, *args, **kwargs)
+                except CircuitOpen as e:
+                    # Degraded: don't add to the load with retries
+                    error = e
+                    break
+                except BackendUnavailable as e:
+                    error = e
+                else:
+                    if key is not None:
+                        self._remember(key, result)
+                    return result
+                # Full jitter keeps many sessions from retrying in lockstep
+                backoff = random.uniform(0, min(RETRY_MAX, RETRY_BASE * 2 ** attempt))
+                if attempt == READ_RETRIES or time.monotonic() - started + backoff >= self.deadline:
+                    break
+                time.sleep(backoff)
+
+        cached = self._recall(key) if key is not None else None
+        if cached is not None:
+            stored_at, value = cached
+            _note_stale(attr, time.time() - stored_at)
+            return value
+        raise error
+
+    def _remember(self, key, value):
+        with self.last_good_lock:
+            self.last_good[key] = (time.time(), value)
+            self.last_good.move_to_end(key)
+            while len(self.last_good) > LAST_GOOD_MAXSIZE:
+                self.last_good.popitem(last=False)
+
+    def _recall(self, key):
+        with self.last_good_lock:
+            return self.last_good.get(key)
+
+
+_wrapped = {}
+
+
+def resilient_storage(storage):
+    """Shared ResilientStorage (and so one breaker) for a backend instance"""
+    wrapper = _wrapped.get(id(storage))
+    if wrapper is None or wrapper.inner is not storage:
+        wrapper = _wrapped[id(storage)] = ResilientStorage(storage)
+    return wrapper
@@ -0,0 +1,21 @@
+import time
+
+# Seconds a session QR stays valid after the teacher's screen generated it
+QR_VALIDITY_SECONDS = 10
+
+
+def validate_session_qr(qr_data, session_id, now=None, window=QR_VALIDITY_SECONDS):
+    """SESSION:ClassID:TeacherID:Timestamp
+
+    now is the scan time (defaults to the current time), so photos taken
+    earlier can be checked against the moment they were captured.
+    """
+    try:
+        parts = qr_data.split(":")
+        if parts[0] == "SESSION" and parts[1] == session_id:
+            timestamp = int(parts[3])
+            now = int(time.time()) if now is None else now
+            return abs(int(now) - timestamp) <= window
+    except:
+        pass
+    return False
@@ -0,0 +1,51 @@
+-- Change watermark for the class calendar (the distinct Attendance dates).
+--
+-- The version only moves when a date gains its first mark or loses its
+-- last one, so app processes can poll get_class_calendar_version() and
+-- reload get_class_dates() (sql/class_dates.sql) only when it changed.
+--
+-- Apply once in the Supabase SQL editor. Without it the app reloads the
+-- dates on every refresh interval instead.
+
+create table if not exists class_calendar_state (
+    id integer primary key default 1 check (id = 1),
+    version bigint not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+insert into class_calendar_state (id) values (1) on conflict (id) do nothing;
+
+create or replace function bump_class_calendar_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('INSERT', 'UPDATE') and (
+        select count(*) from (
+            select 1 from "Attendance" where "Date" = new."Date" limit 2
+        ) s
+    ) = 1 then
+        update class_calendar_state set version = version + 1, updated_at = now() where id = 1;
+    elsif tg_op in ('DELETE', 'UPDATE') and not exists (
+        select 1 from "Attendance" where "Date" = old."Date"
+    ) then
+        update class_calendar_state set version = version + 1, updated_at = now() where id = 1;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists attendance_class_calendar on "Attendance";
+create trigger attendance_class_calendar
+    after insert or delete or update of "Date" on "Attendance"
+    for each row execute function bump_class_calendar_version();
+
+create or replace function get_class_calendar_version()
+returns bigint
+language sql
+stable
+as $$
+    select version from class_calendar_state where id = 1;
+$$;
+
+grant execute on function get_class_calendar_version() to anon, authenticated;
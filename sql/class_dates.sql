@@ -0,0 +1,23 @@
+-- Distinct class dates, aggregated server-side so clients never pull the
+-- whole Attendance table to count sessions.
+--
+-- Apply once in the Supabase SQL editor. The app falls back to a paged
+-- select of the "Date" column when this function is missing.
+
+create index if not exists attendance_date_idx on "Attendance" ("Date");
+
+-- One array value rather than a set of rows: PostgREST's max-rows cap also
+-- applies to set-returning functions and would cut the list off silently.
+-- Changing the return type needs the old definition dropped first.
+drop function if exists get_class_dates();
+
+create function get_class_dates()
+returns text[]
+language sql
+stable
+as $$
+    select coalesce(array_agg(distinct a."Date"::text order by a."Date"::text), '{}')
+    from "Attendance" a;
+$$;
+
+grant execute on function get_class_dates() to anon, authenticated;
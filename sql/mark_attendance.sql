@@ -0,0 +1,63 @@
+-- Atomic attendance marking: dedup check, insert and reward update in one
+-- round trip, safe against double submits.
+--
+-- Apply once in the Supabase SQL editor. Existing duplicate (Name, Date)
+-- rows must be removed first or the unique index cannot be built:
+--
+--   delete from "Attendance" a using "Attendance" b
+--   where a."Name" = b."Name" and a."Date" = b."Date" and a.ctid > b.ctid;
+
+create unique index if not exists attendance_name_date_key
+    on "Attendance" ("Name", "Date");
+
+create unique index if not exists rewards_name_key
+    on rewards ("Name");
+
+-- Keep in sync with badge_for_count() in storage.py
+create or replace function badge_for_count(p_count integer)
+returns text
+language sql
+immutable
+as $$
+    select case
+        when p_count >= 10 then 'Gold'
+        when p_count >= 5 then 'Silver'
+        when p_count >= 4 then 'Bronze'
+        else 'No Badge'
+    end;
+$$;
+
+create or replace function mark_attendance_atomic(
+    p_name text,
+    p_date date,
+    p_time time,
+    p_method text default 'Student QR'
+)
+returns table (is_new boolean, "AttendanceCount" integer, "Badge" text)
+language plpgsql
+as $$
+begin
+    insert into "Attendance" ("Name", "Date", "Time", "Method")
+    values (p_name, p_date, p_time, p_method)
+    on conflict ("Name", "Date") do nothing;
+
+    if not found then
+        -- Already marked today: report the current reward state unchanged
+        return query
+            select false, r."AttendanceCount", r."Badge"
+            from rewards r
+            where r."Name" = p_name;
+        return;
+    end if;
+
+    return query
+        insert into rewards as r ("Name", "AttendanceCount", "Badge")
+        values (p_name, 1, badge_for_count(1))
+        on conflict ("Name") do update
+            set "AttendanceCount" = r."AttendanceCount" + 1,
+                "Badge" = badge_for_count(r."AttendanceCount" + 1)
+        returning true, r."AttendanceCount", r."Badge";
+end;
+$$;
+
+grant execute on function mark_attendance_atomic(text, date, time, text) to anon, authenticated;
@@ -0,0 +1,27 @@
+-- Batched form of mark_attendance_atomic for the write-behind mark queue.
+-- Requires sql/mark_attendance.sql. Each element of p_marks is an object
+-- with Name, Date, Time and Method; duplicates of an existing (Name, Date)
+-- are skipped, so re-sending a batch after a retry is harmless.
+
+create or replace function mark_attendance_batch(p_marks jsonb)
+returns table ("Name" text, "Date" text, is_new boolean, "AttendanceCount" integer, "Badge" text)
+language plpgsql
+as $$
+declare
+    mark jsonb;
+begin
+    for mark in select * from jsonb_array_elements(p_marks)
+    loop
+        return query
+            select mark->>'Name', mark->>'Date', m.is_new, m."AttendanceCount", m."Badge"
+            from mark_attendance_atomic(
+                mark->>'Name',
+                (mark->>'Date')::date,
+                (mark->>'Time')::time,
+                coalesce(mark->>'Method', 'Student QR')
+            ) m;
+    end loop;
+end;
+$$;
+
+grant execute on function mark_attendance_batch(jsonb) to anon, authenticated;
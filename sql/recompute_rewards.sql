@@ -0,0 +1,66 @@
+-- Bulk rewards recompute for recompute_rewards.py: recount every student's
+-- distinct attendance dates and rewrite the rewards rows that disagree.
+-- Requires sql/mark_attendance.sql (badge_for_count and the unique index
+-- on rewards."Name").
+--
+-- The tables stay locked against writers until the recount is written, so
+-- a mark taken mid-run waits and then increments the corrected count
+-- instead of being overwritten by a stale one. Changed rows come back as
+-- one jsonb array so PostgREST's max-rows cap cannot truncate the report.
+--
+-- security definer bypasses row level security and the run blocks every
+-- mark, so only the service role may call it: recompute_rewards.py uses
+-- SUPABASE_SERVICE_ROLE_KEY, never the public anon key the app ships with.
+
+create or replace function recompute_rewards()
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+declare
+    changes jsonb;
+begin
+    lock table "Attendance" in share mode;
+    lock table rewards in share row exclusive mode;
+
+    with counts as (
+        select "Name"::text as name, count(distinct "Date")::integer as attended
+        from "Attendance"
+        group by "Name"
+    ),
+    target as (
+        select coalesce(c.name, r."Name") as name,
+               r."AttendanceCount" as old_count,
+               coalesce(c.attended, 0) as new_count,
+               r."Badge" as old_badge,
+               badge_for_count(coalesce(c.attended, 0)) as new_badge
+        from counts c
+        full join rewards r on r."Name" = c.name
+    ),
+    changed as (
+        select * from target
+        where old_count is distinct from new_count or old_badge is distinct from new_badge
+    ),
+    written as (
+        insert into rewards as r ("Name", "AttendanceCount", "Badge")
+        select name, new_count, new_badge from changed
+        on conflict ("Name") do update
+            set "AttendanceCount" = excluded."AttendanceCount",
+                "Badge" = excluded."Badge"
+    )
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'Name', name, 'OldCount', old_count, 'AttendanceCount', new_count,
+        'OldBadge', old_badge, 'Badge', new_badge
+    ) order by name), '[]'::jsonb)
+    into changes
+    from changed;
+
+    return changes;
+end;
+$$;
+
+-- Functions are executable by public by default
+revoke execute on function recompute_rewards() from public, anon, authenticated;
+grant execute on function recompute_rewards() to service_role;
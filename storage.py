@@ -0,0 +1,602 @@
+import os
+import sqlite3
+import threading
+
+import instrumentation
+import resilience
+
+# Which backend get_storage() builds: "supabase" (default) or "sqlite"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "attendance.db")
+
+# PostgREST caps responses at 1000 rows by default
+PAGE_SIZE = 1000
+
+# Columns a caller may project from Attendance
+ATTENDANCE_COLUMNS = ("Name", "Date", "Time", "Method")
+
+# PostgREST error code for "function not found in the schema cache"
+MISSING_RPC_CODE = "PGRST202"
+
+
+# Minimum attendance count per badge, highest first; keep in sync with
+# badge_for_count() in sql/mark_attendance.sql
+BADGE_THRESHOLDS = [
+    (10, "Gold"),
+    (5, "Silver"),
+    (4, "Bronze"),
+]
+NO_BADGE = "No Badge"
+
+# PostgreSQL "no unique constraint matching the ON CONFLICT specification"
+NO_UNIQUE_CONSTRAINT_CODE = "42P10"
+
+
+def badge_for_count(count):
+    """Badge earned for a given attendance count"""
+    for minimum, badge in BADGE_THRESHOLDS:
+        if count >= minimum:
+            return badge
+    return NO_BADGE
+
+
+def _projection(columns):
+    """Validated column list for an Attendance projection, always including Date"""
+    unknown = set(columns) - set(ATTENDANCE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown Attendance columns: {sorted(unknown)}")
+    return list(columns) if "Date" in columns else ["Date", *columns]
+
+
+class StorageBackend:
+    """Every data operation the student portal performs"""
+
+    name = "base"
+
+    def find_student(self, name, parent_email):
+        """students_data row matching the login form, or None"""
+        raise NotImplementedError
+
+    def get_attendance(self, name):
+        """All Attendance rows for a student"""
+        raise NotImplementedError
+
+    def get_attendance_page(self, name, columns=ATTENDANCE_COLUMNS, date_from=None, date_to=None,
+                            after=None, limit=PAGE_SIZE, descending=True):
+        """One page of a student's Attendance rows, keyset-paginated on Date.
+
+        Only the projected columns are returned (Date is always included so
+        the last row can serve as the next page's `after` cursor). Dates are
+        ISO strings; date_from and date_to are inclusive.
+        """
+        raise NotImplementedError
+
+    def get_class_dates(self):
+        """Sorted distinct Attendance dates"""
+        raise NotImplementedError
+
+    def get_class_calendar_version(self):
+        """Counter that moves whenever the set of class dates changes, or None if unsupported"""
+        return None
+
+    def attendance_exists(self, name, date):
+        raise NotImplementedError
+
+    def insert_attendance(self, record):
+        raise NotImplementedError
+
+    def get_reward(self, name):
+        """rewards row for a student, or None"""
+        raise NotImplementedError
+
+    def upsert_reward(self, reward):
+        raise NotImplementedError
+
+    def get_attendance_scan_page(self, cursor=None, page_size=PAGE_SIZE, date_from=None):
+        """One page of every Attendance row's Name and Date, ordered by Name then Date.
+
+        Returns (rows, next_cursor); next_cursor is None after the last page.
+        The cursor is opaque to callers: start with None and pass back what
+        the previous page returned.
+        """
+        raise NotImplementedError
+
+    def iter_attendance_pages(self, page_size=PAGE_SIZE, date_from=None):
+        """Every Attendance row's Name and Date, as lists of at most page_size dicts.
+
+        date_from (inclusive ISO date) limits the pass to recent rows.
+        """
+        cursor = None
+        while True:
+            rows, cursor = self.get_attendance_scan_page(cursor, page_size, date_from)
+            if rows:
+                yield rows
+            if cursor is None:
+                break
+
+    def get_rewards(self):
+        """Every rewards row"""
+        raise NotImplementedError
+
+    def upsert_rewards(self, rewards):
+        """upsert_reward for many rows; backends override it with a bulk write"""
+        for reward in rewards:
+            self.upsert_reward(reward)
+
+    def recompute_rewards(self):
+        """Recount every student's rewards row from Attendance with marks held off.
+
+        Returns the changed rows as dicts with Name, OldCount,
+        AttendanceCount, OldBadge and Badge. NotImplementedError where the
+        backend cannot do it atomically.
+        """
+        raise NotImplementedError
+
+    def mark_attendance(self, record):
+        """Insert a mark unless one exists for (Name, Date) and bump rewards.
+
+        Returns (is_new, reward). This default is the plain sequential
+        version; backends override it with an atomic one where they can.
+        """
+        name = record["Name"]
+        if self.attendance_exists(name, record["Date"]):
+            return False, None
+
+        self.insert_attendance(record)
+
+        current = self.get_reward(name)
+        count = (current["AttendanceCount"] if current else 0) + 1
+        reward = {**(current or {}), "Name": name, "AttendanceCount": count, "Badge": badge_for_count(count)}
+        self.upsert_reward(reward)
+        return True, reward
+
+    def mark_attendance_batch(self, records):
+        """mark_attendance for many records; returns [(record, is_new, reward)]"""
+        return [(record, *self.mark_attendance(record)) for record in records]
+
+
+class SupabaseStorage(StorageBackend):
+    """Storage on the hosted Supabase project"""
+
+    name = "supabase"
+
+    def __init__(self, client=None, client_factory=None):
+        self._client = client
+        self._client_factory = client_factory
+
+    @property
+    def client(self):
+        # Built on the first query so page loads that never hit the
+        # backend don't pay for importing and constructing the SDK client
+        if self._client is None and self._client_factory is not None:
+            self._client = self._client_factory()
+        return self._client
+
+    def find_student(self, name, parent_email):
+        resp = self.client.table("students_data") \
+            .select("*") \
+            .eq("Name", name) \
+            .eq("Parent_Gmail", parent_email) \
+            .execute()
+        return resp.data[0] if resp.data else None
+
+    def get_attendance(self, name):
+        # Paged so histories longer than the PostgREST row cap come back whole
+        rows = []
+        for page in self._paged(
+            lambda: self.client.table("Attendance").select("*").eq("Name", name).order("Date"), PAGE_SIZE
+        ):
+            rows.extend(page)
+        return rows
+
+    def get_attendance_page(self, name, columns=ATTENDANCE_COLUMNS, date_from=None, date_to=None,
+                            after=None, limit=PAGE_SIZE, descending=True):
+        columns = _projection(columns)
+        query = self.client.table("Attendance").select(",".join(columns)).eq("Name", name)
+        if date_from:
+            query = query.gte("Date", date_from)
+        if date_to:
+            query = query.lte("Date", date_to)
+        if after:
+            query = query.lt("Date", after) if descending else query.gt("Date", after)
+        # Never ask for more than the row cap, which would truncate silently
+        response = query.order("Date", desc=descending).limit(min(limit, PAGE_SIZE)).execute()
+        return response.data or []
+
+    def get_class_dates(self):
+        """Distinct class dates via the get_class_dates RPC, or a paged Date-only scan"""
+        try:
+            response = self.client.rpc("get_class_dates").execute()
+            # A text[] of dates; rows come back from the older set-returning definition
+            return sorted({row["Date"] if isinstance(row, dict) else row for row in response.data or []})
+        except Exception as e:
+            # Only a missing RPC falls back; a timeout must not turn into a table scan
+            if getattr(e, "code", None) != MISSING_RPC_CODE:
+                raise
+
+        # Fallback for databases without the RPC: project one column and page
+        # through it explicitly so the row cap cannot truncate the result
+        dates = set()
+        start = 0
+        while True:
+            response = self.client.table("Attendance").select("Date") \
+                .order("Date").range(start, start + PAGE_SIZE - 1).execute()
+            rows = response.data or []
+            dates.update(row["Date"] for row in rows)
+            if len(rows) < PAGE_SIZE:
+                break
+            resilience.check_deadline()
+            start += PAGE_SIZE
+        return sorted(dates)
+
+    def get_class_calendar_version(self):
+        """Watermark from get_class_calendar_version (sql/class_calendar.sql)"""
+        try:
+            response = self.client.rpc("get_class_calendar_version").execute()
+        except Exception as e:
+            if getattr(e, "code", None) != MISSING_RPC_CODE:
+                raise
+            return None
+        return response.data
+
+    def attendance_exists(self, name, date):
+        response = self.client.table("Attendance").select("Date").eq("Name", name).eq("Date", date).execute()
+        return bool(response.data)
+
+    def insert_attendance(self, record):
+        self.client.table("Attendance").insert(record).execute()
+
+    def get_reward(self, name):
+        response = self.client.table("rewards").select("*").eq("Name", name).execute()
+        return response.data[0] if response.data else None
+
+    def upsert_reward(self, reward):
+        # Update-then-insert: rewards may lack the unique index an upsert needs
+        response = self.client.table("rewards").update({
+            "AttendanceCount": reward["AttendanceCount"],
+            "Badge": reward["Badge"]
+        }).eq("Name", reward["Name"]).execute()
+        if not response.data:
+            self.client.table("rewards").insert(reward).execute()
+
+    def _paged(self, query, page_size):
+        start = 0
+        while True:
+            rows = query().range(start, start + page_size - 1).execute().data or []
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                break
+            # Each page is bounded by the HTTP timeout, the whole read by the caller's deadline
+            resilience.check_deadline()
+            start += page_size
+
+    def get_attendance_scan_page(self, cursor=None, page_size=PAGE_SIZE, date_from=None):
+        # The cursor is the offset of the page; never ask for more than the row cap
+        start, page_size = cursor or 0, min(page_size, PAGE_SIZE)
+        query = self.client.table("Attendance").select("Name,Date")
+        if date_from:
+            query = query.gte("Date", date_from)
+        # Stable ordering so pages neither overlap nor skip rows
+        rows = query.order("Name").order("Date").range(start, start + page_size - 1).execute().data or []
+        return rows, (start + len(rows) if len(rows) == page_size else None)
+
+    def get_rewards(self):
+        rows = []
+        for page in self._paged(lambda: self.client.table("rewards").select("*").order("Name"), PAGE_SIZE):
+            rows.extend(page)
+        return rows
+
+    def upsert_rewards(self, rewards):
+        """Chunked upserts on Name; needs the unique index from sql/mark_attendance.sql"""
+        rewards = list(rewards)
+        for start in range(0, len(rewards), PAGE_SIZE):
+            chunk = rewards[start:start + PAGE_SIZE]
+            try:
+                self.client.table("rewards").upsert(chunk, on_conflict="Name").execute()
+            except Exception as e:
+                if getattr(e, "code", None) != NO_UNIQUE_CONSTRAINT_CODE:
+                    raise
+                super().upsert_rewards(chunk)
+
+    def recompute_rewards(self):
+        """One round trip through recompute_rewards (sql/recompute_rewards.sql)"""
+        try:
+            response = self.client.rpc("recompute_rewards").execute()
+        except Exception as e:
+            if getattr(e, "code", None) != MISSING_RPC_CODE:
+                raise
+            raise NotImplementedError("recompute_rewards RPC is not installed") from e
+        return response.data or []
+
+    def mark_attendance(self, record):
+        """One round trip through mark_attendance_atomic (sql/mark_attendance.sql)"""
+        try:
+            response = self.client.rpc("mark_attendance_atomic", {
+                "p_name": record["Name"],
+                "p_date": record["Date"],
+                "p_time": record["Time"],
+                "p_method": record["Method"]
+            }).execute()
+        except Exception as e:
+            if getattr(e, "code", None) != MISSING_RPC_CODE:
+                raise
+            return super().mark_attendance(record)
+
+        row = response.data[0] if response.data else {}
+        reward = {
+            "Name": record["Name"],
+            "AttendanceCount": row.get("AttendanceCount", 0),
+            "Badge": row.get("Badge", "No Badge")
+        }
+        return bool(row.get("is_new")), reward
+
+    def mark_attendance_batch(self, records):
+        """Whole batch in one round trip through mark_attendance_batch (sql/mark_attendance_batch.sql)"""
+        try:
+            response = self.client.rpc("mark_attendance_batch", {"p_marks": records}).execute()
+        except Exception as e:
+            if getattr(e, "code", None) != MISSING_RPC_CODE:
+                raise
+            return super().mark_attendance_batch(records)
+
+        rows = {(row["Name"], row["Date"]): row for row in response.data or []}
+        results = []
+        for record in records:
+            row = rows.get((record["Name"], record["Date"]), {})
+            reward = {
+                "Name": record["Name"],
+                "AttendanceCount": row.get("AttendanceCount", 0),
+                "Badge": row.get("Badge", "No Badge")
+            }
+            results.append((record, bool(row.get("is_new")), reward))
+        return results
+
+
+SQLITE_SCHEMA = """
+create table if not exists students_data (
+    "Name" text not null,
+    "Parent_Gmail" text not null
+);
+create index if not exists students_login_idx on students_data ("Name", "Parent_Gmail");
+
+create table if not exists "Attendance" (
+    "Name" text not null,
+    "Date" text not null,
+    "Time" text,
+    "Method" text
+);
+create unique index if not exists attendance_name_date_key on "Attendance" ("Name", "Date");
+create index if not exists attendance_date_idx on "Attendance" ("Date");
+
+-- Mirrors sql/class_calendar.sql: bumped when a date gains its first mark
+-- or loses its last one
+create table if not exists class_calendar_state (
+    id integer primary key check (id = 1),
+    version integer not null default 0
+);
+insert or ignore into class_calendar_state (id, version) values (1, 0);
+
+create trigger if not exists attendance_calendar_insert after insert on "Attendance"
+when (select count(*) from (select 1 from "Attendance" where "Date" = new."Date" limit 2)) = 1
+begin
+    update class_calendar_state set version = version + 1 where id = 1;
+end;
+
+create trigger if not exists attendance_calendar_delete after delete on "Attendance"
+when not exists (select 1 from "Attendance" where "Date" = old."Date")
+begin
+    update class_calendar_state set version = version + 1 where id = 1;
+end;
+
+create trigger if not exists attendance_calendar_update after update of "Date" on "Attendance"
+when old."Date" is not new."Date"
+begin
+    update class_calendar_state set version = version + 1 where id = 1;
+end;
+
+create table if not exists rewards (
+    "Name" text primary key,
+    "AttendanceCount" integer not null default 0,
+    "Badge" text not null default 'No Badge'
+);
+"""
+
+REWARDS_UPSERT = (
+    'insert into rewards ("Name", "AttendanceCount", "Badge") values (?, ?, ?) '
+    'on conflict ("Name") do update set '
+    '"AttendanceCount" = excluded."AttendanceCount", "Badge" = excluded."Badge"'
+)
+
+
+class SQLiteStorage(StorageBackend):
+    """Local SQLite storage with the same tables, for offline runs and benchmarks"""
+
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        # One connection shared across Streamlit's script threads
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conn.execute("pragma journal_mode=wal")
+            self.conn.executescript(SQLITE_SCHEMA)
+        # Runs on the executing thread, so a read past its deadline is interrupted
+        self.conn.set_progress_handler(resilience.past_deadline, 10000)
+
+    def close(self):
+        """Close the connection; forked children must not inherit it open"""
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _execute(self, sql, params=()):
+        # Each statement stands in for one backend round trip in the counters
+        resilience.check_deadline()
+        instrumentation.count_backend_call()
+        return self.conn.execute(sql, params)
+
+    def _execute_many(self, sql, rows):
+        instrumentation.count_backend_call()
+        return self.conn.executemany(sql, rows)
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return [dict(row) for row in self._execute(sql, params).fetchall()]
+
+    def find_student(self, name, parent_email):
+        rows = self._query(
+            'select * from students_data where "Name" = ? and "Parent_Gmail" = ? limit 1',
+            (name, parent_email),
+        )
+        return rows[0] if rows else None
+
+    def get_attendance(self, name):
+        return self._query('select * from "Attendance" where "Name" = ? order by "Date"', (name,))
+
+    def get_attendance_page(self, name, columns=ATTENDANCE_COLUMNS, date_from=None, date_to=None,
+                            after=None, limit=PAGE_SIZE, descending=True):
+        columns = _projection(columns)
+        where, params = ['"Name" = ?'], [name]
+        if date_from:
+            where.append('"Date" >= ?')
+            params.append(date_from)
+        if date_to:
+            where.append('"Date" <= ?')
+            params.append(date_to)
+        if after:
+            where.append('"Date" < ?' if descending else '"Date" > ?')
+            params.append(after)
+        sql = 'select {} from "Attendance" where {} order by "Date" {} limit ?'.format(
+            ", ".join(f'"{c}"' for c in columns), " and ".join(where), "desc" if descending else "asc"
+        )
+        return self._query(sql, (*params, limit))
+
+    def get_class_dates(self):
+        with self.lock:
+            rows = self._execute('select distinct "Date" from "Attendance" order by "Date"').fetchall()
+        return [row[0] for row in rows]
+
+    def get_class_calendar_version(self):
+        with self.lock:
+            return self._execute("select version from class_calendar_state where id = 1").fetchone()[0]
+
+    def attendance_exists(self, name, date):
+        return bool(self._query(
+            'select 1 from "Attendance" where "Name" = ? and "Date" = ? limit 1', (name, date)
+        ))
+
+    def insert_attendance(self, record):
+        with self.lock:
+            self._execute(
+                'insert into "Attendance" ("Name", "Date", "Time", "Method") values (?, ?, ?, ?)',
+                (record["Name"], record["Date"], record.get("Time"), record.get("Method")),
+            )
+
+    def get_reward(self, name):
+        rows = self._query('select * from rewards where "Name" = ?', (name,))
+        return rows[0] if rows else None
+
+    def upsert_reward(self, reward):
+        with self.lock:
+            self._execute(REWARDS_UPSERT, (reward["Name"], reward["AttendanceCount"], reward["Badge"]))
+
+    def get_attendance_scan_page(self, cursor=None, page_size=PAGE_SIZE, date_from=None):
+        # Keyset paging on the last (Name, Date) seen, so each page is an index range scan
+        rows = self._query(
+            'select "Name", "Date" from "Attendance" where ("Name", "Date") > (?, ?) and "Date" >= ? '
+            'order by "Name", "Date" limit ?',
+            (*(cursor or ("", "")), date_from or "", page_size),
+        )
+        return rows, ((rows[-1]["Name"], rows[-1]["Date"]) if len(rows) == page_size else None)
+
+    def get_rewards(self):
+        return self._query('select * from rewards order by "Name"')
+
+    def upsert_rewards(self, rewards):
+        """All rows in one transaction"""
+        rows = [(r["Name"], r["AttendanceCount"], r["Badge"]) for r in rewards]
+        self._transaction(lambda: self._execute_many(REWARDS_UPSERT, rows))
+
+    def recompute_rewards(self):
+        """Recount and rewrite in one write transaction, so marks wait for it"""
+        def recount():
+            rows = self._execute(
+                'select n."Name", r."AttendanceCount" as "OldCount", coalesce(c.attended, 0) as "AttendanceCount", '
+                'r."Badge" as "OldBadge" '
+                'from (select "Name" from "Attendance" union select "Name" from rewards) n '
+                'left join (select "Name", count(distinct "Date") as attended from "Attendance" group by "Name") c '
+                'on c."Name" = n."Name" '
+                'left join rewards r on r."Name" = n."Name" '
+                'order by n."Name"'
+            ).fetchall()
+            changes = []
+            for row in rows:
+                change = {**dict(row), "Badge": badge_for_count(row["AttendanceCount"])}
+                if (change["OldCount"], change["OldBadge"]) != (change["AttendanceCount"], change["Badge"]):
+                    changes.append(change)
+            self._execute_many(REWARDS_UPSERT, [(c["Name"], c["AttendanceCount"], c["Badge"]) for c in changes])
+            return changes
+
+        return self._transaction(recount)
+
+    def _mark(self, record):
+        # Caller holds the lock inside an open transaction
+        name = record["Name"]
+        cursor = self._execute(
+            'insert into "Attendance" ("Name", "Date", "Time", "Method") values (?, ?, ?, ?) '
+            'on conflict ("Name", "Date") do nothing',
+            (name, record["Date"], record.get("Time"), record.get("Method")),
+        )
+        if cursor.rowcount == 0:
+            return False, self.get_reward(name)
+        row = self._execute(
+            'select "AttendanceCount" from rewards where "Name" = ?', (name,)
+        ).fetchone()
+        count = (row[0] if row else 0) + 1
+        reward = {"Name": name, "AttendanceCount": count, "Badge": badge_for_count(count)}
+        self.upsert_reward(reward)
+        return True, reward
+
+    def _transaction(self, func):
+        with self.lock:
+            self.conn.execute("begin immediate")
+            try:
+                result = func()
+            except Exception:
+                self.conn.execute("rollback")
+                raise
+            self.conn.execute("commit")
+            return result
+
+    def mark_attendance(self, record):
+        """Same semantics as mark_attendance_atomic, in one SQLite transaction"""
+        return self._transaction(lambda: self._mark(record))
+
+    def mark_attendance_batch(self, records):
+        """Whole batch in a single transaction"""
+        return self._transaction(lambda: [(record, *self._mark(record)) for record in records])
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Process-wide storage backend selected by STORAGE_BACKEND"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == "sqlite":
+                _storage = SQLiteStorage(SQLITE_PATH)
+            else:
+                from supabase_client import get_client
+                _storage = SupabaseStorage(client_factory=get_client)
+        return _storage
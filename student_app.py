@@ -1,21 +1,41 @@
 import streamlit as st
-import cv2
+import functools
+import importlib.util
+import os
 import time
-import numpy as np
-import pandas as pd
-import requests
-import plotly.express as px
+from collections import deque
 from datetime import datetime
-from supabase_client import supabase
+from storage import get_storage
+import mark_queue
+import class_calendar
+import instrumentation
+import resilience
+import chat_router
+from attendance_repository import AttendanceRepository
+from chat_memory import RENDER_WINDOW, ChatMemory
+from session_qr import validate_session_qr
 
-import pytz
-from timezonefinder import TimezoneFinder
-from geopy.geocoders import Nominatim
+# Heavy dependencies (OpenCV, pandas, Plotly, requests) are imported inside
+# the views that need them so the login form renders without loading them
 
 # AI Configuration
 GROQ_API_KEY = "Your_api_key"
 GROQ_MODEL = "llama-3.3-70b-versatile"
 
+# "parallel" races preprocessing variants on a thread pool, "staged" runs the
+# sequential reduced-resolution pipeline (faster when there is only one core)
+QR_DECODE_MODE = "parallel" if (os.cpu_count() or 1) > 1 else "staged"
+
+# Latency breakdown sidebar; also enabled per session with ?debug=1
+DEBUG_PANEL = os.environ.get("PORTAL_DEBUG") == "1"
+
+# Continuous scanning needs the optional streamlit-webrtc component
+LIVE_SCAN_AVAILABLE = importlib.util.find_spec("streamlit_webrtc") is not None
+
+# Journal validated marks locally and sync them in the background instead of
+# blocking the student's screen on the backend write
+WRITE_BEHIND_MARKS = os.environ.get("WRITE_BEHIND_MARKS", "1") == "1"
+
 # Function to get user's timezone
 def get_user_timezone():
     try:
@@ -25,9 +45,6 @@ def get_user_timezone():
     except:
         return "Asia/Kolkata"  # Default to IST
 
-# OpenCV QR detector (works on Streamlit Cloud)
-qr_detector = cv2.QRCodeDetector()
-
 st.set_page_config(page_title="Student Portal", page_icon="🎓", layout="wide")
 
 # Session state
@@ -35,10 +52,44 @@ if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
 if "student_name" not in st.session_state:
     st.session_state.student_name = None
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+if "chat_memory" not in st.session_state:
+    st.session_state.chat_memory = ChatMemory()
 if "chatbot_visible" not in st.session_state:
     st.session_state.chatbot_visible = False
+if "traces" not in st.session_state:
+    st.session_state.traces = deque(maxlen=20)
+
+def get_backend():
+    """Storage backend with deadlines, retries and a circuit breaker, every
+    call counted and timed for the debug panel"""
+    return instrumentation.instrument_storage(resilience.resilient_storage(get_storage()))
+
+if "repository" not in st.session_state:
+    # Class dates come from one calendar snapshot shared by every session
+    st.session_state.repository = AttendanceRepository(
+        get_backend(), ttl=60, maxsize=64, calendar=class_calendar.get_class_calendar(get_backend())
+    )
+
+if WRITE_BEHIND_MARKS:
+    # Marks journaled before a restart sync without waiting for the next scan
+    mark_queue.resume_pending(get_backend())
+
+def get_repository():
+    """Per-session cached view of the attendance tables"""
+    return st.session_state.repository
+
+def get_attendance_matrix():
+    """Process-wide students x dates bit matrix; the first call starts building it"""
+    import attendance_matrix
+    return attendance_matrix.get_attendance_matrix(get_backend())
+
+def get_qr_decoder():
+    """Per-session QR decoder, built (and OpenCV loaded) on first scan"""
+    if "qr_decoder" not in st.session_state:
+        from qr_decoder import ParallelDecoder, QRDecoder
+        # The staged decoder remembers where the last QR was for the next snapshot
+        st.session_state.qr_decoder = ParallelDecoder() if QR_DECODE_MODE == "parallel" else QRDecoder()
+    return st.session_state.qr_decoder
 
 # CSS
 st.markdown("""
@@ -87,81 +138,160 @@ st.markdown("""
 def get_student_badge_info(student_name):
     """Get badge and reward information for student"""
     try:
-        response = supabase.table("rewards").select("*").eq("Name", student_name.upper()).execute()
-        if response.data:
-            return response.data[0]
+        reward = get_repository().get_badge(student_name)
+        if reward:
+            return reward
         return {"Name": student_name, "AttendanceCount": 0, "Badge": "No Badge"}
+    except resilience.BackendUnavailable:
+        raise
     except:
         return {"Name": student_name, "AttendanceCount": 0, "Badge": "No Badge"}
 
 def get_student_attendance_data(student_name):
     """Get attendance data for specific student"""
     try:
-        response = supabase.table("Attendance").select("*").eq("Name", student_name.upper()).execute()
-        return response.data
+        return get_repository().get_attendance(student_name)
+    except resilience.BackendUnavailable:
+        raise
     except:
         return []
-    """Get attendance data for specific student"""
+
+# Rows per page and the only columns the My Records tab shows
+RECORDS_PAGE_SIZE = 25
+RECORD_COLUMNS = ("Date", "Time", "Method")
+
+def get_student_records_page(student_name, date_from=None, date_to=None, after=None):
+    """One page of records, newest first, plus whether an older page exists"""
     try:
-        response = supabase.table("Attendance").select("*").eq("Name", student_name.upper()).execute()
-        return response.data
+        # One extra row tells us whether there is a next page without a count query
+        rows = get_repository().get_attendance_page(
+            student_name, RECORD_COLUMNS, date_from=date_from, date_to=date_to,
+            after=after, limit=RECORDS_PAGE_SIZE + 1
+        )
+        return rows[:RECORDS_PAGE_SIZE], len(rows) > RECORDS_PAGE_SIZE
+    except resilience.BackendUnavailable:
+        raise
     except:
-        return []
+        return [], False
+
+def get_student_stats(student_name):
+    """Attended, total, percentage, streaks and 4-week rate from the shared
+    matrix, or None while it is still being built"""
+    try:
+        matrix = get_attendance_matrix().current()
+        return matrix.student(student_name.upper()) if matrix is not None else None
+    except:
+        return None
+
+def view_loaders(student_name, reads):
+    """Zero-argument loaders for the named independent reads of a view.
+
+    "totals" stands for the reads behind calculate_student_percentage, which
+    are only needed until the shared matrix is built.
+    """
+    repository = get_repository()
+    available = {
+        "attendance": lambda: repository.get_attendance(student_name),
+        "badge": lambda: repository.get_badge(student_name),
+        "class_dates": repository.get_class_dates,
+    }
+    expanded = []
+    for read in reads:
+        if read == "totals":
+            if get_student_stats(student_name) is None:
+                expanded += ["class_dates", "attendance"]
+        else:
+            expanded.append(read)
+    return [available[read] for read in dict.fromkeys(expanded)]
 
 def calculate_student_percentage(student_name):
     """Calculate attendance percentage for specific student"""
+    stats = get_student_stats(student_name)
+    if stats is not None:
+        return stats["Attended"], stats["Total"], stats["Percentage"]
+    
     try:
-        # Get all attendance records to find total classes
-        all_attendance = supabase.table("Attendance").select("*").execute()
-        if not all_attendance.data:
+        # Distinct class dates give the total number of classes
+        class_dates = get_repository().get_class_dates()
+        if not class_dates:
             return 0, 0, 0
         
-        total_classes = len(pd.DataFrame(all_attendance.data)["Date"].unique())
+        total_classes = len(class_dates)
         
         # Get student's attendance
         student_attendance = get_student_attendance_data(student_name)
-        attended_classes = len(pd.DataFrame(student_attendance)["Date"].unique()) if student_attendance else 0
+        attended_classes = len({record["Date"] for record in student_attendance})
         
         percentage = (attended_classes / total_classes * 100) if total_classes > 0 else 0
         
         return attended_classes, total_classes, round(percentage, 2)
+    except resilience.BackendUnavailable:
+        raise
     except:
         return 0, 0, 0
 
-def create_attendance_graph(student_name):
-    """Create daily attendance line graph for student"""
+def create_attendance_graph(student_name, mode="auto"):
+    """Create attendance graph for student
+
+    mode is "auto", "daily", "weekly", "monthly" or "heatmap"; "auto" picks the
+    finest rollup that fits attendance_timeline.POINT_BUDGET.
+    """
     try:
-        # Get all attendance dates
-        all_attendance = supabase.table("Attendance").select("*").execute()
-        if not all_attendance.data:
+        # Get all class dates
+        all_dates = get_repository().get_class_dates()
+        if not all_dates:
             return None
         
-        all_dates = sorted(pd.DataFrame(all_attendance.data)["Date"].unique())
+        import attendance_timeline
+        import plotly.express as px
         
         # Get student's attendance
         student_records = get_student_attendance_data(student_name)
-        student_dates = [record["Date"] for record in student_records]
-        
-        # Create daily attendance data
-        attendance_data = []
-        for date in all_dates:
-            attendance_data.append({
-                "Date": date,
-                "Present": 1 if date in student_dates else 0
-            })
-        
-        df = pd.DataFrame(attendance_data)
-        df["Date"] = pd.to_datetime(df["Date"])
-        
-        # Create line graph
-        fig = px.line(df, x="Date", y="Present", 
-                     title=f"Daily Attendance Pattern - {student_name}",
-                     labels={"Present": "Attendance (1=Present, 0=Absent)", "Date": "Date"})
         
-        fig.update_traces(mode='lines', line=dict(width=3, color='blue'))
-        fig.update_layout(height=400, yaxis=dict(tickvals=[0, 1], ticktext=["Absent", "Present"]))
-        
-        return fig
+        # Vectorized presence per class date
+        with instrumentation.span("graph.dataframe"):
+            timeline = attendance_timeline.build_timeline(all_dates, [r["Date"] for r in student_records])
+        
+        # Plotly figure construction
+        with instrumentation.span("graph.figure"):
+            if mode == "heatmap":
+                grid = attendance_timeline.calendar_heatmap_frame(timeline)
+                fig = px.imshow(grid, color_continuous_scale=[[0, "#dc3545"], [1, "#28a745"]],
+                                zmin=0, zmax=1, aspect="auto",
+                                title=f"Attendance Calendar - {student_name}",
+                                labels={"x": "Week", "y": "", "color": "Present"})
+                fig.update_layout(height=300, coloraxis_showscale=False)
+                return fig
+        
+            if mode == "auto":
+                mode = attendance_timeline.choose_rollup(timeline)
+        
+            if mode == "daily" and len(timeline) <= attendance_timeline.POINT_BUDGET:
+                # Create line graph
+                fig = px.line(timeline, x="Date", y="Present", 
+                             title=f"Daily Attendance Pattern - {student_name}",
+                             labels={"Present": "Attendance (1=Present, 0=Absent)", "Date": "Date"})
+            
+                fig.update_traces(mode='lines', line=dict(width=3, color='blue'))
+                fig.update_layout(height=400, yaxis=dict(tickvals=[0, 1], ticktext=["Absent", "Present"]))
+                return fig
+        
+            if mode == "daily":
+                # Too many classes for a point each: buckets of consecutive
+                # classes average to a rate, so plot them on a rate axis
+                df = timeline.assign(Rate=timeline["Present"] * 100)
+            else:
+                df = attendance_timeline.rollup(timeline, attendance_timeline.ROLLUPS[mode])
+            df = attendance_timeline.downsample(df, "Rate")
+            fig = px.line(df, x="Date", y="Rate", markers=True,
+                         title=f"{mode.capitalize()} Attendance Rate - {student_name}",
+                         labels={"Rate": "Attendance Rate (%)", "Date": "Date"})
+            fig.update_traces(line=dict(width=3, color='blue'))
+            fig.add_hline(y=75, line_dash="dash", line_color="red")
+            fig.update_layout(height=400, yaxis=dict(range=[0, 105]))
+            return fig
+    except resilience.BackendUnavailable:
+        raise
     except:
         return None
 
@@ -172,12 +302,22 @@ def generate_student_insights(student_name):
         
         # Simple rule-based insights (replace with actual AI API if available)
         if percentage >= 90:
-            return f"Excellent attendance! You're attending {percentage}% of classes. Keep up the great work!"
+            insight = f"Excellent attendance! You're attending {percentage}% of classes. Keep up the great work!"
         elif percentage >= 75:
-            return f"Good attendance at {percentage}%. Try to maintain consistency to stay above 75%."
+            insight = f"Good attendance at {percentage}%. Try to maintain consistency to stay above 75%."
         else:
-            return f"Attendance is {percentage}%, below the 75% requirement. Consider improving attendance to avoid academic issues."
+            insight = f"Attendance is {percentage}%, below the 75% requirement. Consider improving attendance to avoid academic issues."
+        
+        stats = get_student_stats(student_name)
+        if stats is not None and stats["Total"]:
+            recent = stats["RecentRate"]
+            trend = "up from" if recent > percentage + 2 else "down from" if recent < percentage - 2 else "in line with"
+            insight += (f" Your current streak is {stats['CurrentStreak']} classes (best {stats['LongestStreak']})."
+                        f" Over the last 4 weeks you attended {recent}% of classes, {trend} your overall rate.")
+        return insight
             
+    except resilience.BackendUnavailable:
+        raise
     except:
         return "Unable to generate insights at this time."
 
@@ -205,14 +345,63 @@ def generate_student_insights(student_name):
     except:
         return "Unable to generate insights at this time."
 
-def student_chatbot_response(user_query, student_name):
-    """Enhanced chatbot using Groq API for comprehensive student queries"""
+def rule_based_response(user_query, student_name, attended, total, percentage, records):
+    """Answer common questions from student data without the model"""
     query_lower = user_query.lower()
     
-    # Get student data for context
+    if "name" in query_lower or "who am i" in query_lower:
+        return f"Your name is {student_name}. You are logged into the FaceMark Pro student portal."
+    
+    elif "attendance" in query_lower or "percentage" in query_lower:
+        return f"Your attendance: {attended}/{total} classes ({percentage}%). {'✅ Above 75% requirement!' if percentage >= 75 else '⚠️ Below 75% requirement.'}"
+    
+    elif "today" in query_lower:
+        today = datetime.now().strftime("%Y-%m-%d")
+        today_record = [r for r in records if r['Date'] == today]
+        if today_record:
+            return f"✅ Yes, you marked attendance today at {today_record[0]['Time']} via {today_record[0]['Method']}."
+        return "❌ No, you haven't marked attendance today yet."
+    
+    else:
+        return f"Hi {student_name}! I can help you with questions about your attendance percentage, records, and performance. Ask me anything!"
+
+
+def student_chatbot_response(user_query, student_name, history=None):
+    """Enhanced chatbot using Groq API; yields the answer as it streams in
+
+    history is the (summary, recent messages) pair from ChatMemory.context()
+    taken before this question was added.
+    """
+    # Deterministic questions are answered locally without a model round trip
+    intent = chat_router.classify(user_query)
+    chat_router.metrics.record(intent)
+    
+    # Get student data for context, the independent reads all at once
+    reads = ("totals", "attendance") if intent is None else ("totals", "attendance", "class_dates", "badge")
+    get_repository().prefetch(view_loaders(student_name, reads))
     attended, total, percentage = calculate_student_percentage(student_name)
     records = get_student_attendance_data(student_name)
     
+    if intent is not None:
+        try:
+            class_dates = get_repository().get_class_dates()
+        except resilience.BackendUnavailable:
+            raise
+        except:
+            class_dates = []
+        facts = {
+            "attended": attended,
+            "total": total,
+            "percentage": percentage,
+            "records": records,
+            "badge": get_student_badge_info(student_name),
+            "class_dates": class_dates
+        }
+        with instrumentation.span("chat.local_answer"):
+            answer = chat_router.answer(intent, student_name, facts)
+        yield answer
+        return
+    
     # Create context for AI
     context = f"""
     Student: {student_name}
@@ -221,62 +410,42 @@ def student_chatbot_response(user_query, student_name):
     Status: {'Above 75% requirement' if percentage >= 75 else 'Below 75% requirement'}
     """
     
-    # Try Groq API first
+    summary, recent = history or ("", [])
+    earlier = f"""
+    Summary of the earlier conversation:
+    {summary}
+    """ if summary else ""
+    
+    system_prompt = f"""
+    You are an attendance assistant for student {student_name}. 
+    
+    Context: {context}
+    {earlier}
+    Provide a helpful, concise response about their attendance. Be encouraging and specific.
+    """
+    
+    # Recent turns verbatim so follow-up questions make sense
+    messages = [{"role": "system", "content": system_prompt}, *recent,
+                {"role": "user", "content": user_query}]
+    
+    import chat_client
+    
+    # Try Groq API first, giving up quickly if no token arrives
     try:
-        prompt = f"""
-        You are an attendance assistant for student {student_name}. 
-        
-        Context: {context}
-        
-        Student Question: {user_query}
-        
-        Provide a helpful, concise response about their attendance. Be encouraging and specific.
-        """
-        
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": GROQ_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.7
-        }
-        
-        response = requests.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, json=payload)
-        response.raise_for_status()
-        
-        return response.json()["choices"][0]["message"]["content"]
-        
-    except Exception as e:
+        with instrumentation.span("chat.first_token"):
+            stream = chat_client.stream_completion(GROQ_API_KEY, GROQ_MODEL, messages, temperature=0.7)
+    except chat_client.ChatUnavailable:
         # Fallback to rule-based responses
-        if "name" in query_lower or "who am i" in query_lower:
-            return f"Your name is {student_name}. You are logged into the FaceMark Pro student portal."
-        
-        elif "attendance" in query_lower or "percentage" in query_lower:
-            return f"Your attendance: {attended}/{total} classes ({percentage}%). {'✅ Above 75% requirement!' if percentage >= 75 else '⚠️ Below 75% requirement.'}"
-        
-        elif "today" in query_lower:
-            today = datetime.now().strftime("%Y-%m-%d")
-            today_record = [r for r in records if r['Date'] == today]
-            if today_record:
-                return f"✅ Yes, you marked attendance today at {today_record[0]['Time']} via {today_record[0]['Method']}."
-            return "❌ No, you haven't marked attendance today yet."
-        
-        else:
-            return f"Hi {student_name}! I can help you with questions about your attendance percentage, records, and performance. Ask me anything!"
+        yield rule_based_response(user_query, student_name, attended, total, percentage, records)
+        return
+    
+    yield from stream
 
 
-def validate_session_qr(qr_data, session_id):
-    """SESSION:ClassID:TeacherID:Timestamp"""
-    try:
-        parts = qr_data.split(":")
-        if parts[0] == "SESSION" and parts[1] == session_id:
-            timestamp = int(parts[3])
-            return abs(int(time.time()) - timestamp) <= 10
-    except:
-        pass
-    return False
+def record_mark_locally(student_name, record, reward):
+    """Write a new mark through to the session cache and the shared matrix"""
+    get_repository().record_mark(student_name, record, reward)
+    get_attendance_matrix().mark(record["Name"], record["Date"])
 
 
 def mark_attendance(student_name):
@@ -285,56 +454,66 @@ def mark_attendance(student_name):
     dateString = now.strftime('%Y-%m-%d')
     timeString = now.strftime('%H:%M:%S')
     
+    repository = get_repository()
+    
     try:
-        # Check if already marked today
-        response = supabase.table("Attendance").select("*").eq("Name", student_name.upper()).eq("Date", dateString).execute()
-        if response.data:
-            return False  # Already marked
+        # Cached records already showing today's mark save a round trip
+        cached_records = repository.cache.get(("attendance", student_name.upper()))
+        if cached_records and any(r["Date"] == dateString for r in cached_records):
+            return False
         
-        # Mark attendance
-        supabase.table("Attendance").insert({
+        record = {
             "Name": student_name.upper(),
             "Date": dateString,
             "Time": timeString,
             "Method": "Student QR"
-        }).execute()
-        
-        # Update rewards
-        reward_response = supabase.table("rewards").select("*").eq("Name", student_name.upper()).execute()
+        }
         
-        if reward_response.data:
-            # Update existing
-            current_count = reward_response.data[0]["AttendanceCount"]
-            new_count = current_count + 1
-            
-            if new_count >= 10:
-                badge = "Gold"
-            elif new_count >= 5:
-                badge = "Silver"
-            elif new_count >= 4:
-                badge = "Bronze"
-            else:
-                badge = "No Badge"
+        if WRITE_BEHIND_MARKS:
+            # The journal only knows this process's marks; one taken on
+            # another device or replica is on the backend. During an outage
+            # the mark is queued anyway and the flush dedups it
+            try:
+                if get_backend().attendance_exists(record["Name"], dateString):
+                    return False  # Already marked
+            except resilience.BackendUnavailable:
+                pass
+
+            # The local journal dedups (Name, Date) without a network call
+            if not mark_queue.get_mark_queue(get_backend()).enqueue(record):
+                return False  # Already marked
             
-            supabase.table("rewards").update({
-                "AttendanceCount": new_count,
-                "Badge": badge
-            }).eq("Name", student_name.upper()).execute()
-        else:
-            # Create new
-            supabase.table("rewards").insert({
-                "Name": student_name.upper(),
-                "AttendanceCount": 1,
-                "Badge": "No Badge"
-            }).execute()
+            # The backend may already hold this mark (teacher app, another
+            # replica), so drop the cached badge rather than guess its count
+            record_mark_locally(student_name, record, None)
+            return True
+        
+        # Dedup, insert and reward update in one backend operation
+        is_new, reward = get_backend().mark_attendance(record)
+        
+        if not is_new:
+            return False  # Already marked
+        
+        # Keep cached views consistent with what was just written
+        record_mark_locally(student_name, record, reward)
         
         return True
         
     except Exception as e:
+        repository.invalidate_student(student_name)
         st.error(f"Error marking attendance: {e}")
         return False
 
 
+def render_unsynced_marks_notice(student_name):
+    """Tell the student about acknowledged marks the backend kept rejecting"""
+    queue = mark_queue.resume_pending(get_backend()) if WRITE_BEHIND_MARKS else None
+    dates = queue.failed_dates(student_name.upper()) if queue is not None else []
+    if dates:
+        st.error(f"❌ Your attendance for {', '.join(dates)} could not be saved. "
+                 "Scan again today or ask your teacher to record it.")
+
+
 def login_interface():
     st.subheader("🔐 Student Login")
 
@@ -343,13 +522,13 @@ def login_interface():
 
     if st.button("Login"):
         if name and email:
-            resp = supabase.table("students_data") \
-                .select("*") \
-                .eq("Name", name) \
-                .eq("Parent_Gmail", email) \
-                .execute()
+            try:
+                student = get_backend().find_student(name, email)
+            except resilience.BackendUnavailable:
+                st.error("⚠️ Login is temporarily unavailable. Please try again in a minute.")
+                return
 
-            if resp.data:
+            if student:
                 st.session_state.logged_in = True
                 st.session_state.student_name = name.upper()
                 st.success(f"✅ Welcome, {name}!")
@@ -360,217 +539,465 @@ def login_interface():
             st.warning("⚠️ Fill all fields")
 
 
-def scan_interface():
-    col1, col2 = st.columns([2, 1])
-    
-    with col2:
-        if st.button("Logout", type="secondary"):
-            st.session_state.logged_in = False
-            st.session_state.student_name = None
-            st.rerun()
-    
-    st.markdown(f"### 👋 Welcome, {st.session_state.student_name}")
-    
-    # Main screen navigation using tabs
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "📱 Mark Attendance", 
-        "📈 My Attendance", 
-        "🏆 My Badges",
-        "📋 My Records", 
-        "🎯 My Insights",
-        "💬 Chatbot"
-    ])
+def remember_trace(trace):
+    """Keep recent traces for the debug panel"""
+    st.session_state.traces.append(trace)
+
+
+def debug_enabled():
+    return DEBUG_PANEL or st.query_params.get("debug") == "1"
+
+
+def render_debug_panel():
+    """Per-rerun latency breakdown in the sidebar"""
+    import pandas as pd
     
-    with tab1:
-        st.subheader("📱 Mark Your Attendance")
-        
-        session_id = st.text_input("Session ID (ask teacher):")
-        img = st.camera_input("Point camera at QR Code")
-        
-        if img is not None and session_id:
-            file_bytes = np.asarray(bytearray(img.getvalue()), dtype=np.uint8)
-            frame = cv2.imdecode(file_bytes, 1)
-            
-            # Try multiple QR detection methods
-            qr_text, bbox, _ = qr_detector.detectAndDecode(frame)
-            
-            # If first method fails, try with grayscale
-            if not qr_text:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                qr_text, bbox, _ = qr_detector.detectAndDecode(gray)
-            
-            # If still fails, try with enhanced contrast
-            if not qr_text:
-                enhanced = cv2.convertScaleAbs(gray, alpha=1.5, beta=30)
-                qr_text, bbox, _ = qr_detector.detectAndDecode(enhanced)
-            
-            if not qr_text:
-                st.warning("❌ No QR detected! Try better lighting or closer distance.")
+    with st.sidebar:
+        st.subheader("🛠️ Performance")
+        st.toggle("Profile reruns", key="profile_reruns")
+        st.caption(f"Backend circuit: {resilience.resilient_storage(get_storage()).breaker.state}")
+        if WRITE_BEHIND_MARKS:
+            queue = mark_queue.get_mark_queue(get_backend())
+            st.caption(f"Marks waiting to sync: {queue.pending_count()} · failed: {queue.failed_count()}")
+        chat = chat_router.metrics.snapshot()
+        st.caption(f"Chat answered locally: {chat['hit_rate']:.0%} "
+                   f"({chat['local']} local · {chat['model']} model)")
+        calendar = get_repository().calendar.stats()
+        st.caption(f"Class calendar: {calendar['dates']} dates · {calendar['polls']} polls · "
+                   f"{calendar['reloads']} reloads")
+        if not st.session_state.traces:
+            st.caption("No reruns recorded yet.")
+            return
+        
+        # The trace of this very run is still open, so show the latest finished one
+        trace = st.session_state.traces[-1]
+        st.metric("Last rerun", f"{trace.total_ms:.0f} ms", f"{trace.backend_calls} backend calls",
+                  delta_color="off")
+        st.caption(f"{trace.name} · fragment reruns show up here on the next full rerun")
+        st.dataframe(pd.DataFrame(trace.breakdown(), columns=["Span", "Count", "ms"]),
+                     hide_index=True, use_container_width=True)
+        
+        history = pd.DataFrame([
+            {"Run": t.name, "ms": round(t.total_ms, 1), "Backend calls": t.backend_calls}
+            for t in reversed(st.session_state.traces)
+        ])
+        with st.expander("Recent reruns"):
+            st.dataframe(history, hide_index=True, use_container_width=True)
+        
+        if trace.profile:
+            with st.expander("Profile"):
+                st.code(trace.profile)
+
+
+def backend_guard(func):
+    """Flag stale data and outages in a view instead of showing zeros"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        notice = st.empty()
+        with resilience.collecting_stale() as stale:
+            try:
+                func(*args, **kwargs)
+            except resilience.BackendUnavailable:
+                notice.error("⚠️ Attendance data is temporarily unavailable. Please try again in a minute.")
                 return
-            
-            if validate_session_qr(qr_text, session_id):
-                if mark_attendance(st.session_state.student_name):
-                    st.success("✅ Attendance Marked Successfully!")
-                    st.balloons()
-                else:
-                    st.warning("⚠️ Already marked today!")
+        if stale:
+            minutes = max(age for _, age in stale) / 60
+            notice.warning(f"⚠️ The attendance service is not responding; showing saved data from "
+                           f"{'under a minute' if minutes < 1 else f'{minutes:.0f} min'} ago.")
+    return wrapper
+
+
+def loads(*reads):
+    """Issue a view's independent reads concurrently before it renders.
+
+    The view runs in a repository rerun scope, so its own calls pick up
+    the prefetched results and repeated reads within the run are shared.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            repository = get_repository()
+            with repository.rerun_scope():
+                repository.prefetch(view_loaders(st.session_state.student_name, reads))
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def refresh_student_data():
+    get_repository().invalidate_student(st.session_state.student_name)
+    # The summary and insights read the shared matrix, not the session cache
+    get_attendance_matrix().refresh_student(st.session_state.student_name)
+
+
+def refresh_button(key):
+    """Explicit refresh for the data-heavy views"""
+    # As a callback it runs before the view's rerun, whichever kind of rerun
+    # that turns out to be, so the view reads the fresh data
+    st.button("🔄 Refresh", key=key, on_click=refresh_student_data)
+
+
+@st.fragment
+@instrumentation.traced("view.mark", on_finish=remember_trace)
+@backend_guard
+def render_mark_attendance():
+    """QR scan view"""
+    st.subheader("📱 Mark Your Attendance")
+    render_unsynced_marks_notice(st.session_state.student_name)
+
+    session_id = st.text_input("Session ID (ask teacher):")
+
+    if LIVE_SCAN_AVAILABLE and st.toggle("📹 Live scan", key="live_scan_mode",
+                                         help="Scan continuously instead of taking photos"):
+        render_live_scan(session_id)
+        return
+
+    img = st.camera_input("Point camera at QR Code")
+
+    if img is not None and session_id:
+        decoder = get_qr_decoder()
+        with instrumentation.span("qr.decode"):
+            if QR_DECODE_MODE == "parallel":
+                # First variant whose text is a valid session QR wins
+                qr_text = decoder.decode_bytes(
+                    img.getvalue(), accept=lambda text: validate_session_qr(text, session_id)
+                ).text
             else:
-                st.error("❌ Invalid or Expired QR")
-    
-    with tab2:
-        attended, total, percentage = calculate_student_percentage(st.session_state.student_name)
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>{attended}</h3>
-                <p>Classes Attended</p>
+                # Reduced-resolution pass first, full resolution only where needed
+                qr_text = decoder.decode_bytes(img.getvalue()).text
+
+        if not qr_text:
+            st.warning("❌ No QR detected! Try better lighting or closer distance.")
+            return
+
+        if validate_session_qr(qr_text, session_id):
+            if mark_attendance(st.session_state.student_name):
+                st.success("✅ Attendance Marked Successfully!")
+                st.balloons()
+            else:
+                st.warning("⚠️ Already marked today!")
+        else:
+            st.error("❌ Invalid or Expired QR")
+
+
+def render_live_scan(session_id):
+    """Continuous scan from the browser camera; marks on the first valid frame"""
+    from streamlit_webrtc import WebRtcMode, webrtc_streamer
+    from live_scan import LiveScanner
+
+    if not session_id:
+        st.info("Enter the Session ID to start scanning.")
+        return
+
+    # One scanner per session ID; it keeps its outcome until the student scans again
+    live = st.session_state.get("live_scan")
+    if live is None or live["session_id"] != session_id:
+        live = st.session_state.live_scan = {
+            "session_id": session_id,
+            "scanner": LiveScanner(accept=lambda text: validate_session_qr(text, session_id)),
+            "outcome": None,
+        }
+    scanner = live["scanner"]
+
+    def on_frame(frame):
+        # Runs on the WebRTC worker thread; decoding stops once a frame is accepted
+        scanner.feed(frame.to_ndarray(format="bgr24"))
+        return frame
+
+    ctx = webrtc_streamer(
+        key="live_scan_stream",
+        mode=WebRtcMode.SENDRECV,
+        video_frame_callback=on_frame,
+        media_stream_constraints={"video": True, "audio": False},
+        async_processing=True,
+    )
+
+    status = st.empty()
+    while live["outcome"] is None and ctx.state.playing and not scanner.done:
+        status.caption(f"Scanning… {scanner.stats()['frames_decoded']} frames checked")
+        time.sleep(0.2)
+
+    if live["outcome"] is None and scanner.done:
+        with instrumentation.span("qr.live_mark"):
+            live["outcome"] = "marked" if mark_attendance(st.session_state.student_name) else "already"
+        if live["outcome"] == "marked":
+            st.balloons()
+
+    if live["outcome"] == "marked":
+        status.success("✅ Attendance Marked Successfully!")
+    elif live["outcome"] == "already":
+        status.warning("⚠️ Already marked today!")
+    elif scanner.rejected:
+        status.error("❌ Invalid or Expired QR")
+    if live["outcome"] is not None:
+        st.button("Scan again", key="live_scan_again", on_click=st.session_state.pop, args=("live_scan", None))
+
+
+@st.fragment
+@instrumentation.traced("view.summary", on_finish=remember_trace)
+@backend_guard
+@loads("totals")
+def render_attendance_summary():
+    """Attendance percentage view"""
+    refresh_button("refresh_summary")
+    render_unsynced_marks_notice(st.session_state.student_name)
+    attended, total, percentage = calculate_student_percentage(st.session_state.student_name)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h3>{attended}</h3>
+            <p>Classes Attended</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card">
+            <h3>{total}</h3>
+            <p>Total Classes</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col3:
+        color = "green" if percentage >= 75 else "red"
+        st.markdown(f"""
+        <div class="metric-card" style="background: {color};">
+            <h3>{percentage}%</h3>
+            <p>Attendance Rate</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    if percentage >= 75:
+        st.success(f"✅ Great! Your attendance is {percentage}% (Above required 75%)")
+    else:
+        st.error(f"⚠️ Warning: Your attendance is {percentage}% (Below required 75%)")
+
+
+@st.fragment
+@instrumentation.traced("view.badges", on_finish=remember_trace)
+@backend_guard
+@loads("badge")
+def render_badges():
+    """Badges and rewards view"""
+    st.subheader("🏆 My Badges & Rewards")
+    refresh_button("refresh_badges")
+    badge_info = get_student_badge_info(st.session_state.student_name)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Badge display
+        badge = badge_info.get("Badge", "No Badge")
+        if badge == "Gold":
+            st.markdown("""
+            <div style="background: linear-gradient(135deg, #FFD700 0%, #FFA500 100%); 
+                       padding: 2rem; border-radius: 15px; text-align: center; color: #333;">
+                <h2>🥇 GOLD BADGE</h2>
+                <p style="font-size: 18px; margin: 0;">Excellent Attendance!</p>
             </div>
             """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>{total}</h3>
-                <p>Total Classes</p>
+        elif badge == "Silver":
+            st.markdown("""
+            <div style="background: linear-gradient(135deg, #C0C0C0 0%, #A8A8A8 100%); 
+                       padding: 2rem; border-radius: 15px; text-align: center; color: #333;">
+                <h2>🥈 SILVER BADGE</h2>
+                <p style="font-size: 18px; margin: 0;">Good Attendance!</p>
             </div>
             """, unsafe_allow_html=True)
-        
-        with col3:
-            color = "green" if percentage >= 75 else "red"
-            st.markdown(f"""
-            <div class="metric-card" style="background: {color};">
-                <h3>{percentage}%</h3>
-                <p>Attendance Rate</p>
+        elif badge == "Bronze":
+            st.markdown("""
+            <div style="background: linear-gradient(135deg, #CD7F32 0%, #B87333 100%); 
+                       padding: 2rem; border-radius: 15px; text-align: center; color: white;">
+                <h2>🥉 BRONZE BADGE</h2>
+                <p style="font-size: 18px; margin: 0;">Keep Improving!</p>
             </div>
             """, unsafe_allow_html=True)
-        
-        if percentage >= 75:
-            st.success(f"✅ Great! Your attendance is {percentage}% (Above required 75%)")
         else:
-            st.error(f"⚠️ Warning: Your attendance is {percentage}% (Below required 75%)")
-    
-    with tab3:
-        st.subheader("🏆 My Badges & Rewards")
-        badge_info = get_student_badge_info(st.session_state.student_name)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Badge display
-            badge = badge_info.get("Badge", "No Badge")
-            if badge == "Gold":
-                st.markdown("""
-                <div style="background: linear-gradient(135deg, #FFD700 0%, #FFA500 100%); 
-                           padding: 2rem; border-radius: 15px; text-align: center; color: #333;">
-                    <h2>🥇 GOLD BADGE</h2>
-                    <p style="font-size: 18px; margin: 0;">Excellent Attendance!</p>
-                </div>
-                """, unsafe_allow_html=True)
-            elif badge == "Silver":
-                st.markdown("""
-                <div style="background: linear-gradient(135deg, #C0C0C0 0%, #A8A8A8 100%); 
-                           padding: 2rem; border-radius: 15px; text-align: center; color: #333;">
-                    <h2>🥈 SILVER BADGE</h2>
-                    <p style="font-size: 18px; margin: 0;">Good Attendance!</p>
-                </div>
-                """, unsafe_allow_html=True)
-            elif badge == "Bronze":
-                st.markdown("""
-                <div style="background: linear-gradient(135deg, #CD7F32 0%, #B87333 100%); 
-                           padding: 2rem; border-radius: 15px; text-align: center; color: white;">
-                    <h2>🥉 BRONZE BADGE</h2>
-                    <p style="font-size: 18px; margin: 0;">Keep Improving!</p>
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown("""
-                <div style="background: linear-gradient(135deg, #6c757d 0%, #495057 100%); 
-                           padding: 2rem; border-radius: 15px; text-align: center; color: white;">
-                    <h2>📋 NO BADGE YET</h2>
-                    <p style="font-size: 18px; margin: 0;">Attend more to earn badges!</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        with col2:
-            attendance_count = badge_info.get("AttendanceCount", 0)
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>{attendance_count}</h3>
-                <p>Total Attendance Count</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Badge requirements
             st.markdown("""
-            <div class="info-card">
-                <h4>🎯 Badge Requirements</h4>
-                <p>🥉 Bronze: 4+ attendances<br>
-                🥈 Silver: 5+ attendances<br>
-                🥇 Gold: 10+ attendances</p>
+            <div style="background: linear-gradient(135deg, #6c757d 0%, #495057 100%); 
+                       padding: 2rem; border-radius: 15px; text-align: center; color: white;">
+                <h2>📋 NO BADGE YET</h2>
+                <p style="font-size: 18px; margin: 0;">Attend more to earn badges!</p>
             </div>
             """, unsafe_allow_html=True)
-    
-    with tab4:
-        st.subheader("📋 Your Attendance Records")
-        records = get_student_attendance_data(st.session_state.student_name)
-        
-        if records:
-            df = pd.DataFrame(records)
-            st.dataframe(df[['Date', 'Time', 'Method']], use_container_width=True)
-        else:
-            st.info("No attendance records found.")
-    
-    with tab5:
-        st.subheader("🎯 AI Attendance Insights")
-        insights = generate_student_insights(st.session_state.student_name)
-        
+
+    with col2:
+        attendance_count = badge_info.get("AttendanceCount", 0)
         st.markdown(f"""
-        <div class="info-card">
-            <h4>📊 Your Attendance Analysis</h4>
-            <p>{insights}</p>
+        <div class="metric-card">
+            <h3>{attendance_count}</h3>
+            <p>Total Attendance Count</p>
         </div>
         """, unsafe_allow_html=True)
-        
-        # Add attendance graph
-        st.subheader("📈 Daily Attendance Pattern")
-        graph = create_attendance_graph(st.session_state.student_name)
-        if graph:
-            st.plotly_chart(graph, use_container_width=True)
-        else:
-            st.info("No attendance data available for graph.")
-    
-    with tab6:
-        st.subheader("💬 Attendance Assistant")
-        
+
+        # Badge requirements
         st.markdown("""
         <div class="info-card">
-            <h4>🤖 Ask me about your attendance!</h4>
-            <p>I can help with attendance percentage, records, and insights.</p>
+            <h4>🎯 Badge Requirements</h4>
+            <p>🥉 Bronze: 4+ attendances<br>
+            🥈 Silver: 5+ attendances<br>
+            🥇 Gold: 10+ attendances</p>
         </div>
         """, unsafe_allow_html=True)
-        
-        # Display chat history
-        for message in st.session_state.chat_history:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
-        
-        # Chat input
-        if user_input := st.chat_input("Ask about your attendance..."):
-            st.session_state.chat_history.append({"role": "user", "content": user_input})
-            with st.chat_message("user"):
-                st.markdown(user_input)
-            
-            with st.chat_message("assistant"):
-                response = student_chatbot_response(user_input, st.session_state.student_name)
-                st.markdown(response)
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
+
+
+@st.fragment
+@instrumentation.traced("view.records", on_finish=remember_trace)
+@backend_guard
+@loads()
+def render_records():
+    """Attendance records view"""
+    st.subheader("📋 Your Attendance Records")
+    refresh_button("refresh_records")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        date_from = st.date_input("From", value=None, key="records_from")
+    with col2:
+        date_to = st.date_input("To", value=None, key="records_to")
+    date_from = date_from.isoformat() if date_from else None
+    date_to = date_to.isoformat() if date_to else None
+
+    # Stack of `after` cursors, one per page visited; a new filter starts over
+    if st.session_state.get("records_filter") != (date_from, date_to):
+        st.session_state.records_filter = (date_from, date_to)
+        st.session_state.records_cursors = [None]
+    cursors = st.session_state.records_cursors
+
+    with instrumentation.span("records.page"):
+        records, has_more = get_student_records_page(
+            st.session_state.student_name, date_from, date_to, after=cursors[-1]
+        )
+
+    if records:
+        st.dataframe(records, column_order=RECORD_COLUMNS, use_container_width=True)
+    elif len(cursors) == 1:
+        st.info("No attendance records found.")
+
+    # Callbacks move the cursor before the fragment reruns with the new page
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("⬅️ Newer", key="records_newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+    with col2:
+        st.caption(f"Page {len(cursors)}" + (f" · {records[-1]['Date']} to {records[0]['Date']}" if records else ""))
+    with col3:
+        st.button("Older ➡️", key="records_older", disabled=not has_more,
+                  on_click=cursors.append, args=(records[-1]["Date"] if records else None,))
+
+
+@st.fragment
+@instrumentation.traced("view.insights", on_finish=remember_trace)
+@backend_guard
+@loads("class_dates", "attendance")
+def render_insights():
+    """Insights and graph view"""
+    st.subheader("🎯 AI Attendance Insights")
+    refresh_button("refresh_insights")
+    insights = generate_student_insights(st.session_state.student_name)
+
+    st.markdown(f"""
+    <div class="info-card">
+        <h4>📊 Your Attendance Analysis</h4>
+        <p>{insights}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Add attendance graph
+    st.subheader("📈 Daily Attendance Pattern")
+    mode = st.radio("Graph view", ["auto", "daily", "weekly", "monthly", "heatmap"],
+                    horizontal=True, format_func=str.capitalize, key="graph_mode")
+    graph = create_attendance_graph(st.session_state.student_name, mode)
+    if graph:
+        with instrumentation.span("graph.render"):
+            st.plotly_chart(graph, use_container_width=True)
+    else:
+        st.info("No attendance data available for graph.")
+
+
+@st.fragment
+@instrumentation.traced("view.chat", on_finish=remember_trace)
+@backend_guard
+@loads()
+def render_chatbot():
+    """Attendance assistant chat view"""
+    st.subheader("💬 Attendance Assistant")
+
+    st.markdown("""
+    <div class="info-card">
+        <h4>🤖 Ask me about your attendance!</h4>
+        <p>I can help with attendance percentage, records, and insights.</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    memory = st.session_state.chat_memory
+    if "chat_window" not in st.session_state:
+        st.session_state.chat_window = RENDER_WINDOW
+
+    # Only the latest window is rendered, so rerun cost stays flat in long chats
+    hidden = len(memory) - st.session_state.chat_window
+    if hidden > 0:
+        def show_earlier():
+            st.session_state.chat_window += RENDER_WINDOW
+
+        st.button(f"⬆️ Show earlier ({hidden} hidden)", key="chat_show_earlier", on_click=show_earlier)
+
+    for message in memory.window(st.session_state.chat_window):
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    # Chat input
+    if user_input := st.chat_input("Ask about your attendance..."):
+        history = memory.context()
+        memory.append("user", user_input)
+        with st.chat_message("user"):
+            st.markdown(user_input)
+
+        with st.chat_message("assistant"):
+            # Tokens render as they arrive instead of after the full completion
+            response = st.write_stream(
+                student_chatbot_response(user_input, st.session_state.student_name, history)
+            )
+            memory.append("assistant", response)
+
+
+# Views in navigation order; only the selected one runs on a rerun
+VIEWS = {
+    "📱 Mark Attendance": render_mark_attendance,
+    "📈 My Attendance": render_attendance_summary,
+    "🏆 My Badges": render_badges,
+    "📋 My Records": render_records,
+    "🎯 My Insights": render_insights,
+    "💬 Chatbot": render_chatbot
+}
+
+
+def scan_interface():
+    col1, col2 = st.columns([2, 1])
+    
+    with col2:
+        if st.button("Logout", type="secondary"):
+            st.session_state.logged_in = False
+            st.session_state.student_name = None
+            st.rerun()
+    
+    st.markdown(f"### 👋 Welcome, {st.session_state.student_name}")
+    
+    # Main screen navigation; unlike st.tabs, only the active view executes,
+    # and each view is a fragment so its own widgets rerun only that view
+    view = st.radio("View", list(VIEWS), horizontal=True, label_visibility="collapsed", key="active_view")
+    VIEWS[view]()
 
 
 
 # Main Controller
-if not st.session_state.logged_in:
-    login_interface()
-else:
-    scan_interface()
+with instrumentation.rerun_trace("script", profile=st.session_state.get("profile_reruns", False),
+                                 on_finish=remember_trace):
+    if not st.session_state.logged_in:
+        login_interface()
+    else:
+        scan_interface()
+
+if debug_enabled():
+    render_debug_panel()
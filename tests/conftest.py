@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app's modules live at the repository root, not in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
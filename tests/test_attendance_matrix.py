@@ -0,0 +1,113 @@
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import attendance_matrix
+from attendance_matrix import AttendanceMatrix, SharedAttendanceMatrix, student_streaks
+
+
+@pytest.mark.parametrize("row, current, longest", [
+    ([], 0, 0),
+    ([0, 0, 0], 0, 0),
+    ([1, 1, 1], 3, 3),
+    ([1, 1, 0, 1], 1, 2),
+    ([1, 0, 1, 1, 1, 0], 0, 3),
+    ([0, 1, 1, 0, 1, 1], 2, 2),
+])
+def test_streaks(row, current, longest):
+    present = np.array([row], dtype=bool).reshape(1, len(row))
+    got_current, got_longest = attendance_matrix._streaks(present)
+    assert (got_current[0], got_longest[0]) == (current, longest)
+
+
+def test_student_streaks_orders_class_dates():
+    class_dates = ["2026-10-04", "2026-10-01", "2026-10-03", "2026-10-02"]
+    assert student_streaks(class_dates, ["2026-10-01", "2026-10-02", "2026-10-04"]) == (1, 2)
+
+
+def test_stats_and_marks_across_byte_boundaries():
+    dates = [f"2026-09-{day:02d}" for day in range(1, 11)]
+    matrix = AttendanceMatrix()
+    for day in dates:
+        matrix.mark("A", day)
+    matrix.mark("B", dates[0])
+    matrix.mark("B", "2026-08-31")  # Back-dated class shifts every column
+    stats = matrix.stats()
+    assert stats.loc["A", "Attended"] == 10 and stats.loc["A", "Total"] == 11
+    assert stats.loc["A", "CurrentStreak"] == 10
+    assert stats.loc["B", "LongestStreak"] == 2
+    assert matrix.attended_counts().to_dict() == {"A": 10, "B": 2}
+    assert matrix.student("Nobody")["Attended"] == 0
+
+
+def test_replace_since_applies_marks_deletions_and_dropped_dates():
+    matrix = AttendanceMatrix()
+    for name, day in [("A", "2026-10-01"), ("A", "2026-10-10"), ("B", "2026-10-10"), ("B", "2026-10-11")]:
+        matrix.mark(name, day)
+    # Backend now: A lost 10-10, C marked 10-12, nobody has 10-11 any more
+    matrix.replace_since("2026-10-05", [("B", "2026-10-10"), ("C", "2026-10-12")])
+    assert matrix.dates == ["2026-10-01", "2026-10-10", "2026-10-12"]
+    assert matrix.attended_counts().to_dict() == {"A": 1, "B": 1, "C": 1}
+
+
+def test_set_student_replaces_the_row():
+    matrix = AttendanceMatrix()
+    matrix.mark("A", "2026-10-01")
+    matrix.mark("B", "2026-10-02")
+    matrix.set_student("A", ["2026-10-02", "2026-10-03"])
+    assert matrix.student("A")["Attended"] == 2
+    assert matrix.dates == ["2026-10-01", "2026-10-02", "2026-10-03"]
+
+
+class PagedStorage:
+    def __init__(self, rows):
+        self.rows = rows
+        self.windowed_reads = 0
+
+    def iter_attendance_pages(self, page_size=1000, date_from=None):
+        if date_from:
+            self.windowed_reads += 1
+        yield [{"Name": n, "Date": d} for n, d in self.rows if not date_from or d >= date_from]
+
+    def get_attendance(self, name):
+        return [{"Name": n, "Date": d} for n, d in self.rows if n == name]
+
+
+def wait_until_idle(shared):
+    for _ in range(100):
+        if not shared.updating:
+            return
+        time.sleep(0.01)
+
+
+def test_shared_matrix_syncs_recent_window_and_keeps_local_marks():
+    today = date.today()
+    day = lambda ago: (today - timedelta(days=ago)).isoformat()
+    storage = PagedStorage([("A", day(30)), ("A", day(2))])
+    shared = SharedAttendanceMatrix(storage, sync_seconds=0)
+    shared.rebuild()
+    wait_until_idle(shared)
+    assert shared.current().student("A")["Attended"] == 2
+
+    # Another process marks B; this process marks C before the backend has it
+    storage.rows.append(("B", day(1)))
+    shared.mark("C", day(0))
+    shared.current()
+    wait_until_idle(shared)
+    matrix = shared.current()
+    assert storage.windowed_reads >= 1
+    assert matrix.student("B")["Attended"] == 1
+    assert matrix.student("C")["Attended"] == 1
+    assert matrix.student("A")["Attended"] == 2
+
+
+def test_refresh_student_rereads_one_row():
+    storage = PagedStorage([("A", "2026-10-01")])
+    shared = SharedAttendanceMatrix(storage, sync_seconds=1e9)
+    shared.rebuild()
+    wait_until_idle(shared)
+    storage.rows.append(("A", "2026-10-02"))
+    shared.refresh_student("A")
+    assert shared.current().student("A")["Attended"] == 2
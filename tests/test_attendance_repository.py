@@ -0,0 +1,154 @@
+import threading
+import time
+
+import pytest
+
+from attendance_repository import AttendanceRepository, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=8, ttl=60)
+    cache.set("a", 1)
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a", "gone") == "gone"
+    assert len(cache) == 0
+
+
+def test_ttl_cache_invalidate_prefix():
+    cache = TTLCache()
+    cache.set(("records", "A", 1), "x")
+    cache.set(("records", "A", 2), "y")
+    cache.set(("records", "B", 1), "z")
+    cache.invalidate_prefix(("records", "A"))
+    assert len(cache) == 1 and ("records", "B", 1) in cache
+
+
+class SlowStorage:
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def get_attendance(self, name):
+        self.calls += 1
+        self.release.wait(5)
+        return [{"Name": name, "Date": "2026-10-17"}]
+
+
+def test_concurrent_reads_share_one_backend_call():
+    storage = SlowStorage()
+    repository = AttendanceRepository(storage)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(repository.get_attendance("a")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # Let every reader find the load in flight before it finishes
+    while not repository.loads:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    storage.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert storage.calls == 1
+    assert len(results) == 4 and all(r == results[0] for r in results)
+    # Served from the cache afterwards
+    repository.get_attendance("A")
+    assert storage.calls == 1
+
+
+def test_record_mark_writes_through_cached_attendance():
+    storage = SlowStorage()
+    storage.release.set()
+    repository = AttendanceRepository(storage)
+    repository.get_attendance("A")
+    record = {"Name": "A", "Date": "2026-10-18"}
+    repository.record_mark("A", record, {"Name": "A", "AttendanceCount": 2, "Badge": "No Badge"})
+    assert repository.get_attendance("A")[-1] == record
+    assert repository.get_badge("A")["AttendanceCount"] == 2
+    assert storage.calls == 1
+
+
+class CountingStorage:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = {}
+
+    def _call(self, method, name):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.error is not None:
+            raise self.error
+        return {"Name": name}
+
+    def get_attendance(self, name):
+        return [self._call("get_attendance", name)]
+
+    def get_reward(self, name):
+        return self._call("get_reward", name)
+
+
+def test_prefetch_runs_loaders_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    class BarrierStorage(CountingStorage):
+        def _call(self, method, name):
+            barrier.wait()  # Only returns once both loads are in flight
+            return super()._call(method, name)
+
+    storage = BarrierStorage()
+    repository = AttendanceRepository(storage)
+    repository.prefetch([lambda: repository.get_attendance("A"), lambda: repository.get_badge("A")])
+    assert repository.get_badge("A") == {"Name": "A"}
+    assert storage.calls == {"get_attendance": 1, "get_reward": 1}
+
+
+def test_prefetch_error_reaches_the_view_and_is_not_cached():
+    storage = CountingStorage(error=ConnectionError("down"))
+    repository = AttendanceRepository(storage)
+    repository.prefetch([lambda: repository.get_attendance("A"), lambda: repository.get_badge("A")])
+    with pytest.raises(ConnectionError):
+        repository.get_badge("A")
+    assert len(repository.cache) == 0 and not repository.loads
+    storage.error = None
+    assert repository.get_badge("A") == {"Name": "A"}
+
+
+def test_prefetch_error_in_a_rerun_scope_is_raised_once_per_rerun():
+    storage = CountingStorage(error=ConnectionError("down"))
+    repository = AttendanceRepository(storage)
+    with repository.rerun_scope():
+        repository.prefetch([lambda: repository.get_attendance("A"), lambda: repository.get_badge("A")])
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                repository.get_badge("A")
+        assert storage.calls["get_reward"] == 1
+    assert len(repository.cache) == 0 and not repository.loads
+    storage.error = None
+    assert repository.get_badge("A") == {"Name": "A"}
+    assert storage.calls["get_reward"] == 2
+
+
+def test_rerun_scope_does_not_reuse_results_across_scopes():
+    storage = CountingStorage()
+    # Nothing survives in the TTL cache, so only the scope can memoize
+    repository = AttendanceRepository(storage, ttl=-1)
+    with repository.rerun_scope():
+        repository.get_badge("A")
+        repository.get_badge("A")
+    assert storage.calls["get_reward"] == 1
+    with repository.rerun_scope():
+        repository.get_badge("A")
+    assert storage.calls["get_reward"] == 2
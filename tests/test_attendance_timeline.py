@@ -0,0 +1,74 @@
+import pandas as pd
+
+from attendance_timeline import build_timeline, calendar_heatmap_frame, choose_rollup, downsample, rollup
+
+
+def daily_timeline(start, days, present=lambda day: day % 2):
+    dates = pd.date_range(start, periods=days, freq="D")
+    attended = [d.strftime("%Y-%m-%d") for i, d in enumerate(dates) if present(i)]
+    return build_timeline(dates.strftime("%Y-%m-%d"), attended)
+
+
+def spread_timeline(rows, span_days):
+    """rows class dates from day 0 to day span_days"""
+    offsets = [round(i * span_days / (rows - 1)) for i in range(rows)]
+    dates = pd.Timestamp("2026-01-05") + pd.to_timedelta(offsets, unit="D")
+    return build_timeline(dates.strftime("%Y-%m-%d"), [])
+
+
+def test_build_timeline_marks_presence_and_dedups():
+    timeline = build_timeline(["2026-01-02", "2026-01-01", "2026-01-02"], ["2026-01-02", "2026-01-02"])
+    assert timeline["Date"].dt.strftime("%Y-%m-%d").tolist() == ["2026-01-01", "2026-01-02"]
+    assert timeline["Present"].tolist() == [0, 1]
+
+
+def test_choose_rollup_at_budget_boundaries():
+    assert choose_rollup(spread_timeline(10, 9), budget=10) == "daily"
+    # One row over the budget: weekly while the span is at most budget weeks
+    assert choose_rollup(spread_timeline(11, 70), budget=10) == "weekly"
+    assert choose_rollup(spread_timeline(11, 71), budget=10) == "monthly"
+
+
+def test_rollup_rates_per_period():
+    timeline = daily_timeline("2026-01-05", 14, present=lambda day: day < 7)  # Mondays
+    weekly = rollup(timeline, "W-MON")
+    assert weekly["Date"].dt.strftime("%Y-%m-%d").tolist() == ["2026-01-05", "2026-01-12"]
+    assert weekly[["Attended", "Classes", "Rate"]].values.tolist() == [[7, 7, 100.0], [0, 7, 0.0]]
+
+
+def test_downsample_respects_the_point_budget():
+    timeline = daily_timeline("2024-01-01", 1001).assign(Rate=lambda f: f["Present"] * 100)
+    points = downsample(timeline, "Rate", budget=400)
+    assert len(points) <= 400
+    assert points["Date"].iloc[0] == timeline["Date"].iloc[0]
+    assert points["Rate"].between(0, 100).all()
+    assert len(downsample(timeline.head(400), "Rate", budget=400)) == 400  # Already fits
+
+
+def test_empty_timeline():
+    timeline = build_timeline([], [])
+    assert timeline.empty
+    assert choose_rollup(timeline) == "daily"
+    assert rollup(timeline, "MS").empty
+    assert downsample(timeline.assign(Rate=[]), "Rate").empty
+    grid = calendar_heatmap_frame(timeline)
+    assert grid.shape == (7, 0)
+
+
+def test_heatmap_grid_across_a_year_boundary():
+    # Mon 2025-12-22 through Sun 2026-01-11: three Monday-to-Sunday weeks
+    timeline = daily_timeline("2025-12-22", 21, present=lambda day: day != 10)
+    grid = calendar_heatmap_frame(timeline)
+    assert grid.shape == (7, 3)
+    assert list(grid.index) == ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    assert [c.strftime("%Y-%m-%d") for c in grid.columns] == ["2025-12-22", "2025-12-29", "2026-01-05"]
+    assert grid.loc["Thu", pd.Timestamp("2025-12-29")] == 0  # 2026-01-01, absent
+    assert grid.loc["Wed", pd.Timestamp("2025-12-29")] == 1  # 2025-12-31
+
+
+def test_heatmap_keeps_recent_weeks_and_leaves_no_class_days_empty():
+    timeline = build_timeline(pd.date_range("2024-01-01", "2025-12-31", freq="W-WED").strftime("%Y-%m-%d"), [])
+    grid = calendar_heatmap_frame(timeline, weeks=10)
+    assert grid.shape[1] == 10
+    assert grid.loc["Wed"].notna().all()
+    assert grid.drop(index="Wed").isna().all().all()
@@ -0,0 +1,41 @@
+import chat_memory
+from chat_memory import ChatMemory, estimate_tokens
+
+
+def test_transcript_is_bounded():
+    memory = ChatMemory(max_messages=3)
+    for i in range(5):
+        memory.append("user", f"question {i}.")
+    assert len(memory) == 3
+    assert [m["content"] for m in memory.window(2)] == ["question 3.", "question 4."]
+    # The two dropped messages survive in the summary
+    assert memory.summary == "Student: question 0.\nStudent: question 1."
+
+
+def test_context_fits_budget_and_folds_older_turns_once():
+    memory = ChatMemory()
+    for i in range(6):
+        memory.append("user" if i % 2 == 0 else "assistant", f"Message {i}. " + "x" * 36)
+    per_message = estimate_tokens(memory.messages[0]["content"])
+
+    summary, recent = memory.context(budget=per_message * 2)
+    assert [m["content"][:9] for m in recent] == ["Message 4", "Message 5"]
+    assert summary.splitlines() == [f"{'Student' if i % 2 == 0 else 'Assistant'}: Message {i}." for i in range(4)]
+
+    # Asking again doesn't fold the same messages twice
+    assert memory.context(budget=per_message * 2)[0] == summary
+
+
+def test_summary_stays_within_its_budget(monkeypatch):
+    monkeypatch.setattr(chat_memory, "SUMMARY_TOKEN_BUDGET", 20)
+    memory = ChatMemory(max_messages=2)
+    for i in range(30):
+        memory.append("user", f"Question number {i} about my attendance. More detail follows.")
+    assert memory.summary_tokens <= 20
+    assert memory.summary_lines[-1] == "Student: Question number 27 about my attendance."
+
+
+def test_gist_clips_long_first_sentences():
+    line = chat_memory._gist("word " * 100)
+    assert len(line) == chat_memory.SUMMARY_LINE_CHARS
+    assert line.endswith("…")
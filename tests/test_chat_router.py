@@ -0,0 +1,60 @@
+import pytest
+
+import chat_router
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("Did I mark attendance today?", "today"),
+    ("was i marked", "today"),
+    ("what's my streak", "streak"),
+    ("how many classes in a row have I attended", "streak"),
+    ("which classes did I miss?", "missed"),
+    ("show my absences", "missed"),
+    ("what are my badges", "badge"),
+    ("do I have a gold badge", "badge"),
+    ("what is my attendance", "percentage"),
+    ("am I above 75%?", "percentage"),
+    ("who am i", "name"),
+])
+def test_classify_deterministic_questions(question, intent):
+    assert chat_router.classify(question) == intent
+
+
+@pytest.mark.parametrize("question", [
+    "how can I improve my attendance?",
+    "why is my attendance low",
+    "what was my attendance last month",
+    "did I attend on 2026-10-01",
+    "what is the attendance policy",
+    "what is the class average attendance",
+    "what's the weather like",
+    "",
+])
+def test_open_ended_or_qualified_questions_go_to_the_model(question):
+    assert chat_router.classify(question) is None
+
+
+def facts(**overrides):
+    return {"attended": 3, "total": 4, "percentage": 75.0, "records": [],
+            "badge": {"Badge": "No Badge", "AttendanceCount": 3}, "class_dates": [], **overrides}
+
+
+def test_answer_percentage():
+    assert "3/4 classes (75.0%)" in chat_router.answer("percentage", "A", facts())
+
+
+def test_answer_missed_and_streak():
+    records = [{"Date": d} for d in ("2026-10-01", "2026-10-03", "2026-10-04")]
+    class_dates = ["2026-10-01", "2026-10-02", "2026-10-03", "2026-10-04"]
+    given = facts(records=records, class_dates=class_dates)
+    assert chat_router.answer("missed", "A", given) == "You missed 1 class: 2026-10-02."
+    assert chat_router.answer("streak", "A", given).startswith("🔥 Current streak: 2 classes in a row. Longest streak: 2.")
+
+
+def test_metrics_hit_rate():
+    metrics = chat_router.RouterMetrics()
+    for intent in ("today", None, "badge", None):
+        metrics.record(intent)
+    snap = metrics.snapshot()
+    assert (snap["local"], snap["model"], snap["hit_rate"]) == (2, 2, 0.5)
+    assert snap["intents"] == {"today": 1, "badge": 1}
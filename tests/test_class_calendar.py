@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from class_calendar import ClassCalendar
+
+
+class CalendarStorage:
+    def __init__(self, dates, version=1):
+        self.dates = list(dates)
+        self.version = version
+        self.date_reads = 0
+
+    def get_class_calendar_version(self):
+        return self.version
+
+    def get_class_dates(self):
+        self.date_reads += 1
+        return self.dates
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_reloads_dates_only_when_version_moves():
+    storage = CalendarStorage(["2026-10-01"])
+    calendar = ClassCalendar(storage)
+    assert calendar.dates() == ("2026-10-01",)
+    assert not calendar.refresh()
+    storage.dates.append("2026-10-02")
+    storage.version += 1
+    assert calendar.refresh()
+    assert calendar.dates() == ("2026-10-01", "2026-10-02")
+    assert storage.date_reads == 2
+
+
+def test_local_date_shows_until_confirmed(clock):
+    storage = CalendarStorage(["2026-10-01"])
+    calendar = ClassCalendar(storage, pending_seconds=600)
+    calendar.dates()
+    calendar.add("2026-10-02")
+    assert calendar.dates() == ("2026-10-01", "2026-10-02")
+    storage.dates.append("2026-10-02")
+    storage.version += 1
+    calendar.refresh()
+    clock[0] += 601
+    calendar.refresh()
+    assert calendar.dates() == ("2026-10-01", "2026-10-02")
+
+
+def test_unconfirmed_local_date_expires(clock):
+    storage = CalendarStorage(["2026-10-01"])
+    calendar = ClassCalendar(storage, pending_seconds=600)
+    calendar.dates()
+    calendar.add("2026-10-02")
+    clock[0] += 599
+    calendar.refresh()
+    assert "2026-10-02" in calendar.dates()
+    clock[0] += 2
+    calendar.refresh()  # Version unchanged: no reload, but the date still expires
+    assert calendar.dates() == ("2026-10-01",)
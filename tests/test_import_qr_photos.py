@@ -0,0 +1,105 @@
+import os
+from datetime import datetime
+
+import pytest
+
+import import_qr_photos
+from import_qr_photos import decode_photo, find_photos, keep_earliest, to_record
+from qr_decoder import DecodeResult
+
+SCANNED_AT = datetime(2026, 3, 2, 9, 15, 30).timestamp()
+
+
+def photo(folder, relative, mtime=SCANNED_AT):
+    path = folder / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"not really a jpeg")
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_find_photos_names_by_folder_and_skips_other_files(tmp_path):
+    ana = photo(tmp_path, "Ana Lima/1.jpg")
+    photo(tmp_path, "Ana Lima/notes.txt")
+    loose = photo(tmp_path, "loose.PNG")
+    assert dict(find_photos(str(tmp_path))) == {ana: "Ana Lima", loose: None}
+
+
+def test_find_photos_manifest_wins_over_the_folder(tmp_path):
+    by_path = photo(tmp_path, "proctor/1.jpg")
+    by_name = photo(tmp_path, "proctor/2.jpg")
+    unlisted = photo(tmp_path, "proctor/3.jpg")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("file,name\nproctor/1.jpg,Ana Lima\n2.jpg,Ben Okafor\n")
+    photos = dict(find_photos(str(tmp_path), str(manifest)))
+    assert photos == {by_path: "Ana Lima", by_name: "Ben Okafor", unlisted: "proctor"}
+
+
+def test_to_record_uses_local_date_and_time():
+    assert to_record("  ana lima ", SCANNED_AT) == {
+        "Name": "ANA LIMA", "Date": "2026-03-02", "Time": "09:15:30", "Method": import_qr_photos.METHOD,
+    }
+
+
+def test_keep_earliest_scan_per_student_and_day():
+    marks = {}
+    for name, stamp in [("Ana", SCANNED_AT + 60), ("Ana", SCANNED_AT), ("Ana", SCANNED_AT + 30),
+                        ("Ana", SCANNED_AT + 86400), ("Ben", SCANNED_AT + 5)]:
+        keep_earliest(marks, to_record(name, stamp))
+    assert {key: record["Time"] for key, record in marks.items()} == {
+        ("ANA", "2026-03-02"): "09:15:30",
+        ("ANA", "2026-03-03"): "09:15:30",
+        ("BEN", "2026-03-02"): "09:15:35",
+    }
+
+
+class StubDecoder:
+    def __init__(self, text):
+        self.text = text
+        self.last_box = None
+        self.calls = 0
+
+    def decode_bytes(self, data, accept=None):
+        self.calls += 1
+        return DecodeResult(self.text, None, "stub")
+
+    decode_variants = decode_bytes
+
+
+@pytest.fixture
+def decoders(monkeypatch):
+    def install(text, fallback_text=""):
+        decoder, fallback = StubDecoder(text), StubDecoder(fallback_text)
+        monkeypatch.setattr(import_qr_photos, "_decoder", decoder)
+        monkeypatch.setattr(import_qr_photos, "_fallback", fallback)
+        return decoder, fallback
+    return install
+
+
+def session_qr(session="CS101", at=SCANNED_AT):
+    return f"SESSION:{session}:T1:{int(at)}"
+
+
+def test_decode_photo_validates_against_the_capture_time(tmp_path, decoders):
+    path = photo(tmp_path, "Ana/1.jpg")
+    _, fallback = decoders(session_qr(at=SCANNED_AT - 5))
+    result = decode_photo(path, "CS101", window=10)
+    assert (result["status"], result["time_source"], result["scanned_at"]) == ("accepted", "mtime", SCANNED_AT)
+    assert fallback.calls == 0
+
+
+@pytest.mark.parametrize("text, status", [
+    (session_qr(session="CS999"), "rejected"),
+    (session_qr(at=SCANNED_AT - 60), "rejected"),
+    ("", "no_qr"),
+])
+def test_decode_photo_statuses(tmp_path, decoders, text, status):
+    path = photo(tmp_path, "Ana/1.jpg")
+    decoders("", fallback_text=text)
+    assert decode_photo(path, "CS101", window=10)["status"] == status
+
+
+def test_decode_photo_reports_errors(tmp_path, decoders):
+    decoders(session_qr())
+    result = decode_photo(str(tmp_path / "missing.jpg"), "CS101", window=10)
+    assert result["status"] == "error" and result["error"]
@@ -0,0 +1,40 @@
+import cProfile
+import threading
+
+import instrumentation
+
+
+def test_only_one_concurrent_rerun_is_profiled():
+    inside = threading.Barrier(2, timeout=5)
+    traces = []
+
+    def rerun():
+        with instrumentation.rerun_trace("script", profile=True) as trace:
+            inside.wait()  # Both reruns are running at once
+            traces.append(trace)
+            inside.wait()
+
+    threads = [threading.Thread(target=rerun) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    profiles = [trace.profile for trace in traces]
+    assert sum(profile.startswith("Not profiled") for profile in profiles) == 1
+    assert sum("function calls" in profile for profile in profiles) == 1
+    # The lock is free again for the next rerun
+    with instrumentation.rerun_trace("script", profile=True) as trace:
+        pass
+    assert "function calls" in trace.profile
+
+
+def test_profiler_refused_by_the_interpreter_is_skipped(monkeypatch):
+    class Refused(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile, "Profile", Refused)
+    with instrumentation.rerun_trace("script", profile=True) as trace:
+        pass
+    assert trace.profile == "Not profiled: another profiler is active"
+    assert not instrumentation._profile_lock.locked()
@@ -0,0 +1,147 @@
+import pytest
+
+import mark_queue
+from mark_queue import MarkQueue
+
+
+class FakeStorage:
+    """Records what reaches the backend; `error` is raised instead when set"""
+
+    def __init__(self):
+        self.error = None
+        self.marked = []
+
+    def mark_attendance_batch(self, records):
+        if self.error:
+            raise self.error
+        self.marked.extend(records)
+
+    def mark_attendance(self, record):
+        if self.error:
+            raise self.error
+        self.marked.append(record)
+
+
+class Rejected(Exception):
+    """A request error, not a transport one"""
+
+
+def mark(name, day="2026-10-17"):
+    return {"Name": name, "Date": day, "Time": "09:00:00", "Method": "Student QR"}
+
+
+@pytest.fixture
+def storage():
+    return FakeStorage()
+
+
+@pytest.fixture
+def queue(storage, tmp_path):
+    return MarkQueue(storage, path=str(tmp_path / "journal.db"))
+
+
+def statuses(queue):
+    return queue.conn.execute('select "Name", status, attempts from pending_marks order by "Name"').fetchall()
+
+
+def test_enqueue_dedups_name_and_date(queue):
+    assert queue.enqueue(mark("A"))
+    assert not queue.enqueue(mark("A"))
+    assert queue.enqueue(mark("A", "2026-10-18"))
+    assert queue.pending_count() == 2
+
+
+def test_flush_sends_batch_and_marks_sent(queue, storage):
+    queue.enqueue(mark("A"))
+    queue.enqueue(mark("B"))
+    assert queue.flush_once() == (2, 0)
+    assert [r["Name"] for r in storage.marked] == ["A", "B"]
+    assert queue.pending_count() == 0
+    # Already sent today still counts as marked
+    assert not queue.enqueue(mark("A"))
+
+
+def test_outage_keeps_marks_pending_without_using_attempts(queue, storage):
+    queue.enqueue(mark("A"))
+    storage.error = ConnectionError("down")
+    for _ in range(mark_queue.MAX_ATTEMPTS + 5):
+        assert queue.flush_once() == (0, 1)
+    assert statuses(queue) == [("A", "pending", 0)]
+
+
+def test_rejected_mark_is_parked_after_max_attempts(queue, storage, monkeypatch):
+    monkeypatch.setattr(mark_queue, "MAX_ATTEMPTS", 3)
+    queue.enqueue(mark("A"))
+    storage.error = Rejected("bad row")
+    for _ in range(3):
+        queue.flush_once()
+    assert statuses(queue) == [("A", "failed", 3)]
+    assert queue.pending_count() == 0
+    assert queue.failed_count() == 1
+    assert queue.failed_dates("A") == ["2026-10-17"]
+
+
+def test_parked_mark_can_be_queued_again(queue, storage, monkeypatch):
+    monkeypatch.setattr(mark_queue, "MAX_ATTEMPTS", 1)
+    queue.enqueue(mark("A"))
+    storage.error = Rejected("bad row")
+    queue.flush_once()
+    assert queue.enqueue(mark("A"))
+    assert statuses(queue) == [("A", "pending", 0)]
+    storage.error = None
+    assert queue.flush_once() == (1, 0)
+    assert queue.failed_count() == 0
+
+
+def test_poison_mark_does_not_hold_up_the_batch(queue, storage):
+    class PickyStorage(FakeStorage):
+        def mark_attendance_batch(self, records):
+            raise Rejected("batch rejected")
+
+        def mark_attendance(self, record):
+            if record["Name"] == "B":
+                raise Rejected("bad row")
+            self.marked.append(record)
+
+    queue.storage = picky = PickyStorage()
+    for name in "ABC":
+        queue.enqueue(mark(name))
+    assert queue.flush_once() == (2, 1)
+    assert [r["Name"] for r in picky.marked] == ["A", "C"]
+    assert statuses(queue) == [("A", "sent", 1), ("B", "pending", 1), ("C", "sent", 1)]
+
+
+def test_outage_mid_isolation_leaves_the_rest_pending(queue):
+    class FlakyStorage(FakeStorage):
+        def mark_attendance_batch(self, records):
+            raise Rejected("batch rejected")
+
+        def mark_attendance(self, record):
+            if record["Name"] != "A":
+                raise ConnectionError("down")
+            self.marked.append(record)
+
+    queue.storage = FlakyStorage()
+    for name in "ABC":
+        queue.enqueue(mark(name))
+    assert queue.flush_once() == (1, 2)
+    assert statuses(queue) == [("A", "sent", 1), ("B", "pending", 0), ("C", "pending", 0)]
+
+
+def test_resume_pending_starts_the_worker_only_with_pending_marks(storage, tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.db")
+    monkeypatch.setattr(mark_queue, "MARK_QUEUE_PATH", path)
+    monkeypatch.setattr(mark_queue, "_queue", None)
+    assert mark_queue.resume_pending(storage) is None
+
+    MarkQueue(storage, path=path).enqueue(mark("A"))
+    queue = mark_queue.resume_pending(storage)
+    try:
+        assert queue.thread is not None
+        for _ in range(50):
+            if storage.marked:
+                break
+            queue.stopped.wait(0.05)
+        assert [r["Name"] for r in storage.marked] == ["A"]
+    finally:
+        queue.stop()
@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from qr_decoder import ParallelDecoder
+
+CORPUS = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "qr_corpus")
+
+
+def photo(name):
+    with open(os.path.join(CORPUS, name), "rb") as handle:
+        return handle.read()
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+@pytest.fixture
+def executor():
+    with CountingExecutor() as executor:
+        yield executor
+
+
+def test_reduced_pass_hit_skips_the_variants(executor):
+    decoder = ParallelDecoder("opencv", variants=["gray", "bgr"], executor=executor, parallel=True)
+    result = decoder.decode_bytes(photo("clean.jpg"))
+    assert result.text == "SESSION:CS101:T01:1760000000"
+    assert result.stage in ("roi", "reduced")
+    assert executor.submitted == 0
+
+
+def test_reduced_pass_miss_fans_out(executor):
+    decoder = ParallelDecoder("opencv", variants=["gray", "bgr"], executor=executor, parallel=True)
+    result = decoder.decode_bytes(photo("distant.jpg"))
+    assert result.text == "SESSION:CS101:T01:1760000001"
+    assert executor.submitted == 2
+
+
+def test_rejected_reduced_text_still_tries_the_variants(executor):
+    decoder = ParallelDecoder("opencv", variants=["gray"], executor=executor, parallel=True)
+    result = decoder.decode_bytes(photo("clean.jpg"), accept=lambda text: False)
+    assert result.text == "SESSION:CS101:T01:1760000000"  # Returned so callers can say "wrong QR"
+    assert executor.submitted == 1
+
+
+def test_single_core_uses_the_staged_decoder(executor):
+    decoder = ParallelDecoder("opencv", executor=executor, parallel=False)
+    for name, expected in [("distant.jpg", "SESSION:CS101:T01:1760000001"), ("no_qr_0.jpg", "")]:
+        assert decoder.decode_bytes(photo(name)).text == expected
+    assert executor.submitted == 0
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from recompute_rewards import attendance_counts, badges_for_counts, plan_changes, recompute
+from storage import SQLiteStorage, badge_for_count
+
+
+@pytest.fixture
+def storage(tmp_path):
+    with SQLiteStorage(str(tmp_path / "attendance.db")) as storage:
+        yield storage
+
+
+def insert_marks(storage, name, days):
+    for day in range(1, days + 1):
+        storage.insert_attendance({"Name": name, "Date": f"2026-01-{day:02d}"})
+
+
+def test_badges_for_counts_matches_thresholds_at_boundaries():
+    counts = [0, 3, 4, 5, 9, 10, 11]
+    assert list(badges_for_counts(counts)) == [badge_for_count(c) for c in counts]
+    assert list(badges_for_counts(counts)) == [
+        "No Badge", "No Badge", "Bronze", "Silver", "Silver", "Gold", "Gold",
+    ]
+
+
+def test_plan_changes_skips_rows_that_are_already_right():
+    counts = pd.Series({"ANA": 5}, name="AttendanceCount")
+    plan = plan_changes(counts, [{"Name": "ANA", "AttendanceCount": 5, "Badge": "Silver"}])
+    assert plan.empty
+
+
+def test_plan_changes_inserts_counted_students_without_rewards():
+    counts = pd.Series({"ANA": 4}, name="AttendanceCount")
+    plan = plan_changes(counts, [])
+    row = plan.iloc[0]
+    assert len(plan) == 1
+    assert (row["Name"], row["AttendanceCount"], row["Badge"], row["Change"]) == ("ANA", 4, "Bronze", "insert")
+    assert pd.isna(row["OldCount"]) and pd.isna(row["OldBadge"])
+
+
+def test_plan_changes_updates_and_resets():
+    counts = pd.Series({"ANA": 10}, name="AttendanceCount")
+    rewards = [
+        {"Name": "ANA", "AttendanceCount": 9, "Badge": "Silver"},
+        {"Name": "BEN", "AttendanceCount": 3, "Badge": "No Badge"},
+    ]
+    plan = plan_changes(counts, rewards).set_index("Name")
+    assert plan.loc["ANA", ["AttendanceCount", "Badge", "Change"]].tolist() == [10, "Gold", "update"]
+    assert plan.loc["BEN", ["AttendanceCount", "Badge", "Change"]].tolist() == [0, "No Badge", "reset"]
+
+
+def test_sqlite_recompute_matches_attendance(storage):
+    insert_marks(storage, "ANA", 10)
+    insert_marks(storage, "BEN", 4)
+    insert_marks(storage, "CAL", 2)
+    storage.upsert_rewards([
+        {"Name": "ANA", "AttendanceCount": 3, "Badge": "No Badge"},  # stale
+        {"Name": "CAL", "AttendanceCount": 2, "Badge": "No Badge"},  # already right
+        {"Name": "DEV", "AttendanceCount": 6, "Badge": "Silver"},    # no attendance left
+    ])
+
+    changes = storage.recompute_rewards()
+
+    assert {c["Name"] for c in changes} == {"ANA", "BEN", "DEV"}
+    counts = attendance_counts(storage, page_size=3)
+    rewards = {r["Name"]: r for r in storage.get_rewards()}
+    for name, count in counts.items():
+        assert rewards[name]["AttendanceCount"] == count
+        assert rewards[name]["Badge"] == badge_for_count(count)
+    assert rewards["DEV"]["AttendanceCount"] == 0
+    assert storage.recompute_rewards() == []
+
+
+def test_recompute_dry_run_leaves_rewards_alone(storage):
+    insert_marks(storage, "ANA", 5)
+    plan = recompute(storage, dry_run=True)
+    assert plan["Change"].tolist() == ["insert"]
+    assert storage.get_rewards() == []
@@ -0,0 +1,217 @@
+import sqlite3
+import time
+
+import pytest
+
+import resilience
+from resilience import BackendUnavailable, CircuitBreaker, CircuitOpen, ResilientStorage
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, reset_seconds=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failures=1, reset_seconds=30)
+    breaker.failure()
+    clock[0] += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # Probe already out
+    breaker.success()
+    assert breaker.state == "closed"
+
+
+def test_breaker_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failures=5, reset_seconds=30)
+    for _ in range(5):
+        breaker.failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+    clock[0] += 29
+    assert not breaker.allow()
+
+
+def test_breaker_released_probe_can_be_retried(clock):
+    breaker = CircuitBreaker(failures=1, reset_seconds=30)
+    breaker.failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize("error, transport", [
+    (ConnectionError(), True),
+    (TimeoutError(), True),
+    (sqlite3.OperationalError("database is locked"), True),
+    (sqlite3.OperationalError("interrupted"), True),
+    (sqlite3.OperationalError("no such column: Foo"), False),
+    (ValueError("bad"), False),
+])
+def test_is_transport_error(error, transport):
+    assert resilience.is_transport_error(error) is transport
+
+
+def test_is_transport_error_reads_http_status_and_postgrest_codes():
+    class APIError(Exception):
+        def __init__(self, code):
+            self.code = code
+
+    assert resilience.is_transport_error(APIError(503))
+    assert resilience.is_transport_error(APIError(429))
+    assert not resilience.is_transport_error(APIError(404))
+    assert resilience.is_transport_error(APIError("PGRST001"))
+    assert not resilience.is_transport_error(APIError("23505"))
+
+
+class FlakyStorage:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get_reward(self, name):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"Name": name}
+
+
+def test_reads_retry_transport_errors(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    storage = FlakyStorage([ConnectionError("reset")])
+    assert ResilientStorage(storage).get_reward("A") == {"Name": "A"}
+    assert storage.calls == 2
+
+
+def test_request_errors_pass_through_without_retry():
+    storage = FlakyStorage([KeyError("bad")])
+    wrapped = ResilientStorage(storage)
+    with pytest.raises(KeyError):
+        wrapped.get_reward("A")
+    assert storage.calls == 1
+    assert wrapped.breaker.consecutive == 0
+
+
+def test_failed_read_serves_last_good_value_as_stale(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    storage = FlakyStorage([])
+    wrapped = ResilientStorage(storage)
+    wrapped.get_reward("A")
+    storage.errors = [ConnectionError()] * 5
+    with resilience.collecting_stale() as stale:
+        assert wrapped.get_reward("A") == {"Name": "A"}
+    assert [method for method, _ in stale] == ["get_reward"]
+    with pytest.raises(BackendUnavailable):
+        wrapped.get_reward("B")
+
+
+def test_open_breaker_refuses_without_calling():
+    storage = FlakyStorage([])
+    breaker = CircuitBreaker(failures=1)
+    breaker.failure()
+    with pytest.raises(CircuitOpen):
+        ResilientStorage(storage, breaker=breaker).get_reward("A")
+    assert storage.calls == 0
+
+
+def test_deadline_bounds_a_paged_read():
+    class PagedStorage:
+        pages = 0
+
+        def get_class_dates(self):
+            while True:
+                self.pages += 1
+                time.sleep(0.02)
+                resilience.check_deadline()
+
+    storage = PagedStorage()
+    started = time.monotonic()
+    with pytest.raises(BackendUnavailable):
+        ResilientStorage(storage, deadline=0.1).get_class_dates()
+    assert time.monotonic() - started < 0.5
+    assert not resilience.past_deadline()  # Nothing left behind on the thread
+
+
+def test_login_lookup_is_retried_but_never_served_stale(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+    class LoginStorage(FlakyStorage):
+        def find_student(self, name, parent_email):
+            return self.get_reward(name)
+
+    storage = LoginStorage([ConnectionError()])
+    wrapped = ResilientStorage(storage)
+    assert wrapped.find_student("A", "a@example.com") == {"Name": "A"}
+    assert storage.calls == 2
+    storage.errors = [ConnectionError()] * 5
+    with pytest.raises(BackendUnavailable):
+        wrapped.find_student("A", "a@example.com")
+
+
+class ScanStorage:
+    def __init__(self, rows, errors=()):
+        self.rows = rows
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get_attendance_scan_page(self, cursor=None, page_size=1000, date_from=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        start = cursor or 0
+        rows = self.rows[start:start + page_size]
+        return rows, (start + len(rows) if len(rows) == page_size else None)
+
+
+def test_scan_pages_are_each_retried(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    storage = ScanStorage(list(range(5)))
+    wrapped = ResilientStorage(storage)
+    pages = wrapped.iter_attendance_pages(page_size=2)
+    assert next(pages) == [0, 1]
+    storage.errors = [ConnectionError()]
+    assert list(pages) == [[2, 3], [4]]
+    assert storage.calls == 4
+
+
+def test_scan_stops_when_the_breaker_opens(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    storage = ScanStorage(list(range(5)))
+    wrapped = ResilientStorage(storage, breaker=CircuitBreaker(failures=1))
+    pages = wrapped.iter_attendance_pages(page_size=2)
+    next(pages)
+    storage.errors = [ConnectionError()] * 5
+    with pytest.raises(BackendUnavailable):
+        next(pages)
+    assert wrapped.last_good == {}
+
+
+def test_recompute_rewards_is_a_write_without_retries():
+    class RecomputeStorage:
+        calls = 0
+
+        def recompute_rewards(self):
+            self.calls += 1
+            raise ConnectionError()
+
+    storage = RecomputeStorage()
+    with pytest.raises(BackendUnavailable):
+        ResilientStorage(storage).recompute_rewards()
+    assert storage.calls == 1
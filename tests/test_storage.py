@@ -0,0 +1,144 @@
+from datetime import date, timedelta
+
+import pytest
+
+from storage import PAGE_SIZE, SQLiteStorage, SupabaseStorage
+
+PAGE = 5
+
+
+@pytest.fixture
+def storage(tmp_path):
+    with SQLiteStorage(str(tmp_path / "attendance.db")) as storage:
+        yield storage
+
+
+def seed(storage, name, days, start=date(2025, 12, 1)):
+    dates = [(start + timedelta(days=day)).isoformat() for day in range(days)]
+    for day in dates:
+        storage.insert_attendance({"Name": name, "Date": day, "Time": "09:00:00", "Method": "QR"})
+    return dates
+
+
+def walk(storage, name, descending=True, **filters):
+    """Every page the records view would show, fetching one extra row as it does"""
+    pages, after = [], None
+    while True:
+        rows = storage.get_attendance_page(name, after=after, limit=PAGE + 1, descending=descending, **filters)
+        page, has_more = rows[:PAGE], len(rows) > PAGE
+        pages.append([row["Date"] for row in page])
+        if not has_more:
+            return pages
+        after = page[-1]["Date"]
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("days", [0, 3, PAGE, 2 * PAGE, 2 * PAGE + 1])
+def test_keyset_pages_cover_every_row_once(storage, descending, days):
+    dates = seed(storage, "ANA", days)
+    seed(storage, "BEN", 7)  # Another student's rows never leak in
+    pages = walk(storage, "ANA", descending=descending)
+    walked = [day for page in pages for day in page]
+    assert walked == sorted(dates, reverse=descending)
+    assert all(len(page) == PAGE for page in pages[:-1])
+    # A history ending exactly on a page boundary has no empty trailing page
+    assert len(pages) == max(1, -(-days // PAGE))
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_keyset_pages_respect_the_date_range(storage, descending):
+    dates = seed(storage, "ANA", 31)
+    pages = walk(storage, "ANA", descending=descending, date_from="2025-12-10", date_to="2025-12-20")
+    walked = [day for page in pages for day in page]
+    assert walked == sorted(dates[9:20], reverse=descending)
+
+
+def test_page_projects_the_requested_columns(storage):
+    seed(storage, "ANA", 2)
+    rows = storage.get_attendance_page("ANA", ("Date", "Method"), limit=1)
+    assert rows == [{"Date": "2025-12-02", "Method": "QR"}]
+
+
+class RecordingQuery:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __getattr__(self, method):
+        def record(*args, **kwargs):
+            self.calls.append((method, args, kwargs))
+            return self
+        return record
+
+    def execute(self):
+        return type("Response", (), {"data": []})()
+
+
+@pytest.mark.parametrize("descending, comparison", [(True, "lt"), (False, "gt")])
+def test_supabase_page_query(descending, comparison):
+    calls = []
+    client = type("Client", (), {"table": lambda self, name: RecordingQuery(calls)})()
+    SupabaseStorage(client).get_attendance_page(
+        "ANA", ("Date",), date_from="2025-12-01", date_to="2025-12-31",
+        after="2025-12-20", limit=PAGE_SIZE + 1, descending=descending,
+    )
+    assert (comparison, ("Date", "2025-12-20"), {}) in calls
+    assert ("gte", ("Date", "2025-12-01"), {}) in calls
+    assert ("lte", ("Date", "2025-12-31"), {}) in calls
+    assert ("order", ("Date",), {"desc": descending}) in calls
+    assert ("limit", (PAGE_SIZE,), {}) in calls  # Never above the row cap
+
+
+def mark(name, day):
+    return {"Name": name, "Date": day, "Time": "09:00:00", "Method": "QR"}
+
+
+def attendance_rows(storage, name):
+    return [row["Date"] for row in storage.get_attendance(name)]
+
+
+def test_first_mark_inserts_and_counts(storage):
+    inserted, reward = storage.mark_attendance(mark("ANA", "2026-01-05"))
+    assert inserted
+    assert reward == {"Name": "ANA", "AttendanceCount": 1, "Badge": "No Badge"}
+    assert attendance_rows(storage, "ANA") == ["2026-01-05"]
+    assert storage.get_reward("ANA")["AttendanceCount"] == 1
+
+
+def test_duplicate_mark_neither_inserts_nor_counts(storage):
+    storage.mark_attendance(mark("ANA", "2026-01-05"))
+    inserted, reward = storage.mark_attendance(mark("ANA", "2026-01-05"))
+    assert not inserted
+    assert reward["AttendanceCount"] == 1
+    assert attendance_rows(storage, "ANA") == ["2026-01-05"]
+
+
+def test_batch_with_new_and_duplicate_marks(storage):
+    storage.mark_attendance(mark("ANA", "2026-01-05"))
+    results = storage.mark_attendance_batch([
+        mark("ANA", "2026-01-05"),
+        mark("ANA", "2026-01-06"),
+        mark("BEN", "2026-01-06"),
+        mark("BEN", "2026-01-06"),
+    ])
+    assert [(record["Name"], inserted) for record, inserted, _ in results] == [
+        ("ANA", False), ("ANA", True), ("BEN", True), ("BEN", False),
+    ]
+    assert storage.get_reward("ANA")["AttendanceCount"] == 2
+    assert storage.get_reward("BEN")["AttendanceCount"] == 1
+
+
+def test_failed_reward_update_rolls_the_mark_back(storage, monkeypatch):
+    storage.mark_attendance(mark("ANA", "2026-01-05"))
+
+    def fail(reward):
+        raise RuntimeError("rewards unavailable")
+
+    monkeypatch.setattr(storage, "upsert_reward", fail)
+    with pytest.raises(RuntimeError):
+        storage.mark_attendance_batch([mark("ANA", "2026-01-06"), mark("BEN", "2026-01-06")])
+    assert attendance_rows(storage, "ANA") == ["2026-01-05"]
+    assert attendance_rows(storage, "BEN") == []
+    assert storage.get_reward("ANA")["AttendanceCount"] == 1
+    # The connection is usable again afterwards
+    monkeypatch.undo()
+    assert storage.mark_attendance(mark("ANA", "2026-01-06"))[0]